@@ -30,20 +30,27 @@
 Returns content from plugins and sets reponses
 """
 
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from dateutil.parser import parse as dateparse
+from inspect import signature
 import json
 import logging
 import os
+import threading
 import urllib.parse
 
 from jinja2 import Environment, FileSystemLoader
 
 from pygeoapi import __version__
 from pygeoapi.log import setup_logger
-from pygeoapi.plugin import load_plugin, PLUGINS
-from pygeoapi.provider.base import ProviderConnectionError, ProviderQueryError
-from pygeoapi.util import json_serial, str2bool
+from pygeoapi.plugin import load_plugin, PluginRegistry, PLUGINS
+from pygeoapi.provider.base import (ProviderConnectionError,
+                                    ProviderInvalidQueryError,
+                                    ProviderQueryError)
+from pygeoapi.util import (grid_cell_bbox, json_serial, RawJSON, str2bool,
+                           to_json)
 
 LOGGER = logging.getLogger(__name__)
 
@@ -59,6 +66,50 @@ HEADERS = {
 #: Formats allowed for ?f= requests
 FORMATS = ['json', 'html']
 
+#: Thread pool running the queries of batch requests, created on first use
+_BATCH_EXECUTOR = None
+_BATCH_EXECUTOR_LOCK = threading.Lock()
+
+
+def batch_executor(max_workers):
+    """
+    Get (or create) the thread pool shared by all batch requests
+
+    :param max_workers: number of threads of the pool, when created
+
+    :returns: `concurrent.futures.ThreadPoolExecutor`
+    """
+
+    global _BATCH_EXECUTOR
+
+    with _BATCH_EXECUTOR_LOCK:
+        if _BATCH_EXECUTOR is None:
+            _BATCH_EXECUTOR = ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix='pygeoapi-batch')
+        return _BATCH_EXECUTOR
+
+
+def batch_param(value):
+    """
+    Convert a JSON query parameter of a batch request to its
+    URL query string form
+
+    :param value: JSON value (not `None`)
+
+    :returns: `str` of value, or `None` if not a scalar or a list
+              of scalars
+    """
+
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (str, int, float)):
+        return str(value)
+    if isinstance(value, list) and value and all(
+            isinstance(v, (str, int, float)) and not isinstance(v, bool)
+            for v in value):
+        return ','.join(str(v) for v in value)
+    return None
+
 
 def pre_process(func):
     """
@@ -103,6 +154,46 @@ class API(object):
 
         setup_logger(self.config['logging'])
 
+        LOGGER.debug('Setting up provider and processor registries')
+        self.providers = PluginRegistry('provider', {})
+        self.processors = PluginRegistry('process', {})
+        self.reload()
+
+    def close(self):
+        """
+        Close all provider and processor instances
+
+        :returns: None
+        """
+
+        self.providers.close()
+        self.processors.close()
+
+    def reload(self):
+        """
+        Close all provider and processor instances and re-read their
+        definitions from configuration.  Instances are re-created
+        on next use, or right away for providers configured with
+        `warm_up: true`
+
+        :returns: None
+        """
+
+        self.providers.reload({
+            k: v['provider'] for k, v in self.config['datasets'].items()
+        })
+        self.processors.reload({
+            k: v['processor']
+            for k, v in self.config.get('processes', {}).items()
+        })
+
+        for k, v in self.config['datasets'].items():
+            if v['provider'].get('warm_up', False):
+                try:
+                    self.providers.get(k)
+                except Exception as err:
+                    LOGGER.warning('Could not warm up {}: {}'.format(k, err))
+
     @pre_process
     def root(self, headers_, format_):
         """
@@ -422,9 +513,6 @@ class API(object):
 
         headers_ = HEADERS.copy()
 
-        properties = []
-        reserved_fieldnames = ['bbox', 'f', 'limit', 'startindex',
-                               'resulttype', 'datetime']
         formats = FORMATS
         formats.extend(f.lower() for f in PLUGINS['formatter'].keys())
 
@@ -446,6 +534,105 @@ class API(object):
             LOGGER.error(exception)
             return headers_, 400, json.dumps(exception)
 
+        exception, p, query_args = self._items_query(args, dataset)
+        if exception is not None:
+            return headers_, exception[0], json.dumps(exception[1])
+
+        LOGGER.debug('Querying provider')
+        try:
+            content = p.query(**query_args)
+        except ProviderConnectionError:
+            exception = {
+                'code': 'NoApplicableCode',
+                'description': 'connection error (check logs)'
+            }
+            LOGGER.error(exception)
+            return headers_, 500, json.dumps(exception)
+        except ProviderInvalidQueryError as err:
+            exception = {
+                'code': 'InvalidParameterValue',
+                'description': str(err)
+            }
+            LOGGER.error(exception)
+            return headers_, 400, json.dumps(exception)
+        except ProviderQueryError:
+            exception = {
+                'code': 'NoApplicableCode',
+                'description': 'query error (check logs)'
+            }
+            LOGGER.error(exception)
+            return headers_, 500, json.dumps(exception)
+
+        startindex = query_args['startindex']
+        self._items_links(content, args, dataset, startindex,
+                          query_args['limit'])
+
+        if (format_ in ('html', 'csv') and
+                isinstance(content['features'], RawJSON)):
+            LOGGER.debug('Deserializing features built by provider')
+            content['features'] = json.loads(content['features'])
+
+        if format_ == 'html':  # render
+            headers_['Content-Type'] = 'text/html'
+
+            content['links'][0]['rel'] = 'alternate'
+            content['links'][1]['rel'] = 'self'
+
+            # For constructing proper URIs to items
+            if pathinfo:
+                path_info = '/'.join([
+                    self.config['server']['url'].rstrip('/'),
+                    pathinfo.strip('/')])
+            else:
+                path_info = '/'.join([
+                    self.config['server']['url'].rstrip('/'),
+                    headers.environ['PATH_INFO'].strip('/')])
+
+            content['items_path'] = path_info
+            content['dataset_path'] = '/'.join(path_info.split('/')[:-1])
+            content['collections_path'] = '/'.join(path_info.split('/')[:-2])
+            content['startindex'] = startindex
+
+            content = _render_j2_template(self.config, 'items.html',
+                                          content)
+            return headers_, 200, content
+        elif format_ == 'csv':  # render
+            formatter = load_plugin('formatter', {'name': 'CSV', 'geom': True})
+
+            content = formatter.write(
+                data=content,
+                options={
+                    'provider_def':
+                        self.config['datasets'][dataset]['provider']
+                }
+            )
+
+            headers_['Content-Type'] = '{}; charset={}'.format(
+                formatter.mimetype, self.config['server']['encoding'])
+
+            cd = 'attachment; filename="{}.csv"'.format(dataset)
+            headers_['Content-Disposition'] = cd
+
+            return headers_, 200, content
+
+        return headers_, 200, to_json(content)
+
+    def _items_query(self, args, dataset):
+        """
+        Validate the query parameters of a feature collection items
+        request and load the provider of the collection
+
+        :param args: dict of HTTP request parameters
+        :param dataset: dataset name
+
+        :returns: tuple of (status code, `dict` of exception) or `None`,
+                  provider and `dict` of provider query arguments
+        """
+
+        properties = []
+        reserved_fieldnames = ['bbox', 'f', 'limit', 'startindex',
+                               'resulttype', 'datetime', 'token']
+
         LOGGER.debug('Processing query parameters')
 
         LOGGER.debug('Processing startindex parameter')
@@ -458,7 +645,7 @@ class API(object):
                                    'or zero'
                 }
                 LOGGER.error(exception)
-                return headers_, 400, json.dumps(exception)
+                return (400, exception), None, None
         except TypeError:
             startindex = 0
 
@@ -473,12 +660,14 @@ class API(object):
                     'description': 'limit value should be strictly positive'
                 }
                 LOGGER.error(exception)
-                return headers_, 400, json.dumps(exception)
+                return (400, exception), None, None
         except TypeError:
             limit = int(self.config['server']['limit'])
 
         resulttype = args.get('resulttype') or 'results'
 
+        token = args.get('token')
+
         LOGGER.debug('Processing bbox parameter')
         try:
             bbox = args.get('bbox').split(',')
@@ -488,7 +677,7 @@ class API(object):
                     'description': 'bbox values should be minx,miny,maxx,maxy'
                 }
                 LOGGER.error(exception)
-                return headers_, 400, json.dumps(exception)
+                return (400, exception), None, None
         except AttributeError:
             bbox = []
         try:
@@ -499,7 +688,7 @@ class API(object):
                 'description': 'bbox values must be numbers'
             }
             LOGGER.error(exception)
-            return headers_, 400, json.dumps(exception)
+            return (400, exception), None, None
 
         LOGGER.debug('Processing datetime parameter')
         # TODO: pass datetime to query as a `datetime` object
@@ -548,26 +737,25 @@ class API(object):
                 'description': 'datetime parameter out of range'
             }
             LOGGER.error(exception)
-            return headers_, 400, json.dumps(exception)
+            return (400, exception), None, None
 
         LOGGER.debug('Loading provider')
         try:
-            p = load_plugin('provider',
-                            self.config['datasets'][dataset]['provider'])
+            p = self.providers.get(dataset)
         except ProviderConnectionError:
             exception = {
                 'code': 'NoApplicableCode',
                 'description': 'connection error (check logs)'
             }
             LOGGER.error(exception)
-            return headers_, 500, json.dumps(exception)
+            return (500, exception), None, None
         except ProviderQueryError:
             exception = {
                 'code': 'NoApplicableCode',
                 'description': 'query error (check logs)'
             }
             LOGGER.error(exception)
-            return headers_, 500, json.dumps(exception)
+            return (500, exception), None, None
 
         LOGGER.debug('processing property parameters')
         for k, v in args.items():
@@ -590,7 +778,7 @@ class API(object):
                             'description': 'sort order should be A or D'
                         }
                         LOGGER.error(exception)
-                        return headers_, 400, json.dumps(exception)
+                        return (400, exception), None, None
                     sortby.append({'property': prop, 'order': order})
                 else:
                     sortby.append({'property': s, 'order': 'A'})
@@ -601,39 +789,54 @@ class API(object):
                         'description': 'bad sort property'
                     }
                     LOGGER.error(exception)
-                    return headers_, 400, json.dumps(exception)
+                    return (400, exception), None, None
         else:
             sortby = []
 
-        LOGGER.debug('Querying provider')
+        query_args = {
+            'startindex': startindex,
+            'limit': limit,
+            'resulttype': resulttype,
+            'bbox': bbox,
+            'datetime': datetime_,
+            'properties': properties,
+            'sortby': sortby
+        }
+        if token is not None:
+            if 'token' not in signature(p.query).parameters:
+                exception = {
+                    'code': 'InvalidParameterValue',
+                    'description': 'token not supported by collection'
+                }
+                LOGGER.error(exception)
+                return (400, exception), None, None
+            query_args['token'] = token
+
         LOGGER.debug('startindex: {}'.format(startindex))
         LOGGER.debug('limit: {}'.format(limit))
         LOGGER.debug('resulttype: {}'.format(resulttype))
         LOGGER.debug('sortby: {}'.format(sortby))
+        LOGGER.debug('token: {}'.format(token))
 
-        try:
-            content = p.query(startindex=startindex, limit=limit,
-                              resulttype=resulttype, bbox=bbox,
-                              datetime=datetime_, properties=properties,
-                              sortby=sortby)
-        except ProviderConnectionError:
-            exception = {
-                'code': 'NoApplicableCode',
-                'description': 'connection error (check logs)'
-            }
-            LOGGER.error(exception)
-            return headers_, 500, json.dumps(exception)
-        except ProviderQueryError:
-            exception = {
-                'code': 'NoApplicableCode',
-                'description': 'query error (check logs)'
-            }
-            LOGGER.error(exception)
-            return headers_, 500, json.dumps(exception)
+        return None, p, query_args
+
+    def _items_links(self, content, args, dataset, startindex, limit):
+        """
+        Add links (self, alternate, prev, next, collection) and
+        timestamp to a feature collection items response
+
+        :param content: dict of provider query results
+        :param args: dict of HTTP request parameters
+        :param dataset: dataset name
+        :param startindex: starting record of the results
+        :param limit: number of records requested
+
+        :returns: None
+        """
 
         serialized_query_params = ''
         for k, v in args.items():
-            if k not in ('f', 'startindex'):
+            if k not in ('f', 'startindex', 'token'):
                 serialized_query_params += '&'
                 serialized_query_params += urllib.parse.quote(k, safe='')
                 serialized_query_params += '='
@@ -666,7 +869,22 @@ class API(object):
                             serialized_query_params)
                 })
 
-        if len(content['features']) == limit:
+        # keyset paging providers return a continuation token
+        next_token = content.pop('next_token', None)
+
+        if next_token is not None:
+            content['links'].append(
+                {
+                    'type': 'application/geo+json',
+                    'rel': 'next',
+                    'title': 'items (next)',
+                    'href': '{}/collections/{}/items?token={}{}'
+                    .format(
+                        self.config['server']['url'], dataset, next_token,
+                        serialized_query_params)
+                })
+        elif content.get('numberReturned',
+                         len(content['features'])) == limit:
             next_ = startindex + limit
             content['links'].append(
                 {
@@ -691,50 +909,276 @@ class API(object):
         content['timeStamp'] = datetime.utcnow().strftime(
             '%Y-%m-%dT%H:%M:%S.%fZ')
 
-        if format_ == 'html':  # render
-            headers_['Content-Type'] = 'text/html'
+    def get_collection_aggregate(self, headers, args, dataset):
+        """
+        Count the features of a feature collection per cell of a
+        geotile (web mercator tiles) or geohash grid
 
-            content['links'][0]['rel'] = 'alternate'
-            content['links'][1]['rel'] = 'self'
+        :param headers: dict of HTTP headers
+        :param args: dict of HTTP request parameters
+        :param dataset: dataset name
 
-            # For constructing proper URIs to items
-            if pathinfo:
-                path_info = '/'.join([
-                    self.config['server']['url'].rstrip('/'),
-                    pathinfo.strip('/')])
-            else:
-                path_info = '/'.join([
-                    self.config['server']['url'].rstrip('/'),
-                    headers.environ['PATH_INFO'].strip('/')])
+        :returns: tuple of headers, status code, content
+        """
 
-            content['items_path'] = path_info
-            content['dataset_path'] = '/'.join(path_info.split('/')[:-1])
-            content['collections_path'] = '/'.join(path_info.split('/')[:-2])
-            content['startindex'] = startindex
+        headers_ = HEADERS.copy()
 
-            content = _render_j2_template(self.config, 'items.html',
-                                          content)
-            return headers_, 200, content
-        elif format_ == 'csv':  # render
-            formatter = load_plugin('formatter', {'name': 'CSV', 'geom': True})
+        if dataset not in self.config['datasets'].keys():
+            exception = {
+                'code': 'InvalidParameterValue',
+                'description': 'Invalid feature collection'
+            }
+            LOGGER.error(exception)
+            return headers_, 400, json.dumps(exception)
 
-            content = formatter.write(
-                data=content,
-                options={
-                    'provider_def':
-                        self.config['datasets'][dataset]['provider']
+        LOGGER.debug('Processing grid parameters')
+        grid = args.get('grid') or 'geotile'
+        precisions = {'geotile': (0, 29, 7), 'geohash': (1, 12, 5)}
+        if grid not in precisions:
+            exception = {
+                'code': 'InvalidParameterValue',
+                'description': 'grid should be geotile or geohash'
+            }
+            LOGGER.error(exception)
+            return headers_, 400, json.dumps(exception)
+
+        low, high, precision = precisions[grid]
+        try:
+            precision = int(args.get('precision', precision))
+            assert low <= precision <= high
+        except (AssertionError, ValueError):
+            exception = {
+                'code': 'InvalidParameterValue',
+                'description': 'precision should be between {} and {}'
+                               .format(low, high)
+            }
+            LOGGER.error(exception)
+            return headers_, 400, json.dumps(exception)
+
+        args_ = {k: v for k, v in args.items()
+                 if k not in ('grid', 'precision', 'token', 'sortby')}
+        exception, p, query_args = self._items_query(args_, dataset)
+        if exception is not None:
+            return headers_, exception[0], json.dumps(exception[1])
+
+        # limit caps the number of cells, rather than features
+        size = query_args['limit'] if 'limit' in args else 10000
+
+        LOGGER.debug('Aggregating provider')
+        try:
+            cells = p.aggregate(grid=grid, precision=precision, size=size,
+                                bbox=query_args['bbox'],
+                                datetime=query_args['datetime'],
+                                properties=query_args['properties'])
+        except ProviderConnectionError:
+            exception = {
+                'code': 'NoApplicableCode',
+                'description': 'connection error (check logs)'
+            }
+            LOGGER.error(exception)
+            return headers_, 500, json.dumps(exception)
+        except ProviderInvalidQueryError as err:
+            exception = {
+                'code': 'InvalidParameterValue',
+                'description': str(err)
+            }
+            LOGGER.error(exception)
+            return headers_, 400, json.dumps(exception)
+        except ProviderQueryError:
+            exception = {
+                'code': 'NoApplicableCode',
+                'description': 'query error (check logs)'
+            }
+            LOGGER.error(exception)
+            return headers_, 500, json.dumps(exception)
+
+        content = {
+            'type': 'FeatureCollection',
+            'features': [],
+            'numberReturned': len(cells)
+        }
+        for cell in cells:
+            minx, miny, maxx, maxy = grid_cell_bbox(grid, cell['key'])
+            content['features'].append({
+                'type': 'Feature',
+                'id': cell['key'],
+                'geometry': {
+                    'type': 'Polygon',
+                    'coordinates': [[[minx, miny], [maxx, miny],
+                                     [maxx, maxy], [minx, maxy],
+                                     [minx, miny]]]
+                },
+                'properties': {
+                    'count': cell['count']
                 }
-            )
+            })
 
-            headers_['Content-Type'] = '{}; charset={}'.format(
-                formatter.mimetype, self.config['server']['encoding'])
+        content['links'] = [{
+            'type': 'application/json',
+            'title': self.config['datasets'][dataset]['title'],
+            'rel': 'collection',
+            'href': '{}/collections/{}'.format(
+                self.config['server']['url'], dataset)
+        }]
+        content['timeStamp'] = datetime.utcnow().strftime(
+            '%Y-%m-%dT%H:%M:%S.%fZ')
 
-            cd = 'attachment; filename="{}.csv"'.format(dataset)
-            headers_['Content-Disposition'] = cd
+        return headers_, 200, to_json(content)
 
-            return headers_, 200, content
+    def get_collection_items_batch(self, headers, args, data):
+        """
+        Queries several feature collections at once.  Providers
+        implementing `query_batch` (e.g. Elasticsearch) run all their
+        queries together, the queries of other providers run
+        concurrently in a thread pool
 
-        return headers_, 200, json.dumps(content, default=json_serial)
+        :param headers: dict of HTTP headers
+        :param args: dict of HTTP request parameters
+        :param data: JSON list of queries, objects with `collection`
+                     and (optional) `params` of query parameters
+
+        :returns: tuple of headers, status code, content
+        """
+
+        headers_ = HEADERS.copy()
+
+        try:
+            queries = json.loads(data)
+            assert isinstance(queries, list)
+            assert all(isinstance(q, dict) for q in queries)
+        except (AssertionError, TypeError, ValueError):
+            exception = {
+                'code': 'InvalidParameterValue',
+                'description': 'request data should be a list of queries'
+            }
+            LOGGER.error(exception)
+            return headers_, 400, json.dumps(exception)
+
+        # maximum number of queries per request
+        batch_limit = int(self.config['server'].get('batch_limit', 20))
+        if len(queries) > batch_limit:
+            exception = {
+                'code': 'InvalidParameterValue',
+                'description': 'at most {} queries allowed'.format(
+                    batch_limit)
+            }
+            LOGGER.error(exception)
+            return headers_, 400, json.dumps(exception)
+
+        responses = [None] * len(queries)
+        query_args_ = {}
+        batches = OrderedDict()
+
+        LOGGER.debug('Processing queries')
+        for i, query in enumerate(queries):
+            dataset = query.get('collection')
+            params = query.get('params') or {}
+            invalid = []
+            if isinstance(params, dict):
+                params = {k: batch_param(v) for k, v in params.items()
+                          if v is not None}
+                invalid = sorted(k for k, v in params.items() if v is None)
+            else:
+                invalid = ['params']
+            queries[i] = (dataset, params)
+
+            if dataset not in self.config['datasets'].keys():
+                exception = {
+                    'code': 'InvalidParameterValue',
+                    'description': 'Invalid feature collection'
+                }
+                LOGGER.error(exception)
+                responses[i] = (400, exception)
+                continue
+
+            if invalid:
+                exception = {
+                    'code': 'InvalidParameterValue',
+                    'description': 'Invalid value of {}: expected a '
+                                   'string, number, boolean or list of '
+                                   'these'.format(', '.join(invalid))
+                }
+                LOGGER.error(exception)
+                responses[i] = (400, exception)
+                continue
+
+            exception, p, query_args = self._items_query(params, dataset)
+            if exception is not None:
+                responses[i] = exception
+                continue
+
+            query_args_[i] = query_args
+            batches.setdefault(type(p), []).append((i, p, query_args))
+
+        def query_one(p, query_args):
+            # results (or errors) as a list, like query_batch
+            try:
+                return [p.query(**query_args)]
+            except Exception as err:
+                return [err]
+
+        LOGGER.debug('Querying providers')
+        executor = batch_executor(
+            int(self.config['server'].get('batch_workers', 8)))
+        futures = []
+        for cls, items in batches.items():
+            if hasattr(cls, 'query_batch'):
+                future = executor.submit(
+                    cls.query_batch, [(p, a) for _, p, a in items])
+                futures.append(([i for i, _, _ in items], future))
+            else:
+                for i, p, query_args in items:
+                    future = executor.submit(query_one, p, query_args)
+                    futures.append(([i], future))
+
+        # a failing query fails its own response only
+        outcomes = {}
+        for positions, future in futures:
+            try:
+                outcomes.update(zip(positions, future.result()))
+            except Exception as err:
+                outcomes.update((i, err) for i in positions)
+
+        for i, content in outcomes.items():
+            dataset, params = queries[i]
+            query_args = query_args_[i]
+            if isinstance(content, ProviderConnectionError):
+                exception = {
+                    'code': 'NoApplicableCode',
+                    'description': 'connection error (check logs)'
+                }
+                LOGGER.error(exception)
+                responses[i] = (500, exception)
+            elif isinstance(content, ProviderInvalidQueryError):
+                exception = {
+                    'code': 'InvalidParameterValue',
+                    'description': str(content)
+                }
+                LOGGER.error(exception)
+                responses[i] = (400, exception)
+            elif isinstance(content, Exception):
+                LOGGER.error('Query {} failed: {!r}'.format(i, content))
+                exception = {
+                    'code': 'NoApplicableCode',
+                    'description': 'query error (check logs)'
+                }
+                LOGGER.error(exception)
+                responses[i] = (500, exception)
+            else:
+                self._items_links(content, params, dataset,
+                                  query_args['startindex'],
+                                  query_args['limit'])
+                responses[i] = (200, content)
+
+        items = []
+        for (dataset, _), (status, content) in zip(queries, responses):
+            items.append(to_json({
+                'collection': dataset,
+                'status': status,
+                'content': RawJSON(to_json(content))
+            }))
+
+        return headers_, 200, '{{"responses":[{}]}}'.format(','.join(items))
 
     @pre_process
     def get_collection_item(self, headers_, format_, dataset, identifier):
@@ -769,8 +1213,7 @@ class API(object):
             return headers_, 400, json.dumps(exception)
 
         LOGGER.debug('Loading provider')
-        p = load_plugin('provider',
-                        self.config['datasets'][dataset]['provider'])
+        p = self.providers.get(dataset)
 
         LOGGER.debug('Fetching id {}'.format(identifier))
         content = p.get(identifier)
@@ -859,16 +1302,14 @@ class API(object):
                     LOGGER.error(exception)
                     return headers_, 404, json.dumps(exception)
 
-                p = load_plugin('process',
-                                processes_config[process]['processor'])
+                p = self.processors.get(process)
                 p.metadata['jobControlOptions'] = ['sync-execute']
                 p.metadata['outputTransmission'] = ['value']
                 response = p.metadata
             else:
                 processes = []
                 for k, v in processes_config.items():
-                    p = load_plugin('process',
-                                    processes_config[k]['processor'])
+                    p = self.processors.get(k)
                     p.metadata['itemType'] = ['process']
                     p.metadata['jobControlOptions'] = ['sync-execute']
                     p.metadata['outputTransmission'] = ['value']
@@ -928,8 +1369,7 @@ class API(object):
             LOGGER.error(exception)
             return headers_, 404, json.dumps(exception)
 
-        p = load_plugin('process',
-                        processes[process]['processor'])
+        p = self.processors.get(process)
 
         data_ = json.loads(data)
         for input_ in data_['inputs']:
@@ -990,18 +1430,6 @@ def check_format(args, headers):
     return format_
 
 
-def to_json(dict_):
-    """
-    Serialize dict to json
-
-    :param dict_: `dict` of JSON representation
-
-    :returns: JSON string representation
-    """
-
-    return json.dumps(dict_, default=json_serial)
-
-
 def _render_j2_template(config, template, data):
     """
     render Jinja2 template
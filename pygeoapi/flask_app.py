@@ -159,6 +159,44 @@ def dataset(feature_collection, feature=None):
     return response
 
 
+@APP.route('/collections/<feature_collection>/aggregate')
+def aggregate(feature_collection):
+    """
+    Grid aggregation of collections/{dataset} access point
+
+    :returns: HTTP response
+    """
+
+    headers, status_code, content = api_.get_collection_aggregate(
+        request.headers, request.args, feature_collection)
+
+    response = make_response(content, status_code)
+
+    if headers:
+        response.headers = headers
+
+    return response
+
+
+@APP.route('/batch', methods=['POST'])
+def batch():
+    """
+    Batch of feature collection queries access point
+
+    :returns: HTTP response
+    """
+
+    headers, status_code, content = api_.get_collection_items_batch(
+        request.headers, request.args, request.data)
+
+    response = make_response(content, status_code)
+
+    if headers:
+        response.headers = headers
+
+    return response
+
+
 @APP.route('/processes')
 @APP.route('/processes/<name>')
 def describe_processes(name=None):
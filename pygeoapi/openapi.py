@@ -28,6 +28,7 @@
 # =================================================================
 
 from copy import deepcopy
+from inspect import signature
 import logging
 
 import click
@@ -250,6 +251,17 @@ def get_oas_30(cfg):
                 },
                 'style': 'form',
                 'explode': False
+            },
+            'token': {
+                'name': 'token',
+                'in': 'query',
+                'description': 'The optional token parameter continues the results from the page whose `next` link carried it, instead of from `startindex`.',  # noqa
+                'required': False,
+                'schema': {
+                    'type': 'string'
+                },
+                'style': 'form',
+                'explode': False
             }
         }
     }
@@ -315,16 +327,66 @@ def get_oas_30(cfg):
             }
         }
 
+        aggregate_path = '{}/aggregate'.format(collection_name_path)
+
+        paths[aggregate_path] = {
+            'get': {
+                'summary': 'Count {} features per grid cell'.format(
+                    v['title']),
+                'description': v['description'],
+                'tags': [k],
+                'parameters': [
+                    {
+                        'name': 'grid',
+                        'in': 'query',
+                        'description': 'The grid to count features in',
+                        'required': False,
+                        'schema': {
+                            'type': 'string',
+                            'enum': ['geotile', 'geohash'],
+                            'default': 'geotile'
+                        },
+                        'style': 'form',
+                        'explode': False
+                    },
+                    {
+                        'name': 'precision',
+                        'in': 'query',
+                        'description': 'Zoom level (geotile, 0-29) or length (geohash, 1-12) of grid cells',  # noqa
+                        'required': False,
+                        'schema': {
+                            'type': 'integer'
+                        },
+                        'style': 'form',
+                        'explode': False
+                    },
+                    {'$ref': '{}#/components/parameters/bbox'.format(OPENAPI_YAML['oapif'])},  # noqa
+                    {'$ref': '{}#/components/parameters/limit'.format(OPENAPI_YAML['oapif'])}  # noqa
+                ],
+                'responses': {
+                    200: {'$ref': '{}#/components/responses/Features'.format(OPENAPI_YAML['oapif'])},  # noqa
+                    400: {'$ref': '{}#/components/responses/InvalidParameter'.format(OPENAPI_YAML['oapif'])},  # noqa
+                    500: {'$ref': '{}#/components/responses/ServerError'.format(OPENAPI_YAML['oapif'])}  # noqa
+                }
+            }
+        }
+
         p = load_plugin('provider', cfg['datasets'][k]['provider'])
 
-        if p.time_field is not None:
+        # aggregate takes the same filters as items
+        query_paths = [items_path, aggregate_path]
+
+        if 'token' in signature(p.query).parameters:
             paths[items_path]['get']['parameters'].append(
-                {'$ref': '{}#/components/parameters/datetime'.format(OPENAPI_YAML['oapif'])})  # noqa
+                {'$ref': '#/components/parameters/token'})
+
+        if p.time_field is not None:
+            for path_ in query_paths:
+                paths[path_]['get']['parameters'].append(
+                    {'$ref': '{}#/components/parameters/datetime'.format(OPENAPI_YAML['oapif'])})  # noqa
 
         for k2, v2 in p.fields.items():
             if p.properties and k2 in p.properties:
-                path_ = '{}/items'.format(collection_name_path)
-
                 if v2['type'] == 'date':
                     schema = {
                         'type': 'string',
@@ -345,14 +407,15 @@ def get_oas_30(cfg):
                         'type': v2['type']
                     }
 
-                paths['{}'.format(path_)]['get']['parameters'].append({
-                    'name': k2,
-                    'in': 'query',
-                    'required': False,
-                    'schema': schema,
-                    'style': 'form',
-                    'explode': False
-                })
+                for path_ in query_paths:
+                    paths[path_]['get']['parameters'].append({
+                        'name': k2,
+                        'in': 'query',
+                        'required': False,
+                        'schema': schema,
+                        'style': 'form',
+                        'explode': False
+                    })
 
         paths['{}/items/{{featureId}}'.format(collection_name_path)] = {
             'get': {
@@ -372,6 +435,38 @@ def get_oas_30(cfg):
             }
         }
 
+    paths['/batch'] = {
+        'post': {
+            'summary': 'Query several feature collections at once',
+            'description': 'Query several feature collections at once',
+            'tags': ['server'],
+            'requestBody': {
+                'description': 'List of queries, objects with a collection and (optional) query parameters',  # noqa
+                'required': True,
+                'content': {
+                    'application/json': {
+                        'schema': {
+                            'type': 'array',
+                            'items': {
+                                'type': 'object',
+                                'required': ['collection'],
+                                'properties': {
+                                    'collection': {'type': 'string'},
+                                    'params': {'type': 'object'}
+                                }
+                            }
+                        }
+                    }
+                }
+            },
+            'responses': {
+                200: {'$ref': '#/components/responses/200'},
+                400: {'$ref': '{}#/components/responses/InvalidParameter'.format(OPENAPI_YAML['oapif'])},  # noqa
+                'default': {'$ref': '#/components/responses/default'}
+            }
+        }
+    }
+
     paths['/processes'] = {
         'get': {
             'summary': 'Processes',
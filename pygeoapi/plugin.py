@@ -30,6 +30,7 @@
 
 import importlib
 import logging
+import threading
 
 LOGGER = logging.getLogger(__name__)
 
@@ -94,6 +95,112 @@ def load_plugin(plugin_type, plugin_def):
     return plugin
 
 
+class PluginRegistry(object):
+    """
+    Registry of long-lived plugin instances
+
+    Plugins are constructed lazily on first use and then reused across
+    requests, so that expensive setup (imports, connections, schema
+    introspection) is paid once per process rather than once per request.
+    Only plugins declaring ``thread_safe = True`` are shared; others are
+    constructed per call, since one instance may serve concurrent requests.
+    """
+
+    def __init__(self, plugin_type, plugin_defs):
+        """
+        Initialize object
+
+        :param plugin_type: type of plugin (provider, process)
+        :param plugin_defs: `dict` of plugin definitions keyed by name
+                            (e.g. dataset or process identifier)
+
+        :returns: pygeoapi.plugin.PluginRegistry
+        """
+
+        self.plugin_type = plugin_type
+        self.plugin_defs = plugin_defs
+        self._plugins = {}
+        self._unshared = set()
+        self._lock = threading.RLock()
+
+    def get(self, name):
+        """
+        Get plugin instance, constructing it on first use
+
+        :param name: name of plugin definition
+
+        :returns: plugin object
+        """
+
+        plugin = self._plugins.get(name)
+        if plugin is not None:
+            return plugin
+
+        if name in self._unshared:
+            return load_plugin(self.plugin_type, self.plugin_defs[name])
+
+        with self._lock:
+            plugin = self._plugins.get(name)
+            if plugin is None:
+                LOGGER.debug('Loading {} {}'.format(self.plugin_type, name))
+                plugin = load_plugin(self.plugin_type, self.plugin_defs[name])
+                if getattr(plugin, 'thread_safe', False):
+                    self._plugins[name] = plugin
+                else:
+                    LOGGER.debug('{} {} is not thread-safe; not shared'.format(
+                        self.plugin_type, name))
+                    self._unshared.add(name)
+
+        return plugin
+
+    def close(self, name=None):
+        """
+        Close and evict plugin instance(s).  Evicted plugins are
+        re-created on next use
+
+        :param name: name of plugin definition (default all)
+
+        :returns: None
+        """
+
+        with self._lock:
+            if name is None:
+                names = list(self._plugins.keys())
+            else:
+                names = [name]
+
+            for name_ in names:
+                plugin = self._plugins.pop(name_, None)
+                if plugin is None or not hasattr(plugin, 'close'):
+                    continue
+                try:
+                    plugin.close()
+                except Exception as err:
+                    LOGGER.warning('Error closing {} {}: {}'.format(
+                        self.plugin_type, name_, err))
+
+    def reload(self, plugin_defs=None):
+        """
+        Close all plugin instances and optionally replace definitions
+
+        :param plugin_defs: `dict` of plugin definitions keyed by name
+
+        :returns: None
+        """
+
+        with self._lock:
+            self.close()
+            self._unshared.clear()
+            if plugin_defs is not None:
+                self.plugin_defs = plugin_defs
+
+    def __contains__(self, name):
+        return name in self.plugin_defs
+
+    def __repr__(self):
+        return '<PluginRegistry> {}'.format(self.plugin_type)
+
+
 class InvalidPluginError(Exception):
     """Invalid plugin"""
     pass
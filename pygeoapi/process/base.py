@@ -35,6 +35,9 @@ LOGGER = logging.getLogger(__name__)
 class BaseProcessor(object):
     """generic Processor ABC. Processes are inherited from this class"""
 
+    # instances may serve concurrent requests (see PluginRegistry)
+    thread_safe = False
+
     def __init__(self, processor_def, process_metadata):
         """
         Initialize object
@@ -83,6 +83,8 @@ PROCESS_METADATA = {
 class HelloWorldProcessor(BaseProcessor):
     """Hello World Processor example"""
 
+    thread_safe = True
+
     def __init__(self, provider_def):
         """
         Initialize object
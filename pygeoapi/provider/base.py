@@ -27,14 +27,22 @@
 #
 # =================================================================
 
+from collections import Counter
+from inspect import signature
+import json
 import logging
 
+from pygeoapi.util import geometry_center, grid_cell
+
 LOGGER = logging.getLogger(__name__)
 
 
 class BaseProvider(object):
     """generic Provider ABC"""
 
+    # instances may serve concurrent requests (see PluginRegistry)
+    thread_safe = False
+
     def __init__(self, provider_def):
         """
         Initialize object
@@ -69,6 +77,65 @@ class BaseProvider(object):
 
         raise NotImplementedError()
 
+    def aggregate(self, grid='geotile', precision=7, size=10000, bbox=[],
+                  datetime=None, properties=[]):
+        """
+        Count features per cell of a grid.  This generic
+        implementation pages through query results, by continuation
+        token with keyset paging or else in order of id_field, so that
+        pages neither overlap nor skip features, and bins features
+        in-process; providers able to aggregate natively override it
+
+        :param grid: geotile or geohash
+        :param precision: zoom level (geotile) or length (geohash)
+        :param size: maximum number of cells to return
+        :param bbox: bounding box [minx,miny,maxx,maxy]
+        :param datetime: temporal (datestamp or extent)
+        :param properties: list of tuples (name, value)
+
+        :returns: `list` of dicts (key, count), most populated first
+        """
+
+        counts = Counter()
+        page_size = 1000
+        startindex = 0
+        token = None
+        parameters = signature(self.query).parameters
+        token_support = 'token' in parameters
+
+        kwargs = {}
+        if token_support and getattr(self, 'paging', None) == 'keyset':
+            LOGGER.debug('Paging by continuation token')
+        elif 'sortby' in parameters:
+            kwargs['sortby'] = [{'property': self.id_field, 'order': 'A'}]
+        elif not token_support:
+            LOGGER.error('{} cannot page in a stable order'.format(self))
+            raise ProviderQueryError()
+
+        while True:
+            if token is not None:
+                kwargs['token'] = token
+            results = self.query(startindex=startindex, limit=page_size,
+                                 bbox=bbox, datetime=datetime,
+                                 properties=properties, **kwargs)
+            features = results['features']
+            if isinstance(features, str):  # serialized by provider
+                features = json.loads(features)
+
+            for feature in features:
+                center = geometry_center(feature.get('geometry'))
+                if center is not None:
+                    counts[grid_cell(grid, center[0], center[1],
+                                     precision)] += 1
+
+            if len(features) < page_size:
+                break
+            startindex += page_size
+            if token_support:
+                token = results.get('next_token')
+
+        return [{'key': k, 'count': v} for k, v in counts.most_common(size)]
+
     def get(self, identifier):
         """
         query the provider by id
@@ -102,6 +169,17 @@ class BaseProvider(object):
 
         raise NotImplementedError()
 
+    def close(self):
+        """
+        Release any resources (connections, file handles) held by
+        the provider.  Called when the provider is evicted from the
+        plugin registry
+
+        :returns: None
+        """
+
+        pass
+
     def __repr__(self):
         return '<BaseProvider> {}'.format(self.type)
 
@@ -116,6 +194,11 @@ class ProviderQueryError(Exception):
     pass
 
 
+class ProviderInvalidQueryError(ProviderQueryError):
+    """invalid query parameters"""
+    pass
+
+
 class ProviderVersionError(Exception):
     """Incorrect provider version"""
     pass
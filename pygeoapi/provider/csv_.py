@@ -27,19 +27,204 @@
 #
 # =================================================================
 
+from array import array
 from collections import OrderedDict
 import csv
-import itertools
+import io
 import logging
+import os
+import threading
 
-from pygeoapi.provider.base import BaseProvider, ProviderQueryError
+from pygeoapi.provider.base import (BaseProvider, ProviderConnectionError,
+                                    ProviderQueryError)
+from pygeoapi.util import file_stamp, get_typed_value, parse_datetime
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 LOGGER = logging.getLogger(__name__)
 
+# identifies (and versions) persisted row index files
+INDEX_MAGIC = 0x70676933
+
+# process-wide row indexes and column stores,
+# keyed by absolute path of CSV file
+_INDEXES = {}
+_COLUMNS = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def _records(path, encoding):
+    """
+    Helper function to parse the records of a CSV file with the
+    `csv` module, keeping track of the byte offsets at which each
+    record starts and ends.  Empty records (blank lines) are skipped,
+    as `csv.DictReader` does
+
+    :param path: path to CSV file
+    :param encoding: encoding of CSV file
+
+    :returns: generator of (start, end, `list` of values) of records,
+              the header being the first record
+    """
+
+    end = 0
+
+    def lines(fh):
+        nonlocal end
+        for line in fh:
+            end += len(line)
+            yield line.decode(encoding)
+
+    with open(path, 'rb') as fh:
+        start = 0
+        # the reader consumes lines up to the end of each record only,
+        # so end is where the record just parsed ends
+        for values in csv.reader(lines(fh)):
+            if values:
+                yield start, end, values
+            start = end
+
+
+def _row_offsets(path, encoding, id_field=None):
+    """
+    Helper function to find the byte offsets of the records of a CSV
+    file and, in the same parse, the positions of their ids
+
+    :param path: path to CSV file
+    :param encoding: encoding of CSV file
+    :param id_field: name of id field to index (optional)
+
+    :returns: `tuple` of `array` of header end offset, record offsets
+              and end offset of the last record, and `dict` of id to
+              record position (`None` without id_field)
+    """
+
+    offsets = array('q')
+    ids = None if id_field is None else {}
+    column = None
+    end = 0
+
+    for start, end, values in _records(path, encoding):
+        if not offsets:  # header
+            offsets.append(end)
+            values[0] = values[0].lstrip('\ufeff')
+            column = {name: i for i, name in enumerate(values)}.get(id_field)
+            continue
+        if ids is not None and column is not None and column < len(values):
+            ids.setdefault(values[column], len(offsets) - 1)
+        offsets.append(start)
+
+    if not offsets:
+        offsets.append(end)
+    offsets.append(end)
+
+    return offsets, ids
+
+
+def _typed_column(values):
+    """
+    Helper function to convert a column of CSV values to a typed
+    column, inferring the type with `get_typed_value`
+
+    :param values: `list` of `str` values
+
+    :returns: `tuple` of (type, NumPy array or `list`) where type
+              is `int`, `float` or `str`
+    """
+
+    typed = [get_typed_value(v) if v != '' else None for v in values]
+    types = set(type(v) for v in typed if v is not None)
+
+    if types and types <= {int} and None not in typed:
+        type_ = int
+    elif types and types <= {int, float}:
+        type_ = float
+        typed = [float('nan') if v is None else float(v) for v in typed]
+    else:
+        return str, numpy.array(values, dtype=object) if numpy else values
+
+    if numpy is not None:
+        typed = numpy.array(typed, dtype=numpy.int64 if type_ is int
+                            else numpy.float64)
+    return type_, typed
+
+
+def _mask_and(mask, other):
+    """
+    Helper function to combine boolean masks
+
+    :param mask: NumPy boolean array or `list` (`None` for all)
+    :param other: NumPy boolean array or `list`
+
+    :returns: NumPy boolean array or `list`
+    """
+
+    if mask is None:
+        return other
+    if numpy is not None:
+        return mask & other
+    return [a and b for a, b in zip(mask, other)]
+
+
+def _mask_range(column, low=None, high=None):
+    """
+    Helper function to test low <= value <= high on a column,
+    missing values never matching
+
+    :param column: NumPy array or `list`
+    :param low: lower bound (`None` for unbounded)
+    :param high: upper bound (`None` for unbounded)
+
+    :returns: NumPy boolean array or `list`
+    """
+
+    if numpy is not None:
+        mask = numpy.ones(len(column), dtype=bool)
+        if low is not None:
+            mask &= column >= low
+        if high is not None:
+            mask &= column <= high
+        return mask
+
+    return [v is not None and v == v and
+            (low is None or v >= low) and (high is None or v <= high)
+            for v in column]
+
+
+def _sort_positions(column, positions, descending=False):
+    """
+    Helper function to (stably) sort row positions by a column,
+    missing values last in either order
+
+    :param column: NumPy array or `list`
+    :param positions: `list` of row positions
+    :param descending: whether to sort in descending order
+
+    :returns: `list` of row positions
+    """
+
+    present = []
+    missing = []
+    for i in positions:
+        v = column[i]
+        if v is None or v != v or (isinstance(v, str) and not v):
+            missing.append(i)
+        else:
+            present.append(i)
+
+    present.sort(key=lambda i: column[i], reverse=descending)
+    return present + missing
+
 
 class CSVProvider(BaseProvider):
     """CSV provider"""
 
+    # caches are process-wide and guarded by _INDEXES_LOCK
+    thread_safe = True
+
     def __init__(self, provider_def):
         """
         Initialize object
@@ -52,67 +237,431 @@ class CSVProvider(BaseProvider):
         BaseProvider.__init__(self, provider_def)
         self.geometry_x = provider_def['geometry']['x_field']
         self.geometry_y = provider_def['geometry']['y_field']
+        self.encoding = provider_def.get('encoding', 'utf-8')
+        # persist row offsets to <data>.idx (if writable), so that
+        # other processes and restarts skip indexing the file
+        self.persist_index = provider_def.get('persist_index', False)
+
+        # load the columns used by filters at startup rather than
+        # on the first filtered query
+        if provider_def.get('columnar', False):
+            self._columns()
+
+        self.fields = self.get_fields()
+
+    def get_fields(self):
+        """
+        Get provider field information (names, types), types being
+        inferred from the first row
+
+        :returns: dict of fields
+        """
+
+        index = self._index()
+        rows = self._read_rows(index, [0])
+        row = rows[0] if rows else {}
+
+        fields_ = {}
+        for name in index['fieldnames']:
+            if name in (self.geometry_x, self.geometry_y):
+                continue
+            value = get_typed_value(row.get(name) or '')
+            if isinstance(value, int):
+                type_ = 'integer'
+            elif isinstance(value, float):
+                type_ = 'number'
+            else:
+                type_ = 'string'
+            fields_[name] = {'type': type_}
+
+        return fields_
+
+    def _columns(self):
+        """
+        Get the in-memory columns of the CSV file (NumPy arrays if
+        available), loading them when the file changed since
+
+        :returns: `dict` of stamp, x, y, time (as naive UTC datetimes)
+                  and typed columns
+        """
+
+        index = self._index()
+        path = os.path.abspath(self.data)
+
+        with _INDEXES_LOCK:
+            columns = _COLUMNS.get((path, self.time_field))
+        if columns is not None and columns['stamp'] == index['stamp']:
+            return columns
+
+        LOGGER.debug('Loading columns of {}'.format(self.data))
+        # parse as the row index does, so that column positions
+        # are record positions
+        values = {name: [] for name in index['fieldnames']}
+        records = _records(self.data, self.encoding)
+        next(records, None)  # header
+        for start, end, row in records:
+            for i, name in enumerate(index['fieldnames']):
+                values[name].append(row[i] if i < len(row) else '')
+
+        def floats(name):
+            column = []
+            for v in values.pop(name, []):
+                try:
+                    column.append(float(v))
+                except ValueError:
+                    column.append(float('nan'))
+            return numpy.array(column) if numpy is not None else column
+
+        columns = {
+            'stamp': index['stamp'],
+            'x': floats(self.geometry_x),
+            'y': floats(self.geometry_y),
+            'time': None,
+            'types': {},
+            'columns': {}
+        }
+
+        if self.time_field in values:
+            times = []
+            for v in values[self.time_field]:
+                try:
+                    times.append(parse_datetime(v))
+                except (ValueError, OverflowError):
+                    times.append(None)
+            if numpy is not None:
+                times = numpy.array(
+                    [numpy.datetime64('NaT') if t is None else t
+                     for t in times], dtype='datetime64[us]')
+            columns['time'] = times
+
+        for name, column in values.items():
+            columns['types'][name], columns['columns'][name] = \
+                _typed_column(column)
+
+        with _INDEXES_LOCK:
+            _COLUMNS[(path, self.time_field)] = columns
+
+        return columns
+
+    def _filter(self, bbox=[], datetime_=None, properties=[], sortby=[]):
+        """
+        Find the rows matching filters, evaluated as (vectorized)
+        masks over the in-memory columns
+
+        :param bbox: bounding box [minx,miny,maxx,maxy]
+        :param datetime_: temporal (datestamp or extent)
+        :param properties: list of tuples (name, value)
+        :param sortby: list of dicts (property, order)
+
+        :returns: `list` of row positions
+        """
+
+        columns = self._columns()
+        mask = None
+
+        if bbox:
+            minx, miny, maxx, maxy = [float(c) for c in bbox]
+            mask = _mask_and(_mask_range(columns['x'], minx, maxx),
+                             _mask_range(columns['y'], miny, maxy))
+
+        if datetime_ is not None:
+            if columns['time'] is None:
+                LOGGER.error('time_field not enabled for collection')
+                raise ProviderQueryError()
+
+            if '/' in datetime_:
+                time_begin, time_end = datetime_.split('/')
+            else:
+                time_begin = time_end = datetime_
+
+            bounds = []
+            for value in (time_begin, time_end):
+                if value in ('..', ''):
+                    bounds.append(None)
+                    continue
+                try:
+                    value = parse_datetime(value)
+                except (ValueError, OverflowError) as err:
+                    LOGGER.error('Invalid datetime {}: {}'.format(
+                        datetime_, err))
+                    raise ProviderQueryError()
+                if numpy is not None:
+                    value = numpy.datetime64(value, 'us')
+                bounds.append(value)
+
+            mask = _mask_and(mask, _mask_range(columns['time'], *bounds))
+
+        for name, value in properties:
+            if name not in columns['columns']:
+                LOGGER.error('Unknown property {}'.format(name))
+                raise ProviderQueryError()
+
+            type_ = columns['types'][name]
+            column = columns['columns'][name]
+            if type_ is not str:
+                value = get_typed_value(value)
+                if not isinstance(value, (int, float)):
+                    value = None
+
+            if numpy is not None:
+                other = column == value
+            else:
+                other = [v == value for v in column]
+            mask = _mask_and(mask, other)
+
+        if mask is None:
+            positions = list(range(len(columns['x'])))
+        elif numpy is not None:
+            positions = numpy.flatnonzero(mask).tolist()
+        else:
+            positions = [i for i, m in enumerate(mask) if m]
+
+        # stable sorts, least significant property first
+        for s in reversed(sortby):
+            if s['property'] not in columns['columns']:
+                LOGGER.error('Unknown property {}'.format(s['property']))
+                raise ProviderQueryError()
+            positions = _sort_positions(columns['columns'][s['property']],
+                                        positions, s['order'] == 'D')
+
+        return positions
+
+    def _index(self):
+        """
+        Get the row index of the CSV file, building it when the
+        file changed since it was last indexed
+
+        :returns: `dict` of stamp, fieldnames, offsets
+                  (header end, records, end of file) and id indexes
+        """
+
+        path = os.path.abspath(self.data)
+        stamp = file_stamp(path)
+        if stamp is None:
+            msg = 'Cannot read {}'.format(self.data)
+            LOGGER.error(msg)
+            raise ProviderConnectionError(msg)
+
+        with _INDEXES_LOCK:
+            index = _INDEXES.get(path)
+        if index is not None and index['stamp'] == stamp:
+            return index
+
+        ids = {}
+        offsets = self._read_index(stamp)
+        if offsets is None:
+            LOGGER.debug('Indexing {}'.format(self.data))
+            offsets, id_index = _row_offsets(path, self.encoding,
+                                             self.id_field)
+            ids[self.id_field] = id_index
+            self._write_index(stamp, offsets)
+
+        with open(path, 'rb') as fh:
+            header = fh.read(offsets[0]).decode(self.encoding)
+        reader = csv.reader(io.StringIO(header.lstrip('\ufeff'), newline=''))
+        fieldnames = next((values for values in reader if values), [])
+
+        index = {
+            'stamp': stamp,
+            'fieldnames': fieldnames,
+            'offsets': offsets,
+            'ids': ids
+        }
+
+        with _INDEXES_LOCK:
+            _INDEXES[path] = index
+
+        return index
+
+    def _id_index(self, index):
+        """
+        Get the index of feature ids of the CSV file, building it
+        on first use for this version of the file
+
+        :param index: row index as returned by `_index`
+
+        :returns: `dict` of feature id to record position
+        """
+
+        with _INDEXES_LOCK:
+            id_index = index['ids'].get(self.id_field)
+        if id_index is not None:
+            return id_index
+
+        # ids are indexed when the file is, unless the row index was
+        # read from disk or was built for another id field
+        LOGGER.debug('Indexing ids of {}'.format(self.data))
+        offsets, id_index = _row_offsets(self.data, self.encoding,
+                                         self.id_field)
+        if offsets != index['offsets']:
+            msg = '{} changed while indexing'.format(self.data)
+            LOGGER.error(msg)
+            raise ProviderQueryError(msg)
+
+        with _INDEXES_LOCK:
+            index['ids'][self.id_field] = id_index
+
+        return id_index
+
+    def _read_index(self, stamp):
+        """
+        Read the row index persisted next to the CSV file
+
+        :param stamp: version of the CSV file
+
+        :returns: `array` of offsets or `None` if missing or outdated
+        """
+
+        index_path = '{}.idx'.format(self.data)
+        if not self.persist_index or not os.path.exists(index_path):
+            return None
+
+        offsets = array('q')
+        try:
+            with open(index_path, 'rb') as fh:
+                offsets.frombytes(fh.read())
+        except (OSError, ValueError) as err:
+            LOGGER.warning('Cannot read {}: {}'.format(index_path, err))
+            return None
+
+        header = (INDEX_MAGIC, ) + stamp
+        if tuple(offsets[:len(header)]) != header:
+            LOGGER.debug('Outdated index {}'.format(index_path))
+            return None
+
+        return offsets[len(header):]
+
+    def _write_index(self, stamp, offsets):
+        """
+        Persist the row index next to the CSV file
+
+        :param stamp: version of the CSV file
+        :param offsets: `array` of offsets
+
+        :returns: None
+        """
+
+        if not self.persist_index:
+            return
+
+        index_path = '{}.idx'.format(self.data)
+        tmp_path = '{}.tmp'.format(index_path)
+        try:
+            with open(tmp_path, 'wb') as fh:
+                fh.write(array('q', (INDEX_MAGIC, ) + stamp).tobytes())
+                fh.write(offsets.tobytes())
+            os.replace(tmp_path, index_path)
+        except OSError as err:
+            LOGGER.warning('Cannot write {}: {}'.format(index_path, err))
+
+    def _read_rows(self, index, positions):
+        """
+        Read records of the CSV file, with a single open of the file
+        and one read per run of consecutive records
+
+        :param index: row index as returned by `_index`
+        :param positions: iterable of record positions
+
+        :returns: `list` of `dict` rows, in the order of positions
+        """
+
+        offsets = index['offsets']
+        count = len(offsets) - 2
+
+        runs = []
+        for i in positions:
+            if not 0 <= i < count:
+                continue
+            if runs and runs[-1][1] == i:
+                runs[-1][1] = i + 1
+            else:
+                runs.append([i, i + 1])
+
+        rows = []
+        if not runs:
+            return rows
+
+        with open(self.data, 'rb') as fh:
+            for start, end in runs:
+                fh.seek(offsets[start + 1])
+                chunk = fh.read(offsets[end + 1] - offsets[start + 1])
+                reader = csv.DictReader(
+                    io.StringIO(chunk.decode(self.encoding), newline=''),
+                    fieldnames=index['fieldnames'])
+                rows.extend(reader)
+
+        return rows
+
+    def _feature(self, row):
+        """
+        Assemble a GeoJSON feature from a CSV row
+
+        :param row: `dict` of CSV row
+
+        :returns: `dict` of GeoJSON feature
+        """
+
+        feature = {'type': 'Feature'}
+        feature['id'] = row.pop(self.id_field)
+        feature['geometry'] = {
+            'type': 'Point',
+            'coordinates': [
+                float(row.pop(self.geometry_x)),
+                float(row.pop(self.geometry_y))
+            ]
+        }
+        if self.properties:
+            feature['properties'] = OrderedDict()
+            for p in self.properties:
+                try:
+                    feature['properties'][p] = row[p]
+                except KeyError as err:
+                    LOGGER.error(err)
+                    raise ProviderQueryError()
+        else:
+            feature['properties'] = row
+
+        return feature
 
     def _load(self, startindex=0, limit=10, resulttype='results',
-              identifier=None, bbox=[], datetime=None, properties=[]):
+              bbox=[], datetime=None, properties=[], sortby=[]):
         """
         Load CSV data
 
         :param startindex: starting record to return (default 0)
         :param limit: number of records to return (default 10)
         :param resulttype: return results or hit limit (default results)
+        :param bbox: bounding box [minx,miny,maxx,maxy]
+        :param datetime: temporal (datestamp or extent)
         :param properties: list of tuples (name, value)
+        :param sortby: list of dicts (property, order)
 
         :returns: dict of GeoJSON FeatureCollection
         """
 
-        found = False
-        result = None
         feature_collection = {
             'type': 'FeatureCollection',
             'features': []
         }
 
-        with open(self.data) as ff:
-            LOGGER.debug('Serializing DictReader')
-            data_ = csv.DictReader(ff)
-            if resulttype == 'hits':
-                LOGGER.debug('Returning hits only')
-                feature_collection['numberMatched'] = len(list(data_))
-                return feature_collection
-            LOGGER.debug('Slicing CSV rows')
-            for row in itertools.islice(data_, startindex, startindex+limit):
-                feature = {'type': 'Feature'}
-                feature['id'] = row.pop(self.id_field)
-                feature['geometry'] = {
-                    'type': 'Point',
-                    'coordinates': [
-                        float(row.pop(self.geometry_x)),
-                        float(row.pop(self.geometry_y))
-                    ]
-                }
-                if self.properties:
-                    feature['properties'] = OrderedDict()
-                    for p in self.properties:
-                        try:
-                            feature['properties'][p] = row[p]
-                        except KeyError as err:
-                            LOGGER.error(err)
-                            raise ProviderQueryError()
-                else:
-                    feature['properties'] = row
-
-                if identifier is not None and feature['id'] == identifier:
-                    found = True
-                    result = feature
-                feature_collection['features'].append(feature)
-                feature_collection['numberMatched'] = \
-                    len(feature_collection['features'])
-
-        if identifier is not None and not found:
-            return None
-        elif identifier is not None and found:
-            return result
+        index = self._index()
+
+        if bbox or datetime is not None or properties or sortby:
+            positions = self._filter(bbox, datetime, properties, sortby)
+        else:
+            # offsets hold the header end and file size besides records
+            positions = range(len(index['offsets']) - 2)
+        feature_collection['numberMatched'] = len(positions)
+
+        if resulttype == 'hits':
+            LOGGER.debug('Returning hits only')
+            return feature_collection
+
+        LOGGER.debug('Slicing CSV rows')
+        rows = self._read_rows(index, positions[startindex:startindex+limit])
+
+        for row in rows:
+            feature_collection['features'].append(self._feature(row))
 
         feature_collection['numberReturned'] = len(
             feature_collection['features'])
@@ -135,7 +684,9 @@ class CSVProvider(BaseProvider):
         :returns: dict of GeoJSON FeatureCollection
         """
 
-        return self._load(startindex, limit, resulttype)
+        return self._load(startindex, limit, resulttype, bbox=bbox,
+                          datetime=datetime, properties=properties,
+                          sortby=sortby)
 
     def get(self, identifier):
         """
@@ -146,7 +697,13 @@ class CSVProvider(BaseProvider):
         :returns: dict of single GeoJSON feature
         """
 
-        return self._load(identifier=identifier)
+        index = self._index()
+        position = self._id_index(index).get(str(identifier))
+        if position is None:
+            return None
+
+        rows = self._read_rows(index, [position])
+        return self._feature(rows[0]) if rows else None
 
     def __repr__(self):
         return '<CSVProvider> {}'.format(self.data)
@@ -28,20 +28,79 @@
 # =================================================================
 
 from collections import OrderedDict
+import json
 import logging
+import threading
+import time
 
-from elasticsearch import Elasticsearch, exceptions, helpers
+from elasticsearch import Elasticsearch, exceptions
 from elasticsearch.client.indices import IndicesClient
 
 from pygeoapi.provider.base import (BaseProvider, ProviderConnectionError,
                                     ProviderQueryError)
+from pygeoapi.util import decode_token, encode_token
 
 LOGGER = logging.getLogger(__name__)
 
+#: Elasticsearch clients, keyed by host and client settings
+_CLIENTS = {}
+#: Field information, keyed by host, index and type
+_FIELDS = {}
+#: Counts of matching documents, keyed by host, index and query
+_COUNTS = OrderedDict()
+_COUNTS_MAX_SIZE = 1000
+_CLIENTS_LOCK = threading.Lock()
+
+
+def get_client(host, client_def=None):
+    """
+    Get (or create) the Elasticsearch client shared by all providers
+    of a host.  Clients keep a pool of persistent (keep-alive) HTTP
+    connections and do not sniff the cluster
+
+    :param host: Elasticsearch host
+    :param client_def: `dict` of client settings (e.g. maxsize, timeout)
+
+    :returns: `elasticsearch.Elasticsearch`
+    """
+
+    settings = {
+        'maxsize': 10,
+        'sniff_on_start': False,
+        'sniff_on_connection_fail': False,
+        'sniffer_timeout': None
+    }
+    settings.update(client_def or {})
+    # settings may hold lists or dicts (e.g. http_auth, headers)
+    key = (host, json.dumps(settings, sort_keys=True, default=str))
+
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(key)
+    if client is not None:
+        return client
+
+    LOGGER.debug('Connecting to Elasticsearch')
+    client = Elasticsearch(host, **settings)
+    if not client.ping():
+        msg = 'Cannot connect to Elasticsearch'
+        LOGGER.error(msg)
+        raise ProviderConnectionError(msg)
+
+    with _CLIENTS_LOCK:
+        shared = _CLIENTS.setdefault(key, client)
+    if shared is not client:
+        # another thread connected first
+        client.transport.close()
+
+    return shared
+
 
 class ElasticsearchProvider(BaseProvider):
     """Elasticsearch Provider"""
 
+    # the shared Elasticsearch client is thread-safe
+    thread_safe = True
+
     def __init__(self, provider_def):
         """
         Initialize object
@@ -63,23 +122,95 @@ class ElasticsearchProvider(BaseProvider):
         LOGGER.debug('index: {}'.format(self.index_name))
         LOGGER.debug('type: {}'.format(self.type_name))
 
-        LOGGER.debug('Connecting to Elasticsearch')
-        self.es = Elasticsearch(self.es_host)
-        if not self.es.ping():
-            msg = 'Cannot connect to Elasticsearch'
+        # e.g. maxsize (connections per host), timeout
+        self.client_def = provider_def.get('client', {})
+        # seconds to cache field information for (0 to request it
+        # on every use)
+        self.fields_ttl = provider_def.get('fields_ttl', 300)
+
+        # offset (default) or keyset (search_after)
+        self.paging = provider_def.get('paging', 'offset')
+        if self.paging not in ('offset', 'keyset'):
+            msg = 'Invalid paging: {}'.format(self.paging)
             LOGGER.error(msg)
-            raise ProviderConnectionError(msg)
+            raise ProviderQueryError(msg)
+        # search_after pages within a point in time of the index
+        self.point_in_time = provider_def.get('point_in_time', False)
+        self.point_in_time_keep_alive = provider_def.get(
+            'point_in_time_keep_alive', '1m')
+        # true (exact), false (off) or a number to count exactly up to;
+        # Elasticsearch counts up to 10000 hits when not set
+        self.track_total_hits = provider_def.get('track_total_hits')
+        # seconds to cache hits counts for (0 to disable)
+        self.count_ttl = provider_def.get('count_ttl', 30)
+        # geometry field of bbox filters; grid aggregations need it to
+        # be a geo_point field and are run in-process otherwise
+        self.geo_field = provider_def.get('geo_field', 'geometry')
+        self._geo_field_type = None
+        # deepest from + size Elasticsearch allows (index setting)
+        self.max_result_window = int(provider_def.get(
+            'max_result_window', 10000))
+
+        self.es = get_client(self.es_host, self.client_def)
 
         LOGGER.debug('Grabbing field information')
         try:
-            self.fields = self.get_fields()
+            self.get_fields()
         except exceptions.NotFoundError as err:
             LOGGER.error(err)
             raise ProviderQueryError(err)
 
+    @property
+    def fields(self):
+        """
+        Field information (names, types), through the cache of
+        `get_fields`, so that long-lived providers see mapping changes
+        """
+
+        return self.get_fields()
+
+    @fields.setter
+    def fields(self, value):
+        # set by BaseProvider, the index mapping is authoritative
+        pass
+
     def get_fields(self):
         """
-         Get provider field information (names, types)
+         Get provider field information (names, types), cached for
+         `fields_ttl` seconds.  Expired information is used while the
+         index mapping cannot be requested
+
+        :returns: dict of fields
+        """
+
+        if not self.fields_ttl:
+            return self._get_fields()
+
+        key = (self.es_host, self.index_name, self.type_name)
+        now = time.monotonic()
+
+        with _CLIENTS_LOCK:
+            cached = _FIELDS.get(key)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+
+        try:
+            fields_ = self._get_fields()
+        except exceptions.TransportError as err:
+            if cached is None:
+                raise
+            LOGGER.warning('Using expired field information: {}'.format(
+                err))
+            return cached[1]
+
+        with _CLIENTS_LOCK:
+            _FIELDS[key] = (now + self.fields_ttl, fields_)
+
+        return fields_
+
+    def _get_fields(self):
+        """
+        Get field information from the index mapping
 
         :returns: dict of fields
         """
@@ -99,8 +230,26 @@ class ElasticsearchProvider(BaseProvider):
 
         return fields_
 
+    def get_geo_field_type(self):
+        """
+        Get the mapping type of the geometry field (geo_point or
+        geo_shape), requested once per provider
+
+        :returns: `str` of mapping type, or `None` if not mapped
+        """
+
+        if self._geo_field_type is None:
+            ic = IndicesClient(self.es)
+            ii = ic.get(self.index_name)
+            mapping = ii[self.index_name]['mappings'][self.type_name]
+            for name in self.geo_field.split('.'):
+                mapping = mapping.get('properties', {}).get(name, {})
+            self._geo_field_type = mapping.get('type', '')
+
+        return self._geo_field_type or None
+
     def query(self, startindex=0, limit=10, resulttype='results',
-              bbox=[], datetime=None, properties=[], sortby=[]):
+              bbox=[], datetime=None, properties=[], sortby=[], token=None):
         """
         query Elasticsearch index
 
@@ -111,36 +260,241 @@ class ElasticsearchProvider(BaseProvider):
         :param datetime: temporal (datestamp or extent)
         :param properties: list of tuples (name, value)
         :param sortby: list of dicts (property, order)
+        :param token: continuation token from a previous page
 
         :returns: dict of 0..n GeoJSON features
         """
 
-        query = {'query': {'bool': {'filter': []}}}
-        filter_ = []
+        query = self.__build_query(bbox, datetime, properties, sortby)
 
         feature_collection = {
             'type': 'FeatureCollection',
             'features': []
         }
 
-        if resulttype == 'hits':
-            LOGGER.debug('hits only specified')
-            limit = 0
+        search_after = (self.paging == 'keyset' or token is not None or
+                        startindex + limit > self.max_result_window)
+
+        try:
+            LOGGER.debug('querying Elasticsearch')
+            if resulttype == 'hits':
+                LOGGER.debug('hits only specified')
+                feature_collection['numberMatched'] = self.__count(query)
+                return feature_collection
+            elif search_after:
+                results = self.__search_after(query, startindex, limit,
+                                              token)
+            else:
+                results = self.es.search(index=self.index_name,
+                                         from_=startindex, size=limit,
+                                         body=query)
+        except exceptions.ConnectionError as err:
+            LOGGER.error(err)
+            raise ProviderConnectionError()
+        except exceptions.RequestError as err:
+            LOGGER.error(err)
+            raise ProviderQueryError()
+        except exceptions.NotFoundError as err:
+            LOGGER.error(err)
+            raise ProviderQueryError()
+
+        self.__response_features(results, feature_collection)
+
+        if search_after and 0 < limit == len(results['hits']['hits']):
+            state = {'after': results['hits']['hits'][-1]['sort']}
+            if 'pit_id' in results:
+                state['pit'] = results['pit_id']
+            feature_collection['next_token'] = encode_token(state)
+
+        return feature_collection
+
+    def aggregate(self, grid='geotile', precision=7, size=10000, bbox=[],
+                  datetime=None, properties=[]):
+        """
+        Count documents per cell of a grid with a geotile_grid or
+        geohash_grid aggregation of the geo_point field.  Grids of
+        geo_shape fields need a commercial license, so features are
+        binned in-process by `BaseProvider.aggregate` for other fields
+
+        :param grid: geotile or geohash
+        :param precision: zoom level (geotile) or length (geohash)
+        :param size: maximum number of cells to return
+        :param bbox: bounding box [minx,miny,maxx,maxy]
+        :param datetime: temporal (datestamp or extent)
+        :param properties: list of tuples (name, value)
+
+        :returns: `list` of dicts (key, count), most populated first
+        """
+
+        try:
+            geo_field_type = self.get_geo_field_type()
+        except exceptions.ConnectionError as err:
+            LOGGER.error(err)
+            raise ProviderConnectionError()
+        except exceptions.TransportError as err:
+            LOGGER.error(err)
+            raise ProviderQueryError()
+
+        if geo_field_type != 'geo_point':
+            LOGGER.debug('{} is not a geo_point field, aggregating '
+                         'in-process'.format(self.geo_field))
+            return BaseProvider.aggregate(
+                self, grid, precision, size, bbox, datetime, properties)
+
+        query = self.__build_query(bbox, datetime, properties)
+        query['size'] = 0
+        query['track_total_hits'] = False
+        query['aggs'] = {
+            'grid': {
+                '{}_grid'.format(grid): {
+                    'field': self.geo_field,
+                    'precision': precision,
+                    'size': size
+                }
+            }
+        }
+
+        try:
+            LOGGER.debug('aggregating Elasticsearch')
+            results = self.es.search(index=self.index_name, body=query)
+        except exceptions.ConnectionError as err:
+            LOGGER.error(err)
+            raise ProviderConnectionError()
+        except exceptions.TransportError as err:
+            LOGGER.error(err)
+            raise ProviderQueryError()
+
+        return [{'key': b['key'], 'count': b['doc_count']}
+                for b in results['aggregations']['grid']['buckets']]
+
+    @classmethod
+    def query_batch(cls, queries):
+        """
+        Run the queries of one or more Elasticsearch providers with
+        one _msearch request per client.  Queries paging with
+        search_after need more than one request and run on their own,
+        as do hits, so that they are counted (and cached) as by `query`
+
+        :param queries: list of tuples (provider, dict of query arguments)
+
+        :returns: list of dict of 0..n GeoJSON features, or of
+                  `ProviderConnectionError`/`ProviderQueryError` for
+                  failed queries
+        """
+
+        results = [None] * len(queries)
+        searches = OrderedDict()
+
+        for i, (p, args) in enumerate(queries):
+            args = dict(args)
+            startindex = args.pop('startindex', 0)
+            limit = args.pop('limit', 10)
+            resulttype = args.pop('resulttype', 'results')
+            token = args.pop('token', None)
+
+            try:
+                if resulttype == 'hits' or p.paging == 'keyset' or \
+                        token is not None or \
+                        startindex + limit > p.max_result_window:
+                    results[i] = p.query(startindex, limit, resulttype,
+                                         token=token, **args)
+                    continue
+                body = p.__build_query(**args)
+            except (ProviderConnectionError, ProviderQueryError) as err:
+                results[i] = err
+                continue
+
+            body.update({'from': startindex, 'size': limit})
+            searches.setdefault(id(p.es), (p.es, []))[1].append((i, p, body))
+
+        for es, items in searches.values():
+            request = []
+            for _, p, body in items:
+                request.extend([{'index': p.index_name}, body])
+
+            LOGGER.debug('querying Elasticsearch ({} searches)'.format(
+                len(items)))
+            try:
+                responses = es.msearch(body=request)['responses']
+            except exceptions.ConnectionError as err:
+                LOGGER.error(err)
+                for i, _, _ in items:
+                    results[i] = ProviderConnectionError()
+                continue
+            except exceptions.TransportError as err:
+                LOGGER.error(err)
+                for i, _, _ in items:
+                    results[i] = ProviderQueryError()
+                continue
+
+            for (i, p, _), response in zip(items, responses):
+                if 'error' in response:
+                    LOGGER.error(response['error'])
+                    results[i] = ProviderQueryError()
+                    continue
+
+                feature_collection = {
+                    'type': 'FeatureCollection',
+                    'features': []
+                }
+                try:
+                    results[i] = p.__response_features(
+                        response, feature_collection)
+                except ProviderQueryError as err:
+                    results[i] = err
+
+        return results
+
+    def __build_query(self, bbox=[], datetime=None, properties=[],
+                      sortby=[]):
+        """
+        Private method to assemble the Elasticsearch query body
+        of a query
+
+        :param bbox: bounding box [minx,miny,maxx,maxy]
+        :param datetime: temporal (datestamp or extent)
+        :param properties: list of tuples (name, value)
+        :param sortby: list of dicts (property, order)
+
+        :returns: `dict` of Elasticsearch query body
+        """
+
+        query = {'query': {'bool': {'filter': []}}}
+        filter_ = []
 
         if bbox:
             LOGGER.debug('processing bbox parameter')
             minx, miny, maxx, maxy = bbox
-            bbox_filter = {
-                'geo_shape': {
-                    'geometry': {
-                        'shape': {
-                            'type': 'envelope',
-                            'coordinates': [[minx, miny], [maxx, maxy]]
-                        },
-                        'relation': 'intersects'
+            try:
+                geo_field_type = self.get_geo_field_type()
+            except exceptions.ConnectionError as err:
+                LOGGER.error(err)
+                raise ProviderConnectionError()
+            except exceptions.TransportError as err:
+                LOGGER.error(err)
+                raise ProviderQueryError()
+
+            if geo_field_type == 'geo_point':
+                bbox_filter = {
+                    'geo_bounding_box': {
+                        self.geo_field: {
+                            'top_left': [minx, maxy],
+                            'bottom_right': [maxx, miny]
+                        }
+                    }
+                }
+            else:
+                bbox_filter = {
+                    'geo_shape': {
+                        self.geo_field: {
+                            'shape': {
+                                'type': 'envelope',
+                                'coordinates': [[minx, miny], [maxx, maxy]]
+                            },
+                            'relation': 'intersects'
+                        }
                     }
                 }
-            }
 
             query['query']['bool']['filter'].append(bbox_filter)
 
@@ -194,13 +548,7 @@ class ElasticsearchProvider(BaseProvider):
             for sort in sortby:
                 LOGGER.debug('processing sort object: {}'.format(sort))
 
-                sp = sort['property']
-
-                if self.fields[sp]['type'] == 'string':
-                    LOGGER.debug('setting ES .raw on property')
-                    sort_property = 'properties.{}.raw'.format(sp)
-                else:
-                    sort_property = 'properties.{}'.format(sp)
+                sort_property = self.__sort_property(sort['property'])
 
                 sort_order = 'asc'
                 if sort['order'] == 'D':
@@ -223,41 +571,29 @@ class ElasticsearchProvider(BaseProvider):
                 self.id_field))
             query['_source']['includes'].append('type')
             query['_source']['includes'].append('geometry')
-        try:
-            LOGGER.debug('querying Elasticsearch')
-            if startindex + limit > 10000:
-                gen = helpers.scan(client=self.es, query=query,
-                                   preserve_order=True,
-                                   index=self.index_name)
-                results = {'hits': {'total': limit, 'hits': []}}
-                for i in range(startindex + limit):
-                    try:
-                        if i >= startindex:
-                            results['hits']['hits'].append(next(gen))
-                        else:
-                            next(gen)
-                    except StopIteration:
-                        break
-                results['hits']['total'] = \
-                    len(results['hits']['hits']) + startindex
-            else:
-                results = self.es.search(index=self.index_name,
-                                         from_=startindex, size=limit,
-                                         body=query)
-        except exceptions.ConnectionError as err:
-            LOGGER.error(err)
-            raise ProviderConnectionError()
-        except exceptions.RequestError as err:
-            LOGGER.error(err)
-            raise ProviderQueryError()
-        except exceptions.NotFoundError as err:
-            LOGGER.error(err)
-            raise ProviderQueryError()
+        if self.track_total_hits is not None:
+            query['track_total_hits'] = self.track_total_hits
+
+        return query
+
+    def __response_features(self, results, feature_collection):
+        """
+        Private method to serialize an Elasticsearch search response
+        into a feature collection
+
+        :param results: Elasticsearch search response
+        :param feature_collection: dict of GeoJSON FeatureCollection
 
-        feature_collection['numberMatched'] = results['hits']['total']
+        :returns: dict of GeoJSON FeatureCollection
+        """
 
-        if resulttype == 'hits':
-            return feature_collection
+        # Elasticsearch 7 reports {value, relation}, a lower bound when
+        # the count is capped, and no total at all when not tracked
+        total = results['hits'].get('total')
+        if isinstance(total, dict):
+            total = total['value']
+        if total is not None:
+            feature_collection['numberMatched'] = total
 
         feature_collection['numberReturned'] = len(results['hits']['hits'])
 
@@ -287,6 +623,153 @@ class ElasticsearchProvider(BaseProvider):
 
         return feature_collection
 
+    def __sort_property(self, name):
+        """
+        Private method to get the Elasticsearch field to sort on
+        for a property, using the keyword (.raw) field of text
+
+        :param name: property name
+
+        :returns: `str` of field
+        """
+
+        if self.fields.get(name, {}).get('type') == 'string':
+            LOGGER.debug('setting ES .raw on property')
+            return 'properties.{}.raw'.format(name)
+        return 'properties.{}'.format(name)
+
+    def __count(self, query):
+        """
+        Private method to count the documents matching a query with
+        the _count API, cached for `count_ttl` seconds
+
+        :param query: Elasticsearch query body
+
+        :returns: `int` of matching documents
+        """
+
+        body = {'query': query['query']}
+        key = (self.es_host, self.index_name,
+               json.dumps(body, sort_keys=True, default=str))
+        now = time.monotonic()
+
+        if self.count_ttl:
+            with _CLIENTS_LOCK:
+                cached = _COUNTS.get(key)
+            if cached is not None and cached[0] > now:
+                return cached[1]
+
+        count = self.es.count(index=self.index_name, body=body)['count']
+
+        if self.count_ttl:
+            with _CLIENTS_LOCK:
+                _COUNTS[key] = (now + self.count_ttl, count)
+                _COUNTS.move_to_end(key)
+                while len(_COUNTS) > _COUNTS_MAX_SIZE:
+                    _COUNTS.popitem(last=False)
+
+        return count
+
+    def __search_after(self, query, startindex, limit, token=None):
+        """
+        Private method to page through results with search_after on
+        a stable sort (id_field as tiebreaker), optionally within a
+        point in time.  Without a token, the first `startindex`
+        results are skipped in requests of at most
+        `max_result_window` sort values each
+
+        :param query: Elasticsearch query body
+        :param startindex: starting record to return
+        :param limit: number of records to return
+        :param token: continuation token from a previous page
+
+        :returns: Elasticsearch search response
+        """
+
+        query = dict(query)
+        query['sort'] = list(query.get('sort', []))
+        id_property = self.__sort_property(self.id_field)
+        if id_property not in [list(s)[0] for s in query['sort']]:
+            query['sort'].append({id_property: {'order': 'asc'}})
+
+        after = None
+        pit = None
+        if token is not None:
+            try:
+                state = decode_token(token)
+                after = state['after']
+                pit = state.get('pit')
+            except (ValueError, TypeError, KeyError):
+                raise ProviderQueryError()
+            if not isinstance(after, list) or \
+                    len(after) != len(query['sort']):
+                LOGGER.error('Token does not match sort keys')
+                raise ProviderQueryError()
+            startindex = 0
+        elif self.point_in_time:
+            LOGGER.debug('opening point in time')
+            pit = self.es.transport.perform_request(
+                'POST', '/{}/_pit'.format(self.index_name),
+                params={'keep_alive': self.point_in_time_keep_alive})['id']
+
+        def search(body, size):
+            body = dict(body, size=size)
+            if after is not None:
+                body['search_after'] = after
+            if pit is None:
+                return self.es.search(index=self.index_name, body=body)
+            body['pit'] = {
+                'id': pit,
+                'keep_alive': self.point_in_time_keep_alive
+            }
+            return self.es.search(body=body)
+
+        try:
+            while startindex > 0:
+                size = min(startindex, self.max_result_window)
+                LOGGER.debug('skipping {} results'.format(size))
+                results = search(dict(query, _source=False,
+                                      track_total_hits=False), size)
+                hits = results['hits']['hits']
+                pit = results.get('pit_id', pit)
+                if not hits:
+                    break
+                after = hits[-1]['sort']
+                startindex -= len(hits)
+                if len(hits) < size:
+                    break
+
+            results = search(query, limit)
+            pit = results.get('pit_id', pit)
+        except Exception:
+            if pit is not None:
+                self.__close_point_in_time(pit)
+            raise
+
+        # no continuation token is issued after the last page
+        if pit is not None and \
+                not 0 < limit == len(results['hits']['hits']):
+            self.__close_point_in_time(pit)
+
+        return results
+
+    def __close_point_in_time(self, pit):
+        """
+        Private method to close a point in time, rather than letting
+        it expire
+
+        :param pit: point in time id
+
+        :returns: None
+        """
+
+        LOGGER.debug('closing point in time')
+        try:
+            self.es.transport.perform_request('DELETE', '/_pit',
+                                              body={'id': pit})
+        except exceptions.TransportError as err:
+            LOGGER.warning('Cannot close point in time: {}'.format(err))
+
     def get(self, identifier):
         """
         Get ES document by id
@@ -27,15 +27,379 @@
 #
 # =================================================================
 
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from contextlib import contextmanager
+from itertools import islice
 import json
 import logging
 import os
+import math
+import mmap
+import re
+import threading
 import uuid
 
-from pygeoapi.provider.base import BaseProvider
+from pygeoapi.provider.base import BaseProvider, ProviderQueryError
+from pygeoapi.util import file_stamp, geometry_envelope, parse_datetime
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 LOGGER = logging.getLogger(__name__)
 
+# process-wide cache of parsed files, keyed by (absolute path, id_field)
+_CACHE = OrderedDict()
+_CACHE_LOCK = threading.Lock()
+# data files with a journal compaction under way in this process
+_COMPACTING = set()
+# process-wide byte offset indexes of files read in streaming mode
+_STREAMS = {}
+
+_SEPARATORS = re.compile(br'[\s,]*')
+
+# features changed since the R-tree was built are checked one by one,
+# up to this many, beyond which the R-tree is rebuilt
+_CHANGED_MAX = 1024
+
+
+def _size(stamp):
+    """
+    Helper function to get the size on disk of a data file and journal
+
+    :param stamp: `tuple` of data file and journal stamps
+
+    :returns: `int` of bytes
+    """
+
+    return sum(s[1] for s in stamp if s is not None)
+
+
+@contextmanager
+def _locked(path, exclusive=False):
+    """
+    Helper context manager holding an advisory lock (across processes)
+    on the lock file next to a data file
+
+    Shared locks are skipped when there is no lock file yet, so that
+    read-only data directories keep working.
+
+    :param path: path to data file
+    :param exclusive: whether to take an exclusive (write) lock
+    """
+
+    lock_path = '{}.lock'.format(path)
+    try:
+        fh = open(lock_path, 'a' if exclusive else 'r')
+    except OSError:
+        if exclusive:
+            raise
+        yield
+        return
+
+    with fh:
+        if fcntl is not None:
+            fcntl.flock(fh, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def _copy_feature(feature):
+    """
+    Helper function to shallow copy a cached feature, so that
+    callers decorating the result do not alter the cache
+
+    :param feature: GeoJSON feature `dict`
+
+    :returns: `dict` of GeoJSON feature
+    """
+
+    return dict(feature, properties=dict(feature['properties']))
+
+
+def _value_key(value):
+    """
+    Helper function to compare property values with the (string)
+    values of property filters
+
+    :param value: property value
+
+    :returns: `str` of value
+    """
+
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+
+def _sort_key(value):
+    """
+    Helper function to sort property values of mixed types,
+    numbers first, then strings, then nulls
+
+    :param value: property value
+
+    :returns: `tuple` sort key
+    """
+
+    if value is None:
+        return (2, '')
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return (0, value)
+    return (1, _value_key(value))
+
+
+def _intersect(positions, matches):
+    """
+    Helper function to intersect feature positions
+
+    :param positions: ascending `list` of positions (`None` for all)
+    :param matches: ascending `list` of positions
+
+    :returns: ascending `list` of positions
+    """
+
+    if positions is None:
+        return matches
+
+    keep = set(matches)
+    return [i for i in positions if i in keep]
+
+
+class _WindowDecoder(object):
+    """
+    Decoder of the JSON values of a (memory-mapped) UTF-8 buffer,
+    decoded in windows which consecutive values share and which
+    grow for values not fitting in one
+    """
+
+    def __init__(self, buffer_, chunk_size=1048576):
+        """
+        Initialize object
+
+        :param buffer_: bytes-like object
+        :param chunk_size: window size in bytes
+
+        :returns: pygeoapi.provider.geojson._WindowDecoder
+        """
+
+        self.buffer_ = buffer_
+        self.view = memoryview(buffer_)
+        self.size = len(buffer_)
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+
+        # byte range of the decoded window and whether it is all ASCII
+        self.start = self.end = 0
+        self.text = ''
+        self.ascii = True
+        # end of the last decoded value, in bytes and window characters
+        self.byte_pos = self.char_pos = 0
+
+    def _load(self, pos, size):
+        end = min(pos + size, self.size)
+        # do not cut a multi-byte character
+        while end < self.size and self.buffer_[end] & 0xC0 == 0x80:
+            end -= 1
+
+        self.text = str(self.view[pos:end], 'utf-8')
+        self.start, self.end = pos, end
+        self.ascii = len(self.text) == end - pos
+        self.byte_pos, self.char_pos = pos, 0
+
+    def _index(self, pos):
+        """Character index in the window of a byte offset, or `None`"""
+
+        if not self.start <= pos < self.end:
+            return None
+        if self.ascii:
+            return pos - self.start
+        if pos < self.byte_pos:
+            self.byte_pos, self.char_pos = self.start, 0
+
+        return self.char_pos + len(str(self.view[self.byte_pos:pos], 'utf-8'))
+
+    def decode(self, pos):
+        """
+        Decode the JSON value starting at a byte offset
+
+        :param pos: byte offset of the value
+
+        :returns: tuple of (decoded value, `int` of end byte offset)
+        """
+
+        size = self.chunk_size
+        i = self._index(pos)
+        if i is None:
+            self._load(pos, size)
+            i = 0
+
+        while True:
+            try:
+                value, n = self.decoder.raw_decode(self.text, i)
+                # a scalar may continue past the window
+                if n < len(self.text) or self.end == self.size:
+                    break
+            except ValueError:
+                if self.end == self.size:
+                    raise
+            size = max(size, self.end - pos) * 2
+            self._load(pos, size)
+            i = 0
+
+        if self.ascii:
+            end = self.start + n
+        else:
+            end = pos + len(self.text[i:n].encode('utf-8'))
+        self.byte_pos, self.char_pos = end, n
+
+        return value, end
+
+
+class _StreamedFeatures(object):
+    """
+    Read-only sequence of the features of a memory-mapped GeoJSON file,
+    each decoded from its byte range when accessed
+    """
+
+    def __init__(self, buffer_, starts, ends, id_field):
+        """
+        Initialize object
+
+        :param buffer_: memory-mapped file
+        :param starts: `array` of feature start byte offsets
+        :param ends: `array` of feature end byte offsets
+        :param id_field: name of id property
+
+        :returns: pygeoapi.provider.geojson._StreamedFeatures
+        """
+
+        self.buffer_ = buffer_
+        self.starts = starts
+        self.ends = ends
+        self.id_field = id_field
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        feature = json.loads(
+            self.buffer_[self.starts[index]:self.ends[index]].decode('utf-8'))
+        feature['id'] = feature['properties'][self.id_field]
+        return feature
+
+
+class _PackedRTree(object):
+    """
+    Static R-tree packed with the Sort-Tile-Recursive (STR) algorithm
+
+    Envelopes are kept in one flat list (or NumPy array) per level,
+    the children of node j being nodes j * node_size to
+    (j + 1) * node_size - 1 of the level below, so the tree is
+    searched level by level without any node objects.
+    """
+
+    def __init__(self, envelopes, node_size=16):
+        """
+        Initialize object
+
+        :param envelopes: `list` of [minx,miny,maxx,maxy] (or `None`
+                          for features without geometry) per feature
+        :param node_size: maximum number of children per node
+
+        :returns: pygeoapi.provider.geojson._PackedRTree
+        """
+
+        self.node_size = node_size
+
+        items = [(i, e) for i, e in enumerate(envelopes) if e is not None]
+        self.size = len(items)
+
+        # STR: sort by x center, cut into vertical slices of about
+        # sqrt(number of leaves) nodes, sort each slice by y center
+        items.sort(key=lambda item: item[1][0] + item[1][2])
+        leaves = int(math.ceil(self.size / float(node_size)))
+        slice_size = int(math.ceil(math.sqrt(leaves))) * node_size or 1
+        packed = []
+        for i in range(0, self.size, slice_size):
+            packed.extend(sorted(items[i:i + slice_size],
+                                 key=lambda item: item[1][1] + item[1][3]))
+
+        self.order = [i for i, e in packed]
+        level = [e for i, e in packed]
+        self.levels = [level]
+        while len(level) > 1:
+            level = [self.__merge(level[i:i + node_size])
+                     for i in range(0, len(level), node_size)]
+            self.levels.append(level)
+
+        if numpy is not None:
+            self.order = numpy.array(self.order, dtype=numpy.int64)
+            self.levels = [numpy.array(level, dtype=numpy.float64)
+                           for level in self.levels]
+
+    @staticmethod
+    def __merge(envelopes):
+        return [min(e[0] for e in envelopes), min(e[1] for e in envelopes),
+                max(e[2] for e in envelopes), max(e[3] for e in envelopes)]
+
+    def search(self, bbox):
+        """
+        Find the features intersecting a bounding box
+
+        :param bbox: bounding box [minx,miny,maxx,maxy]
+
+        :returns: sorted `list` of feature positions
+        """
+
+        if not self.size:
+            return []
+
+        minx, miny, maxx, maxy = bbox
+        node_size = self.node_size
+        top = len(self.levels) - 1
+
+        if numpy is not None:
+            children = numpy.arange(node_size)
+            candidates = numpy.arange(len(self.levels[top]))
+            for depth in range(top, -1, -1):
+                envelopes = self.levels[depth]
+                if depth < top:
+                    candidates = (candidates[:, None] * node_size +
+                                  children).ravel()
+                    candidates = candidates[candidates < len(envelopes)]
+                e = envelopes[candidates]
+                candidates = candidates[(e[:, 0] <= maxx) & (e[:, 2] >= minx) &
+                                        (e[:, 1] <= maxy) & (e[:, 3] >= miny)]
+            return numpy.sort(self.order[candidates]).tolist()
+
+        candidates = range(len(self.levels[top]))
+        for depth in range(top, -1, -1):
+            envelopes = self.levels[depth]
+            if depth < top:
+                candidates = [c for j in candidates for c in range(
+                    j * node_size, min((j + 1) * node_size, len(envelopes)))]
+            candidates = [c for c in candidates
+                          if envelopes[c][0] <= maxx and
+                          envelopes[c][2] >= minx and
+                          envelopes[c][1] <= maxy and
+                          envelopes[c][3] >= miny]
+        return sorted(self.order[c] for c in candidates)
+
 
 class GeoJSONProvider(BaseProvider):
     """Provider class backed by local GeoJSON files
@@ -44,16 +408,19 @@ class GeoJSONProvider(BaseProvider):
     (no external services, no dependencies, no schema)
 
     at the expense of performance
-    (no indexing, full serialization roundtrip on each request)
+    (full serialization roundtrip on each write or compaction)
 
-    Not thread safe, a single server process is assumed
+    Parsed files are cached per process and re-read when their
+    mtime, size or inode change.  Writes are serialized across
+    processes with a lock file and either rewrite the file or,
+    with `journal: true`, are appended to a journal next to it
+    which readers merge and which is compacted in the background
 
     This implementation uses the feature 'id' heavily
     and will override any 'id' provided in the original data.
     The feature 'properties' will be preserved.
 
     TODO:
-    * query method should take bbox
     * instead of methods returning FeatureCollections,
     we should be yielding Features and aggregating in the view
     * there are strict id semantics; all features in the input GeoJSON file
@@ -62,33 +429,775 @@ class GeoJSONProvider(BaseProvider):
     * appropriate HTTP responses will be raised
     """
 
+    # parsed files are cached behind _CACHE_LOCK, writes take a file lock
+    thread_safe = True
+
     def __init__(self, provider_def):
         """initializer"""
         BaseProvider.__init__(self, provider_def)
 
+        # cache parsed files which are at most cache_max_size MB,
+        # evicting least recently used files beyond that total
+        self.cache = provider_def.get('cache', True)
+        self.cache_max_size = int(
+            provider_def.get('cache_max_size', 512)) * 1024 * 1024
+        # append writes to a journal next to the data file, merged
+        # into it in the background every journal_max_ops operations
+        self.journal = provider_def.get('journal', False)
+        self.journal_max_ops = int(provider_def.get('journal_max_ops', 1000))
+        self.journal_path = '{}.journal'.format(self.data)
+        # index the byte offsets of features and decode them on demand
+        # instead of keeping the parsed file in memory (read-only)
+        self.streaming = provider_def.get('streaming', False)
+
+        if provider_def.get('warm_up', False):
+            LOGGER.debug('Warming up cache for {}'.format(self.data))
+            self._load()
+
+        # read all features, so only on first use
+        self._fields = None
+
+    @property
+    def fields(self):
+        if self._fields is None:
+            self._fields = self.get_fields()
+        return self._fields
+
+    @fields.setter
+    def fields(self, value):
+        self._fields = value
+
+    def get_fields(self):
+        """
+        Get provider field information (names, types)
+
+        :returns: dict of fields
+        """
+
+        fields_ = {}
+        for feature in self._load()['features']:
+            for k, v in feature['properties'].items():
+                if fields_.get(k, {}).get('type') not in (None, 'null'):
+                    continue
+                if isinstance(v, bool):
+                    type_ = 'boolean'
+                elif isinstance(v, int):
+                    type_ = 'integer'
+                elif isinstance(v, float):
+                    type_ = 'number'
+                elif isinstance(v, str):
+                    type_ = 'string'
+                elif v is None:
+                    type_ = 'null'
+                else:
+                    type_ = 'object'
+                fields_[k] = {'type': type_}
+
+        return fields_
+
     def _load(self):
         """Load and validate the source GeoJSON file
         at self.data
 
-        Yes loading from disk, deserializing and validation
-        happens on every request. This is not efficient.
+        The parsed file is served from the process-wide cache
+        unless it changed on disk since it was last read.
+        Callers must not modify the returned data in place.
+        """
+
+        entry = self._load_entry()
+        if self.streaming or not (self.journal or entry['deleted']):
+            # read-only, or replaced rather than changed by writes
+            return entry['data']
+
+        # journal writes change the cached features in place
+        with entry['lock']:
+            data = dict(entry['data'])
+            data['features'] = [
+                f for f in data['features'] if f is not None]
+        return data
+
+    def _load_entry(self, locked=False):
+        """Load the source GeoJSON file at self.data, replaying
+        its journal if any, along with its indexes
+
+        :param locked: whether the caller already holds the write lock
+
+        :returns: `dict` of stamp, data, id_index and spatial_index
+        """
+
+        if self.streaming:
+            return self._read_stream_entry()
+
+        if locked or not os.path.exists(self.journal_path):
+            return self._read_entry()
+
+        with _locked(self.data):
+            return self._read_entry()
+
+    def _read_entry(self):
+        """Read data file and journal into a cache entry, replaying only
+        the new journal operations when the data file is unchanged
+
+        :returns: `dict` of stamp, data, id_index and spatial_index
         """
 
-        if os.path.exists(self.data):
+        key = (os.path.abspath(self.data), self.id_field)
+        stamp = (file_stamp(self.data), file_stamp(self.journal_path))
+
+        with _CACHE_LOCK:
+            entry = _CACHE.get(key)
+            if entry is not None and entry['stamp'] == stamp:
+                _CACHE.move_to_end(key)
+                return entry
+
+        if (entry is not None and entry['stamp'][0] == stamp[0] and
+                entry['stamp'][1] is not None and stamp[1] is not None and
+                entry['stamp'][1][2] == stamp[1][2] and
+                entry['journal_offset'] <= stamp[1][1]):
+            # same data file, journal was appended to (by another process)
+            entry = self._copy_entry(entry, stamp)
+        elif stamp[0] is None:
+            entry = self._entry({'type': 'FeatureCollection',
+                                 'features': []}, stamp)
+        else:
+            LOGGER.debug('Reading {}'.format(self.data))
             with open(self.data) as src:
                 data = json.loads(src.read())
-        else:
-            data = {
-                'type': 'FeatureCollection',
-                'features': []}
+
+            # Must be a FeatureCollection
+            assert data['type'] == 'FeatureCollection'
+            # All features must have ids, TODO must be unique strings
+            for i in data['features']:
+                i['id'] = i['properties'][self.id_field]
+
+            entry = self._entry(data, stamp)
+
+        if stamp[1] is not None:
+            LOGGER.debug('Replaying {}'.format(self.journal_path))
+            with open(self.journal_path, 'rb') as src:
+                src.seek(entry['journal_offset'])
+                lines = src.read().split(b'\n')
+
+            # the last item is empty, or a partially written operation
+            for line in lines[:-1]:
+                self._apply(entry, json.loads(line.decode('utf-8')))
+                entry['journal_offset'] += len(line) + 1
+                entry['journal_ops'] += 1
+
+        return self._store(entry)
+
+    def _read_stream_entry(self):
+        """Index the byte offsets of the features of the source GeoJSON
+        file at self.data, which is memory-mapped rather than parsed
+        as a whole
+
+        :returns: `dict` of stamp, data, id_index and spatial_index
+        """
+
+        key = (os.path.abspath(self.data), self.id_field)
+        stamp = (file_stamp(self.data), None)
+
+        with _CACHE_LOCK:
+            entry = _STREAMS.get(key)
+            if entry is not None and entry['stamp'] == stamp:
+                return entry
+
+        if stamp[0] is None or not stamp[0][1]:
+            # missing or empty (which cannot be memory-mapped) file
+            return self._entry({'type': 'FeatureCollection',
+                                'features': []}, stamp)
+
+        LOGGER.debug('Indexing {}'.format(self.data))
+        with open(self.data, 'rb') as src:
+            buffer_ = mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ)
+
+        decoder = _WindowDecoder(buffer_)
+        data = {}
+        starts = array('q')
+        ends = array('q')
+
+        pos = _SEPARATORS.match(buffer_, 0).end()
+        if buffer_[pos:pos + 1] != b'{':
+            raise ValueError('{} is not a JSON object'.format(self.data))
+        pos += 1
+
+        while True:
+            pos = _SEPARATORS.match(buffer_, pos).end()
+            if buffer_[pos:pos + 1] == b'}':
+                break
+
+            name, pos = decoder.decode(pos)
+            pos = _SEPARATORS.match(buffer_, pos).end()
+            if buffer_[pos:pos + 1] != b':':
+                raise ValueError('Invalid JSON at byte {}'.format(pos))
+            pos = _SEPARATORS.match(buffer_, pos + 1).end()
+
+            if name != 'features':
+                data[name], pos = decoder.decode(pos)
+                continue
+
+            if buffer_[pos:pos + 1] != b'[':
+                raise ValueError('Invalid JSON at byte {}'.format(pos))
+            pos += 1
+
+            while True:
+                pos = _SEPARATORS.match(buffer_, pos).end()
+                if buffer_[pos:pos + 1] == b']':
+                    pos += 1
+                    break
+
+                # the id index and envelopes are built on first use
+                feature, end = decoder.decode(pos)
+                starts.append(pos)
+                ends.append(end)
+                pos = end
 
         # Must be a FeatureCollection
         assert data['type'] == 'FeatureCollection'
-        # All features must have ids, TODO must be unique strings
-        for i in data['features']:
-            i['id'] = i['properties'][self.id_field]
 
-        return data
+        data['features'] = _StreamedFeatures(buffer_, starts, ends,
+                                             self.id_field)
+        entry = self._entry(data, stamp)
+
+        with _CACHE_LOCK:
+            _STREAMS[key] = entry
+
+        return entry
+
+    def _id_index(self, data):
+        """Build the index of feature ids
+
+        :param data: FeatureCollection dict
+
+        :returns: `dict` of feature id to position in data
+        """
+
+        id_index = {}
+        for i, feature in enumerate(data['features']):
+            if feature is not None:
+                id_index.setdefault(str(feature['id']), i)
+
+        return id_index
+
+    def _entry(self, data, stamp, id_index=None, envelopes=None,
+               deleted=0, journal_offset=0, journal_ops=0):
+        """Build a cache entry of data and its indexes
+
+        Deleted features are left as `None` in data, so that the
+        positions of the other features do not change, and are dropped
+        when the data file is rewritten
+
+        :param data: FeatureCollection dict
+        :param stamp: `tuple` of data file and journal versions
+                      as returned by `_stamp`
+        :param id_index: `dict` of feature id to position in data,
+                         built on first use if not provided
+        :param envelopes: `list` of envelope per position in data,
+                          computed on first use if not provided
+        :param deleted: number of deleted features in data
+        :param journal_offset: bytes of journal replayed into data
+        :param journal_ops: number of journal operations replayed
+
+        :returns: `dict` of stamp, data, id_index and spatial_index
+        """
+
+        return {
+            'stamp': stamp,
+            'data': data,
+            'id_index': id_index,
+            'envelopes': envelopes,
+            'deleted': deleted,
+            'journal_offset': journal_offset,
+            'journal_ops': journal_ops,
+            # incremented on each write, invalidating property indexes
+            'version': 0,
+            # R-tree (built lazily) and positions changed since
+            'spatial_index': (None, set()),
+            # built lazily by queries, keyed by version
+            'property_indexes': {},
+            # held while the entry is changed in place
+            'lock': threading.RLock()
+        }
+
+    def _copy_entry(self, entry, stamp):
+        """Copy a cache entry, to be changed without affecting
+        the readers of the original
+
+        :param entry: cache entry
+        :param stamp: `tuple` of data file and journal versions
+                      of the copy
+
+        :returns: `dict` of cache entry
+        """
+
+        with entry['lock']:
+            data = dict(entry['data'])
+            data['features'] = list(data['features'])
+            id_index, envelopes = entry['id_index'], entry['envelopes']
+            if id_index is not None:
+                id_index = dict(id_index)
+            if envelopes is not None:
+                envelopes = list(envelopes)
+            copy = self._entry(data, stamp, id_index, envelopes,
+                               entry['deleted'], entry['journal_offset'],
+                               entry['journal_ops'])
+            tree, changed = entry['spatial_index']
+            copy['spatial_index'] = (tree, set(changed))
+
+        return copy
+
+    def _lazy(self, entry, name, build):
+        """Get (or build on first use) an index of a cache entry,
+        which writes then keep up to date
+
+        :param entry: cache entry
+        :param name: index name (id_index or envelopes)
+        :param build: callable building the index from data
+
+        :returns: index
+        """
+
+        index = entry[name]
+        if index is None:
+            with entry['lock']:
+                index = entry[name]
+                if index is None:
+                    LOGGER.debug('Building {} of {}'.format(name, self.data))
+                    index = entry[name] = build(entry['data'])
+
+        return index
+
+    def _ids(self, entry):
+        """Get the index of feature ids of a cache entry
+
+        :param entry: cache entry
+
+        :returns: `dict` of feature id to position in data
+        """
+
+        return self._lazy(entry, 'id_index', self._id_index)
+
+    def _envelopes(self, entry):
+        """Get the feature envelopes of a cache entry
+
+        :param entry: cache entry
+
+        :returns: `list` of [minx,miny,maxx,maxy] (or `None`) per position
+        """
+
+        return self._lazy(entry, 'envelopes', lambda data: [
+            None if f is None else geometry_envelope(f.get('geometry'))
+            for f in data['features']])
+
+    def _store(self, entry):
+        """Put a cache entry in the process-wide cache
+
+        :param entry: cache entry
+
+        :returns: `dict` of cache entry
+        """
+
+        key = (os.path.abspath(self.data), self.id_field)
+        stamp = entry['stamp']
+
+        with _CACHE_LOCK:
+            _CACHE.pop(key, None)
+            if (not self.cache or stamp == (None, None) or
+                    _size(stamp) > self.cache_max_size):
+                return entry
+
+            _CACHE[key] = entry
+
+            total = sum(_size(e['stamp']) for e in _CACHE.values())
+            while total > self.cache_max_size:
+                evicted_key, evicted = _CACHE.popitem(last=False)
+                LOGGER.debug('Evicting {} from cache'.format(evicted_key[0]))
+                total -= _size(evicted['stamp'])
+
+        return entry
+
+    def _apply(self, entry, operation):
+        """Apply a write operation to a cache entry in place.  The
+        caller must hold the entry lock if the entry is shared
+
+        :param entry: cache entry
+        :param operation: `dict` of op (create, update or delete),
+                          id and feature
+
+        :returns: `bool` of whether the feature was found
+        """
+
+        features = entry['data']['features']
+        id_index = self._ids(entry)
+        # not built yet, then from data as changed
+        envelopes = entry['envelopes']
+
+        feature = operation.get('feature')
+        envelope = None
+        if feature is not None:
+            feature['id'] = feature['properties'][self.id_field]
+            if envelopes is not None:
+                envelope = geometry_envelope(feature.get('geometry'))
+
+        if operation['op'] == 'create':
+            i = len(features)
+            features.append(feature)
+            if envelopes is not None:
+                envelopes.append(envelope)
+            id_index.setdefault(str(feature['id']), i)
+        else:
+            i = id_index.get(str(operation['id']))
+            if i is None:
+                return False
+
+            if operation['op'] == 'update':
+                features[i] = feature
+            else:
+                features[i] = None
+                del id_index[str(operation['id'])]
+                entry['deleted'] += 1
+            if envelopes is not None:
+                envelopes[i] = envelope
+
+        entry['spatial_index'][1].add(i)
+        entry['version'] += 1
+
+        return True
+
+    def _write(self, operation):
+        """Apply a write operation, either appending it to the journal
+        or rewriting the data file
+
+        :param operation: `dict` of op (create, update or delete),
+                          id and feature
+
+        :returns: `bool` of whether the feature was found
+        """
+
+        if self.streaming:
+            msg = 'Writes are not supported in streaming mode'
+            LOGGER.error(msg)
+            raise ProviderQueryError(msg)
+
+        with _locked(self.data, exclusive=True):
+            entry = self._load_entry(locked=True)
+
+            if (operation['op'] != 'create' and
+                    str(operation['id']) not in self._ids(entry)):
+                return False
+
+            if not self.journal:
+                # copy on write, the cached entry is replaced once saved
+                entry = self._copy_entry(entry, entry['stamp'])
+                self._apply(entry, operation)
+                self._save(entry)
+                return True
+
+            # journal first, so that a failed write leaves the cache as is
+            with open(self.journal_path, 'ab') as dst:
+                dst.write(json.dumps(operation).encode('utf-8') + b'\n')
+                dst.flush()
+                os.fsync(dst.fileno())
+
+            stamp = (file_stamp(self.data), file_stamp(self.journal_path))
+            with entry['lock']:
+                self._apply(entry, operation)
+                entry['stamp'] = stamp
+                entry['journal_offset'] = stamp[1][1]
+                entry['journal_ops'] += 1
+            self._store(entry)
+
+        if entry['journal_ops'] >= self.journal_max_ops:
+            with _CACHE_LOCK:
+                start = self.data not in _COMPACTING
+                _COMPACTING.add(self.data)
+            if start:
+                LOGGER.debug('Compacting {}'.format(self.journal_path))
+                threading.Thread(target=self.compact, daemon=True).start()
+
+        return True
+
+    def _save(self, entry):
+        """Write the features of a cache entry to the source GeoJSON file
+        at self.data, drop the journal and refresh the cache.  The caller
+        must hold the write lock
+
+        :param entry: cache entry
+        """
+
+        data = entry['data']
+        if entry['deleted']:
+            data = dict(data)
+            data['features'] = [f for f in data['features'] if f is not None]
+
+        tmp_path = '{}.tmp'.format(self.data)
+        with open(tmp_path, 'w') as dst:
+            dst.write(json.dumps(data))
+            dst.flush()
+            os.fsync(dst.fileno())
+
+        os.replace(tmp_path, self.data)
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+
+        stamp = (file_stamp(self.data), None)
+        if entry['deleted']:
+            # drop deleted features, which moves the others
+            envelopes = entry['envelopes']
+            if envelopes is not None:
+                envelopes = [e for f, e in zip(entry['data']['features'],
+                                               envelopes) if f is not None]
+            entry = self._entry(data, stamp, envelopes=envelopes)
+        else:
+            with entry['lock']:
+                entry['stamp'] = stamp
+                entry['journal_offset'] = entry['journal_ops'] = 0
+
+        self._store(entry)
+
+    def compact(self):
+        """Merge the journal into the data file
+
+        :returns: None
+        """
+
+        try:
+            with _locked(self.data, exclusive=True):
+                if os.path.exists(self.journal_path):
+                    self._save(self._load_entry(locked=True))
+        except Exception as err:
+            LOGGER.error('Compaction of {} failed: {}'.format(
+                self.journal_path, err))
+        finally:
+            with _CACHE_LOCK:
+                _COMPACTING.discard(self.data)
+
+    def _index(self, entry, key, build):
+        """Get (or lazily build) an index of the current version of
+        a cache entry.  The index is built from the features up to
+        the length they had with its version, so that appends meanwhile
+        cannot leave it inconsistent with itself.  Features are read
+        one at a time, so that streamed ones are not all decoded at once
+
+        :param entry: cache entry
+        :param key: index key
+        :param build: callable building the index from an iterable
+                      of features
+
+        :returns: index
+        """
+
+        version = entry['version']
+        cached = entry['property_indexes'].get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        with entry['lock']:
+            version = entry['version']
+            features = entry['data']['features']
+            size = len(features)
+
+        index = build(islice(features, size))
+        cached = entry['property_indexes'].get(key)
+        if cached is None or cached[0] < version:
+            entry['property_indexes'][key] = (version, index)
+        return index
+
+    def _live_positions(self, entry):
+        """Get the positions of the features that are not deleted
+
+        :param entry: cache entry
+
+        :returns: ascending sequence of positions
+        """
+
+        features = entry['data']['features']
+        if not entry['deleted']:
+            return range(len(features))
+
+        return self._index(entry, ('live', ), lambda features: [
+            i for i, f in enumerate(features) if f is not None])
+
+    def _spatial_search(self, entry, bbox):
+        """Find the features intersecting a bounding box, with the
+        R-tree and by checking the features changed since it was built
+
+        :param entry: cache entry
+        :param bbox: bounding box [minx,miny,maxx,maxy]
+
+        :returns: ascending `list` of positions
+        """
+
+        tree, changed = entry['spatial_index']
+        if tree is None or len(changed) > _CHANGED_MAX:
+            with entry['lock']:
+                tree, changed = entry['spatial_index']
+                if tree is None or len(changed) > _CHANGED_MAX:
+                    LOGGER.debug('Building spatial index')
+                    tree = _PackedRTree(self._envelopes(entry))
+                    changed = set()
+                    entry['spatial_index'] = (tree, changed)
+
+        with entry['lock']:
+            changed = frozenset(changed)
+        if not changed:
+            return tree.search(bbox)
+
+        minx, miny, maxx, maxy = bbox
+        envelopes = self._envelopes(entry)
+        positions = [i for i in tree.search(bbox) if i not in changed]
+        for i in changed:
+            e = envelopes[i]
+            if (e is not None and e[0] <= maxx and e[2] >= minx and
+                    e[1] <= maxy and e[3] >= miny):
+                positions.append(i)
+
+        return sorted(positions)
+
+    def _value_index(self, entry, name):
+        """Get (or lazily build) the index of the values of a property
+
+        :param entry: cache entry
+        :param name: property name
+
+        :returns: `dict` of value to ascending `list` of positions
+        """
+
+        def build(features):
+            LOGGER.debug('Building value index on {}'.format(name))
+            index = {}
+            for i, feature in enumerate(features):
+                if feature is None:
+                    continue
+                value = feature['properties'].get(name)
+                index.setdefault(_value_key(value), []).append(i)
+            return index
+
+        return self._index(entry, ('values', name), build)
+
+    def _sort_index(self, entry, name):
+        """Get (or lazily build) the sort order of a property
+
+        :param entry: cache entry
+        :param name: property name
+
+        :returns: `dict` of ascending (`A`) and descending (`D`) `list`
+                  of positions and `list` of value rank per position
+                  (`rank`)
+        """
+
+        def build(features):
+            LOGGER.debug('Building sort index on {}'.format(name))
+            keys = []
+            live = []
+            for i, feature in enumerate(features):
+                if feature is None:
+                    keys.append(None)
+                    continue
+                keys.append(_sort_key(feature['properties'].get(name)))
+                live.append(i)
+            ascending = sorted(live, key=keys.__getitem__)
+
+            rank = [0] * len(keys)
+            for n, i in enumerate(ascending[1:], 1):
+                rank[i] = rank[ascending[n - 1]]
+                if keys[i] != keys[ascending[n - 1]]:
+                    rank[i] += 1
+
+            # ties stay in file order in both directions
+            descending = sorted(live, key=lambda i: -rank[i])
+
+            return {'A': ascending, 'D': descending, 'rank': rank}
+
+        return self._index(entry, ('sort', name), build)
+
+    def _datetime_index(self, entry):
+        """Get (or lazily build) the index of time_field values
+
+        :param entry: cache entry
+
+        :returns: `tuple` of ascending `list` of datetimes and
+                  `list` of corresponding positions
+        """
+
+        def build(features):
+            LOGGER.debug('Building datetime index on {}'.format(
+                self.time_field))
+            values = []
+            for i, feature in enumerate(features):
+                if feature is None:
+                    continue
+                value = feature['properties'].get(self.time_field)
+                if value is None:
+                    continue
+                try:
+                    values.append((parse_datetime(str(value)), i))
+                except (ValueError, OverflowError):
+                    LOGGER.warning('Invalid datetime {}'.format(value))
+            values.sort()
+            return ([v for v, i in values], [i for v, i in values])
+
+        return self._index(entry, ('datetime', self.time_field), build)
+
+    def _datetime_positions(self, entry, datetime_):
+        """Find the features matching a datetime
+
+        :param entry: cache entry
+        :param datetime_: temporal (datestamp or extent)
+
+        :returns: ascending `list` of positions
+        """
+
+        if self.time_field is None:
+            LOGGER.error('time_field not enabled for collection')
+            raise ProviderQueryError()
+
+        if '/' in datetime_:
+            time_begin, time_end = datetime_.split('/')
+        else:
+            time_begin = time_end = datetime_
+
+        values, positions = self._datetime_index(entry)
+        try:
+            start = 0
+            if time_begin not in ('..', ''):
+                start = bisect_left(values, parse_datetime(time_begin))
+            end = len(values)
+            if time_end not in ('..', ''):
+                end = bisect_right(values, parse_datetime(time_end))
+        except (ValueError, OverflowError) as err:
+            LOGGER.error('Invalid datetime {}: {}'.format(datetime_, err))
+            raise ProviderQueryError()
+
+        return sorted(positions[start:end])
+
+    def _sort(self, entry, positions, sortby):
+        """Sort positions by one or more properties
+
+        :param entry: cache entry
+        :param positions: ascending `list` of positions (`None` for all)
+        :param sortby: list of dicts (property, order)
+
+        :returns: `list` of positions
+        """
+
+        if len(sortby) == 1:
+            index = self._sort_index(entry, sortby[0]['property'])
+            order = index[sortby[0]['order']]
+            if positions is None:
+                return order
+            keep = set(positions)
+            return [i for i in order if i in keep]
+
+        indexes = [self._sort_index(entry, s['property']) for s in sortby]
+        ranks = [(index['rank'], -1 if s['order'] == 'D' else 1)
+                 for index, s in zip(indexes, sortby)]
+        if positions is None:
+            # from the same snapshot as the ranks
+            positions = indexes[0]['A']
+
+        return sorted(positions, key=lambda i: tuple(
+            rank[i] * sign for rank, sign in ranks))
 
     def query(self, startindex=0, limit=10, resulttype='results',
               bbox=[], datetime=None, properties=[], sortby=[]):
@@ -106,15 +1215,41 @@ class GeoJSONProvider(BaseProvider):
         :returns: FeatureCollection dict of 0..n GeoJSON features
         """
 
-        # TODO filter by bbox without resorting to third-party libs
-        data = self._load()
+        entry = self._load_entry()
+        all_data = entry['data']
+
+        features = all_data['features']
+        # ascending positions of matching features, None for all
+        positions = None
 
-        data['numberMatched'] = len(data['features'])
+        if bbox:
+            bbox = [float(c) for c in bbox]
+            positions = self._spatial_search(entry, bbox)
+
+        for name, value in properties:
+            positions = _intersect(positions, self._value_index(
+                entry, name).get(_value_key(value), []))
+
+        if datetime is not None:
+            positions = _intersect(
+                positions, self._datetime_positions(entry, datetime))
+
+        if sortby:
+            positions = self._sort(entry, positions, sortby)
+        elif positions is None:
+            positions = self._live_positions(entry)
+
+        data = {k: v for k, v in all_data.items() if k != 'features'}
+        data['numberMatched'] = len(positions)
 
         if resulttype == 'hits':
             data['features'] = []
         else:
-            data['features'] = data['features'][startindex:startindex+limit]
+            # features deleted meanwhile are None
+            data['features'] = [
+                _copy_feature(features[i]) for i in
+                positions[startindex:startindex+limit]
+                if features[i] is not None]
             data['numberReturned'] = len(data['features'])
 
         return data
@@ -127,10 +1262,12 @@ class GeoJSONProvider(BaseProvider):
         :returns: dict of single GeoJSON feature
         """
 
-        all_data = self._load()
-        for feature in all_data['features']:
-            if str(feature['properties'][self.id_field]) == identifier:
-                return feature
+        entry = self._load_entry()
+        i = self._ids(entry).get(str(identifier))
+        if i is not None:
+            feature = entry['data']['features'][i]
+            if feature is not None:
+                return _copy_feature(feature)
 
         # default, no match
         LOGGER.error('feature {} not found'.format(identifier))
@@ -141,15 +1278,11 @@ class GeoJSONProvider(BaseProvider):
 
         :param new_feature: new GeoJSON feature dictionary
         """
-        all_data = self._load()
 
         # Hijack the feature id and make sure it's unique
-        new_feature['properties']['id'] = str(uuid.uuid4())
-
-        all_data['features'].append(new_feature)
+        new_feature['properties'][self.id_field] = str(uuid.uuid4())
 
-        with open(self.data, 'w') as dst:
-            dst.write(json.dumps(all_data))
+        self._write({'op': 'create', 'feature': new_feature})
 
     def update(self, identifier, new_feature):
         """Updates an existing feature id with new_feature
@@ -158,16 +1291,17 @@ class GeoJSONProvider(BaseProvider):
         :param new_feature: new GeoJSON feature dictionary
         """
 
-        all_data = self._load()
-        for i, feature in enumerate(all_data['features']):
-            if feature['properties']['id'] == identifier:
-                # ensure new_feature retains id
-                new_feature['properties']['id'] = identifier
-                all_data['features'][i] = new_feature
-                break
+        feature = self.get(identifier)
+        if feature is None:
+            return
+
+        # ensure new_feature retains id
+        new_feature['properties'][self.id_field] = \
+            feature['properties'][self.id_field]
 
-        with open(self.data, 'w') as dst:
-            dst.write(json.dumps(all_data))
+        if not self._write({'op': 'update', 'id': str(identifier),
+                            'feature': new_feature}):
+            LOGGER.error('feature {} not found'.format(identifier))
 
     def delete(self, identifier):
         """Updates an existing feature id with new_feature
@@ -175,14 +1309,8 @@ class GeoJSONProvider(BaseProvider):
         :param identifier: feature id
         """
 
-        all_data = self._load()
-        for i, feature in enumerate(all_data['features']):
-            if feature['properties']['id'] == identifier:
-                all_data['features'].pop(i)
-                break
-
-        with open(self.data, 'w') as dst:
-            dst.write(json.dumps(all_data))
+        if not self._write({'op': 'delete', 'id': str(identifier)}):
+            LOGGER.error('feature {} not found'.format(identifier))
 
     def __repr__(self):
         return '<GeoJSONProvider> {}'.format(self.data)
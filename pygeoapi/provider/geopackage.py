@@ -32,19 +32,288 @@
 import sqlite3
 import logging
 import os
-import json
+import struct
 from pygeoapi.plugin import InvalidPluginError
-from pygeoapi.provider.base import BaseProvider, ProviderConnectionError
+from pygeoapi.provider.base import (BaseProvider, ProviderConnectionError,
+                                    ProviderInvalidQueryError,
+                                    ProviderQueryError)
+from pygeoapi.util import (ThreadConnections, encode_token,
+                           geometry_envelope as geojson_envelope,
+                           sqlite_connect, sqlite_field_type, sqlite_filter,
+                           sqlite_select)
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 LOGGER = logging.getLogger(__name__)
 
+GEOMETRY_TYPES = {
+    1: 'Point',
+    2: 'LineString',
+    3: 'Polygon',
+    4: 'MultiPoint',
+    5: 'MultiLineString',
+    6: 'MultiPolygon',
+    7: 'GeometryCollection'
+}
+
+# GeoPackage binary header envelope indicator -> number of doubles
+ENVELOPE_SIZES = {0: 0, 1: 4, 2: 6, 3: 6, 4: 8}
+
+# coordinate arrays at least this long are decoded with NumPy if present
+NUMPY_THRESHOLD = 32
+
+
+def _parse_header(blob):
+    """
+    Parse GeoPackage binary geometry header
+
+    :param blob: GeoPackage geometry blob
+
+    :returns: tuple of (`int` WKB offset, envelope [minx,miny,maxx,maxy]
+              or `None`, `bool` of empty flag)
+    """
+
+    if blob[:2] != b'GP':
+        raise ValueError('Not a GeoPackage geometry blob')
+
+    flags = blob[3]
+    endian = '<' if flags & 0x01 else '>'
+    indicator = (flags >> 1) & 0x07
+    empty = bool(flags & 0x10)
+
+    try:
+        size = ENVELOPE_SIZES[indicator]
+    except KeyError:
+        raise ValueError('Invalid envelope indicator {}'.format(indicator))
+
+    envelope = None
+    if size:
+        minx, maxx, miny, maxy = struct.unpack_from(
+            '{}4d'.format(endian), blob, 8)
+        envelope = [minx, miny, maxx, maxy]
+
+    return 8 + size * 8, envelope, empty
+
+
+def _read_coordinates(blob, offset, endian, count, dims, has_z):
+    """
+    Read an array of coordinates from WKB
+
+    :returns: tuple of (`list` of coordinates, `int` of new offset)
+    """
+
+    size = count * dims
+    end = offset + size * 8
+    ndims = 3 if has_z else 2
+
+    if numpy is not None and count >= NUMPY_THRESHOLD:
+        array = numpy.frombuffer(blob, dtype='{}f8'.format(endian),
+                                 count=size, offset=offset)
+        return array.reshape(count, dims)[:, :ndims].tolist(), end
+
+    values = struct.unpack_from('{}{}d'.format(endian, size), blob, offset)
+    coordinates = [list(values[i:i + ndims]) for i in range(0, size, dims)]
+    return coordinates, end
+
+
+def _read_wkb(blob, offset):
+    """
+    Read a (ISO) WKB geometry into a GeoJSON geometry
+
+    :param blob: bytes
+    :param offset: offset of the WKB geometry in blob
+
+    :returns: tuple of (`dict` of GeoJSON geometry, `int` of new offset)
+    """
+
+    endian = '<' if blob[offset] == 1 else '>'
+    wkb_type, = struct.unpack_from('{}I'.format(endian), blob, offset + 1)
+    offset += 5
+
+    # EWKB style flags are tolerated next to ISO type codes
+    has_z = bool(wkb_type & 0x80000000)
+    has_m = bool(wkb_type & 0x40000000)
+    wkb_type &= 0x0fffffff
+    dimension, wkb_type = divmod(wkb_type, 1000)
+    has_z = has_z or dimension in (1, 3)
+    has_m = has_m or dimension in (2, 3)
+    dims = 2 + has_z + has_m
+
+    try:
+        geometry_type = GEOMETRY_TYPES[wkb_type]
+    except KeyError:
+        raise ValueError('Unsupported WKB geometry type {}'.format(wkb_type))
+
+    if wkb_type == 1:
+        coordinates, offset = _read_coordinates(
+            blob, offset, endian, 1, dims, has_z)
+        return {'type': geometry_type, 'coordinates': coordinates[0]}, offset
+
+    count, = struct.unpack_from('{}I'.format(endian), blob, offset)
+    offset += 4
+
+    if wkb_type == 2:
+        coordinates, offset = _read_coordinates(
+            blob, offset, endian, count, dims, has_z)
+    elif wkb_type == 3:
+        coordinates = []
+        for i in range(count):
+            npoints, = struct.unpack_from('{}I'.format(endian), blob, offset)
+            ring, offset = _read_coordinates(
+                blob, offset + 4, endian, npoints, dims, has_z)
+            coordinates.append(ring)
+    else:
+        parts = []
+        for i in range(count):
+            part, offset = _read_wkb(blob, offset)
+            parts.append(part)
+        if wkb_type == 7:
+            return {'type': geometry_type, 'geometries': parts}, offset
+        coordinates = [part['coordinates'] for part in parts]
+
+    return {'type': geometry_type, 'coordinates': coordinates}, offset
+
+
+def decode_geometry(blob):
+    """
+    Decode a GeoPackage geometry blob into a GeoJSON geometry
+
+    :param blob: GeoPackage geometry blob
+
+    :returns: `dict` of GeoJSON geometry or `None` if empty
+    """
+
+    if blob is None:
+        return None
+
+    offset, envelope, empty = _parse_header(blob)
+    if empty:
+        return None
+
+    geometry, offset = _read_wkb(blob, offset)
+    return geometry
+
+
+def geometry_envelope(blob):
+    """
+    Envelope of a GeoPackage geometry blob, read from the header
+    when present or else computed from the geometry
+
+    :param blob: GeoPackage geometry blob
+
+    :returns: `list` of [minx,miny,maxx,maxy] or `None` if empty
+    """
+
+    if blob is None:
+        return None
+
+    offset, envelope, empty = _parse_header(blob)
+    if empty:
+        return None
+    if envelope is not None:
+        return envelope
+
+    geometry, offset = _read_wkb(blob, offset)
+    return geojson_envelope(geometry)
+
+
+def _envelope_function(index):
+    def envelope_value(blob):
+        envelope = geometry_envelope(blob)
+        return None if envelope is None else envelope[index]
+    return envelope_value
+
+
+def _is_empty(blob):
+    return None if blob is None else int(geometry_envelope(blob) is None)
+
+
+def _bbox_intersects(blob, minx, miny, maxx, maxy):
+    envelope = geometry_envelope(blob)
+    if envelope is None:
+        return 0
+    return int(envelope[0] <= maxx and envelope[2] >= minx and
+               envelope[1] <= maxy and envelope[3] >= miny)
+
+
+# maintenance triggers of the R*Tree spatial index extension
+# (GeoPackage specification, Annex L): {0} index, {1} table,
+# {2} geometry column, {3} primary key
+_RTREE_TRIGGERS = [
+    """CREATE TRIGGER "{0}_insert" AFTER INSERT ON "{1}"
+    WHEN (NEW."{2}" NOT NULL AND NOT ST_IsEmpty(NEW."{2}"))
+    BEGIN
+        INSERT OR REPLACE INTO "{0}" VALUES (NEW."{3}",
+            ST_MinX(NEW."{2}"), ST_MaxX(NEW."{2}"),
+            ST_MinY(NEW."{2}"), ST_MaxY(NEW."{2}"));
+    END""",
+    """CREATE TRIGGER "{0}_update1" AFTER UPDATE OF "{2}" ON "{1}"
+    WHEN OLD."{3}" = NEW."{3}" AND
+        (NEW."{2}" NOTNULL AND NOT ST_IsEmpty(NEW."{2}"))
+    BEGIN
+        INSERT OR REPLACE INTO "{0}" VALUES (NEW."{3}",
+            ST_MinX(NEW."{2}"), ST_MaxX(NEW."{2}"),
+            ST_MinY(NEW."{2}"), ST_MaxY(NEW."{2}"));
+    END""",
+    """CREATE TRIGGER "{0}_update2" AFTER UPDATE OF "{2}" ON "{1}"
+    WHEN OLD."{3}" = NEW."{3}" AND
+        (NEW."{2}" ISNULL OR ST_IsEmpty(NEW."{2}"))
+    BEGIN
+        DELETE FROM "{0}" WHERE id = OLD."{3}";
+    END""",
+    """CREATE TRIGGER "{0}_update3" AFTER UPDATE ON "{1}"
+    WHEN OLD."{3}" != NEW."{3}" AND
+        (NEW."{2}" NOTNULL AND NOT ST_IsEmpty(NEW."{2}"))
+    BEGIN
+        DELETE FROM "{0}" WHERE id = OLD."{3}";
+        INSERT OR REPLACE INTO "{0}" VALUES (NEW."{3}",
+            ST_MinX(NEW."{2}"), ST_MaxX(NEW."{2}"),
+            ST_MinY(NEW."{2}"), ST_MaxY(NEW."{2}"));
+    END""",
+    """CREATE TRIGGER "{0}_update4" AFTER UPDATE ON "{1}"
+    WHEN OLD."{3}" != NEW."{3}" AND
+        (NEW."{2}" ISNULL OR ST_IsEmpty(NEW."{2}"))
+    BEGIN
+        DELETE FROM "{0}" WHERE id IN (OLD."{3}", NEW."{3}");
+    END""",
+    """CREATE TRIGGER "{0}_delete" AFTER DELETE ON "{1}"
+    WHEN OLD."{2}" NOT NULL
+    BEGIN
+        DELETE FROM "{0}" WHERE id = OLD."{3}";
+    END"""
+]
+
+
+def register_functions(conn):
+    """
+    Register the SQL functions of the GeoPackage specification used by
+    the R*Tree triggers (ST_MinX, ST_IsEmpty etc.) on a connection, as
+    well as gpkg_bbox_intersects(geom, minx, miny, maxx, maxy)
+
+    :param conn: sqlite3.Connection
+
+    :returns: None
+    """
+
+    for index, name in enumerate(['ST_MinX', 'ST_MinY',
+                                  'ST_MaxX', 'ST_MaxY']):
+        conn.create_function(name, 1, _envelope_function(index))
+    conn.create_function('ST_IsEmpty', 1, _is_empty)
+    conn.create_function('gpkg_bbox_intersects', 5, _bbox_intersects)
+
 
 class GeoPackageProvider(BaseProvider):
-    """Generic provider for geopackage based on spatialite and geopackage module
-    This module requires install of libsqlite3-mod-spatialite
+    """Generic provider for GeoPackage using the sqlite3 module,
+    geometries are decoded natively (no SpatiaLite required)
     TODO: DELETE, UPDATE, CREATE
     """
 
+    # one sqlite connection per thread
+    thread_safe = True
+
     def __init__(self, provider_def):
         """
         GeoPackageProvider Class constructor
@@ -58,7 +327,25 @@ class GeoPackageProvider(BaseProvider):
         BaseProvider.__init__(self, provider_def)
 
         self.table = provider_def['table']
-        self.view = "vgpkg_" + provider_def['table']
+        # connection options, see pygeoapi.util.sqlite_connect
+        self.read_only = provider_def.get('read_only', True)
+        self.immutable = provider_def.get('immutable', False)
+        self.pragmas = provider_def.get('pragmas', {})
+        # offset (default) or keyset
+        self.paging = provider_def.get('paging', 'offset')
+        if self.paging not in ('offset', 'keyset'):
+            msg = 'Invalid paging: {}'.format(self.paging)
+            LOGGER.error(msg)
+            raise ProviderQueryError(msg)
+        # create an R*Tree spatial index if the table has none
+        self.build_spatial_index = provider_def.get(
+            'build_spatial_index', False)
+        self.spatial_index = None
+
+        self.columns = None
+        self.geom_field = None
+        self.pk = None
+        self._connections = ThreadConnections(self.__connect)
 
         LOGGER.debug('Setting GPKG properties:')
         LOGGER.debug('Data source: {}'.format(self.data))
@@ -66,25 +353,26 @@ class GeoPackageProvider(BaseProvider):
         LOGGER.debug('ID_field: {}'.format(self.id_field))
         LOGGER.debug('Table: {}'.format(self.table))
 
-        self.cursor = self.__load()
+        self.__load()
         LOGGER.debug('Got cursor from GeoPackage')
 
-    def __response_feature(self, row_data):
+    def __response_feature(self, row_data, keys=[]):
         """
         Assembles GeoJSON output from DB query
 
         :param row_data: DB row result
+        :param keys: names of the sort key columns, left out
 
         :returns: `dict` of GeoJSON Feature
         """
 
         rd = dict(row_data)  # sqlite3.Row is doesnt support pop
+        for key in keys:
+            rd.pop(key)
         feature = {
             'type': 'Feature'
         }
-        feature["geometry"] = json.loads(
-            rd.pop('AsGeoJSON(geom)')
-            )
+        feature["geometry"] = decode_geometry(rd.pop(self.geom_field))
         feature['properties'] = rd
         feature['id'] = feature['properties'].pop(self.id_field)
 
@@ -103,84 +391,165 @@ class GeoPackageProvider(BaseProvider):
 
         return feature_collection
 
-    def __load(self):
+    def __connect(self):
         """
-        Private method for loading Geopackage,
+        Private method for opening a connection for the current thread.
+        The table structure is read and validated on the first
+        connection only
 
-        :returns: sqlite3.Cursor
+        :returns: sqlite3.Connection
         """
 
-        if (os.path.exists(self.data)):
-            conn = sqlite3.connect(self.data)
-        else:
+        if not os.path.exists(self.data):
             raise InvalidPluginError
 
-        try:
-            conn.enable_load_extension(True)
-        except AttributeError as err:
-            LOGGER.error('Extension loading not enabled: {}'.format(err))
-            raise ProviderConnectionError()
-
-        conn.row_factory = sqlite3.Row
-        conn.enable_load_extension(True)
+        conn = sqlite_connect(self.data, self.read_only, self.immutable,
+                              self.pragmas)
+        register_functions(conn)
         cursor = conn.cursor()
 
-        try:
-            cursor.execute("SELECT load_extension('mod_spatialite.so')")
-        except sqlite3.OperationalError as err:
-            LOGGER.error('Extension loading error: {}'.format(err))
-            raise ProviderConnectionError()
-
-        try:
-            # Starting GeoPackage support
-            cursor.execute("SELECT AutoGPKGStart()")
-            result = cursor.fetchall()
-            if result[0][0] == 1:
-                LOGGER.info("Loaded Geopackage support")
-            else:
-                LOGGER.info("SELECT AutoGPKGStart() returned 0." +
-                            "Likely that this is not a GeoPackage")
+        if self.columns is None:
+            try:
+                cursor.execute("SELECT column_name FROM \
+                gpkg_geometry_columns WHERE lower(table_name) = lower(?)",
+                               (self.table, ))
+            except sqlite3.DatabaseError as err:
+                LOGGER.error('Not a GeoPackage: {}'.format(err))
                 raise InvalidPluginError
-        except InvalidPluginError:
-            raise
+            result = cursor.fetchone()
+            self.geom_field = result[0] if result else 'geom'
 
-        cursor.execute("PRAGMA table_info({})".format(self.view))
-        result = cursor.fetchall()
-        try:
+            cursor.execute('PRAGMA table_info("{}")'.format(self.table))
+            result = cursor.fetchall()
             # TODO: Better exceptions declaring
             # InvalidPluginError as Parent class
             assert len(result), "Table not found"
             assert len([item for item in result
                         if self.id_field in item]), "id_field not present"
             assert len([item for item in result
-                        if self.id_field in item]), "id_field not present"
-            assert len([item for item in result
-                        if 'geom' in item]), "geom column not found"
+                        if self.geom_field in item]), \
+                "geometry column not found"
 
-        except InvalidPluginError:
-            raise
+            pk = [item['name'] for item in result if item['pk']]
+            self.pk = pk[0] if pk else 'rowid'
 
-        self.columns = [item[1] for item in result if item[1] != 'geom']
-        self.columns = ",".join(self.columns)+",AsGeoJSON(geom)"
+            columns = ['"{}"'.format(item['name']) for item in result]
+            self.columns = ",".join(columns)
+            self.fields = {item['name']: {
+                'type': sqlite_field_type(item['type'])
+            } for item in result if item['name'] != self.geom_field}
 
-        # Assembling the view
-        cursor.execute('CREATE VIRTUAL TABLE IF NOT exists \
-            "{}" USING VirtualGPKG("{}")'.format(self.view, self.table))
+            self.spatial_index = self.__get_spatial_index(cursor)
 
-        return cursor
+        return conn
 
-    def __unload(self):
+    def __get_spatial_index(self, cursor):
         """
-        Private method for unloading and deleting views in Geopackage,
-        this method is only called when provider is delete at end of query
+        Private method for finding (or optionally building) the
+        GeoPackage R*Tree spatial index of the geometry column
 
-        :returns: None
+        :param cursor: sqlite3.Cursor
+
+        :returns: `str` of spatial index table name or `None`
+        """
+
+        index_name = 'rtree_{}_{}'.format(self.table, self.geom_field)
+        sql_query = "SELECT name FROM sqlite_master WHERE type = 'table' \
+        AND lower(name) = lower(?)"
+
+        result = cursor.execute(sql_query, (index_name, )).fetchone()
+        if result is not None:
+            LOGGER.debug('Using spatial index {}'.format(result['name']))
+            return result['name']
+
+        if not self.build_spatial_index:
+            LOGGER.debug('No spatial index found for {}'.format(self.table))
+            return None
+
+        # The index is registered in gpkg_extensions along with the
+        # triggers maintaining it, as GDAL and other writers do, so
+        # that the file stays a conformant GeoPackage that can be edited
+        LOGGER.info('Building spatial index {}'.format(index_name))
+        conn = sqlite3.connect(self.data, isolation_level=None)
+        register_functions(conn)
+        try:
+            conn.execute('BEGIN')
+            conn.execute('CREATE VIRTUAL TABLE "{}" USING \
+                rtree(id, minx, maxx, miny, maxy)'.format(index_name))
+            conn.execute('INSERT INTO "{0}" SELECT "{1}", ST_MinX("{2}"), \
+                ST_MaxX("{2}"), ST_MinY("{2}"), ST_MaxY("{2}") FROM "{3}" \
+                WHERE "{2}" IS NOT NULL AND NOT ST_IsEmpty("{2}")'.format(
+                index_name, self.pk, self.geom_field, self.table))
+            for trigger in _RTREE_TRIGGERS:
+                conn.execute(trigger.format(index_name, self.table,
+                                            self.geom_field, self.pk))
+            conn.execute('CREATE TABLE IF NOT EXISTS gpkg_extensions ( \
+                table_name TEXT, column_name TEXT, \
+                extension_name TEXT NOT NULL, definition TEXT NOT NULL, \
+                scope TEXT NOT NULL, \
+                CONSTRAINT ge_tce UNIQUE \
+                (table_name, column_name, extension_name))')
+            conn.execute("INSERT OR REPLACE INTO gpkg_extensions VALUES \
+                (?, ?, 'gpkg_rtree_index', \
+                'http://www.geopackage.org/spec120/#extension_rtree', \
+                'write-only')", (self.table, self.geom_field))
+            conn.execute('COMMIT')
+        except sqlite3.Error as err:
+            LOGGER.error('Spatial index creation error: {}'.format(err))
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise ProviderConnectionError()
+        finally:
+            conn.close()
+
+        return index_name
+
+    def get_fields(self):
+        """
+        Get provider field information (names, types), read from
+        the table structure on first connection
+
+        :returns: dict of fields
+        """
+
+        self.__load()
+        return self.fields
+
+    def __bbox_clause(self, bbox):
+        """
+        Private method assembling bbox predicate, using the
+        spatial index when available and the geometry envelopes
+        otherwise
+
+        :param bbox: bounding box [minx,miny,maxx,maxy]
+
+        :returns: tuple of (`str` of SQL predicate, `list` of parameters)
+        """
+
+        minx, miny, maxx, maxy = [float(c) for c in bbox]
+
+        if self.spatial_index is not None:
+            clause = '"{}" IN (SELECT id FROM "{}" WHERE minx <= ? \
+            AND maxx >= ? AND miny <= ? AND maxy >= ?)'.format(
+                self.pk, self.spatial_index)
+            return clause, [maxx, minx, maxy, miny]
+
+        clause = 'gpkg_bbox_intersects("{}", ?, ?, ?, ?)'.format(
+            self.geom_field)
+        return clause, [minx, miny, maxx, maxy]
+
+    def __load(self):
         """
-        self.cursor.execute("DROP TABLE IF EXISTS {}".format(self.view))
-        self.cursor.execute("SELECT AutoGPKGStop()")
+        Private method returning a cursor on the connection of the
+        current thread, connecting on first use
+
+        :returns: sqlite3.Cursor
+        """
+
+        return self._connections.get().cursor()
 
     def query(self, startindex=0, limit=10, resulttype='results',
-              bbox=[], datetime=None, properties=[], sortby=[]):
+              bbox=[], datetime=None, properties=[], sortby=[], token=None):
         """
         Query Geopackage for all the content.
         e,g: http://localhost:5000/collections/poi/items?
@@ -193,33 +562,56 @@ class GeoPackageProvider(BaseProvider):
         :param datetime: temporal (datestamp or extent)
         :param properties: list of tuples (name, value)
         :param sortby: list of dicts (property, order)
+        :param token: continuation token from a previous page
+                      (keyset paging only)
 
         :returns: GeoJSON FeaturesCollection
         """
         LOGGER.debug('Querying GeoPackage')
 
+        cursor = self.__load()
+
+        where_conditions = []
+        params = []
+        if bbox:
+            clause, clause_params = self.__bbox_clause(bbox)
+            where_conditions.append(clause)
+            params.extend(clause_params)
+
+        if token is not None and self.paging != 'keyset':
+            msg = 'token requires keyset paging'
+            LOGGER.error(msg)
+            raise ProviderInvalidQueryError(msg)
+
+        try:
+            clauses, clause_params = sqlite_filter(
+                self.fields, self.time_field, properties, datetime)
+            where_conditions.extend(clauses)
+            params.extend(clause_params)
+            page_query, page_params, keys = sqlite_select(
+                self.table, self.columns, self.fields, where_conditions,
+                params, sortby, startindex, limit, token)
+        except ValueError as err:
+            LOGGER.error(err)
+            raise ProviderInvalidQueryError(str(err))
+
         if resulttype == 'hits':
             # Geopackage from gdal has already a feature_count but this is
             # not part of standard
             # gpkg_ogr_contents --> table_name and feature_count
-            res = self.cursor.execute("select count(*) as hits from {};"
-                                      .format(self.view))
+            sql_query = 'select count(*) as hits from "{}"'.format(self.table)
+            if where_conditions:
+                sql_query += " where {}".format(' and '.join(where_conditions))
+            res = cursor.execute(sql_query, params)
 
             hits = res.fetchone()["hits"]
             return self.__response_feature_hits(hits)
 
-        end_index = startindex + limit
-        # Not working
-        # http://localhost:5000/collections/countries/items/?startindex=10
-        sql_query = "select {} from {} where rowid >= ? \
-        and rowid <= ?;".format(self.columns, self.view)
-
-        LOGGER.debug('SQL Query: {}'.format(sql_query))
+        LOGGER.debug('SQL Query: {}'.format(page_query))
         LOGGER.debug('Start Index: {}'.format(startindex))
-        LOGGER.debug('End Index: {}'.format(end_index))
+        LOGGER.debug('Limit: {}'.format(limit))
 
-        row_data = self.cursor.execute(
-            sql_query, (startindex, end_index, )).fetchall()
+        row_data = cursor.execute(page_query, page_params).fetchall()
 
         feature_collection = {
             'type': 'FeatureCollection',
@@ -228,7 +620,11 @@ class GeoPackageProvider(BaseProvider):
 
         for rd in row_data:
             feature_collection['features'].append(
-                self.__response_feature(rd))
+                self.__response_feature(rd, keys))
+
+        if self.paging == 'keyset' and len(row_data) == limit:
+            feature_collection['next_token'] = encode_token(
+                [row_data[-1][k] for k in keys])
 
         return feature_collection
 
@@ -244,20 +640,27 @@ class GeoPackageProvider(BaseProvider):
 
         LOGGER.debug('Get item from Geopackage')
 
-        sql_query = "select {} from {} where {}==?;".format(self.columns,
-                                                            self.view,
-                                                            self.id_field)
+        cursor = self.__load()
+
+        sql_query = 'select {} from "{}" where "{}"==?;'.format(
+            self.columns, self.table, self.id_field)
 
         LOGGER.debug('SQL Query:{}'.format(sql_query))
         LOGGER.debug('Identifier:{}'.format(identifier))
 
-        row_data = self.cursor.execute(sql_query, (identifier, )).fetchone()
+        row_data = cursor.execute(sql_query, (identifier, )).fetchone()
 
         feature = self.__response_feature(row_data)
         return feature
 
+    def close(self):
+        """
+        Close the connections of all threads
+
+        :returns: None
+        """
+
+        self._connections.close()
+
     def __repr__(self):
         return '<GeoPackageProvider> {}, {}'.format(self.data, self.table)
-
-    def __del__(self):
-        self.__unload()
@@ -29,6 +29,10 @@
 
 import importlib
 import logging
+import os
+import threading
+import time
+import weakref
 
 from osgeo import gdal as osgeo_gdal
 from osgeo import ogr as osgeo_ogr
@@ -39,6 +43,12 @@ from pygeoapi.provider.base import (BaseProvider)
 LOGGER = logging.getLogger(__name__)
 
 
+class _ThreadHandle(object):
+    """Dataset handle of one thread, dropped along with the thread's locals"""
+
+    __slots__ = ('handle', '__weakref__')
+
+
 class OGRProvider(BaseProvider):
     """
     OGR Provider. Uses GDAL/OGR Python-bindings to access OGR
@@ -61,6 +71,9 @@ class OGRProvider(BaseProvider):
         '*': 'pygeoapi.provider.ogr.CommonSourceHelper'
     }
 
+    # one dataset per thread, paging options set per thread
+    thread_safe = True
+
     def __init__(self, provider_def):
         """
         Initialize object
@@ -163,6 +176,17 @@ class OGRProvider(BaseProvider):
             self.transform_out = \
                 osgeo_osr.CoordinateTransformation(source, target)
 
+        # datasets are kept open per thread between calls, unless
+        # disabled, and closed after idle_timeout seconds unused or
+        # when their thread exits.  Sources paged when opening (WFS,
+        # ESRIJSON) reuse a dataset for queries of the same page only
+        self.handle_cache = provider_def.get('handle_cache', True)
+        self.handle_idle_timeout = provider_def.get(
+            'handle_idle_timeout', 300)
+        self._local = threading.local()
+        self._handles = []
+        self._lock = threading.Lock()
+
         self._load_source_helper(self.data_def['source_type'])
 
         # Layer name is required
@@ -172,9 +196,77 @@ class OGRProvider(BaseProvider):
             LOGGER.error(msg)
             raise Exception(msg)
 
-        # Init driver and Source connection
-        self.driver = None
-        self.conn = None
+    def _handle(self):
+        """
+        Get the dataset handle of the current thread
+
+        :returns: `dict` of conn, source helper, source stamp,
+                  paging it was opened with, last use and whether in use
+        """
+
+        holder = getattr(self._local, 'holder', None)
+        if holder is None:
+            holder = _ThreadHandle()
+            holder.handle = {
+                'conn': None,
+                'helper': self._source_helper_class(self),
+                'stamp': None,
+                'paging': None,
+                'last_used': time.monotonic(),
+                'in_use': False
+            }
+            with self._lock:
+                self._handles.append(holder.handle)
+            weakref.finalize(holder, self._discard, holder.handle)
+            self._local.holder = holder
+
+        return holder.handle
+
+    def _discard(self, handle):
+        with self._lock:
+            self._handles = [h for h in self._handles if h is not handle]
+        handle['conn'] = None
+
+    @property
+    def conn(self):
+        """OGR dataset of the current thread"""
+
+        return self._handle()['conn']
+
+    @conn.setter
+    def conn(self, value):
+        self._handle()['conn'] = value
+
+    @property
+    def source_helper(self):
+        """Source Helper of the current thread"""
+
+        return self._handle()['helper']
+
+    def _source_stamp(self):
+        """
+        Identify the version of the source file (or of the archive
+        holding it) on disk
+
+        :returns: `tuple` of (mtime, size) or `None` for remote sources
+        """
+
+        path = self.data_def['source']
+        for prefix in ('/vsizip/', '/vsigzip/', '/vsitar/'):
+            if path.startswith(prefix):
+                path = path[len(prefix):]
+
+        # walk up from files inside archives to the archive
+        while path and not os.path.exists(path):
+            parent = os.path.dirname(path)
+            if parent == path:
+                return None
+            path = parent
+        if not path:
+            return None
+
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
 
     def _list_open_options(self):
         return [
@@ -182,8 +274,9 @@ class OGRProvider(BaseProvider):
 
     def _open(self):
         source_type = self.data_def['source_type']
-        self.driver = self.ogr.GetDriverByName(source_type)
-        if not self.driver:
+        # the driver is local, as other threads open and close datasets
+        driver = self.ogr.GetDriverByName(source_type)
+        if not driver:
             msg = 'No Driver for Source: {}'.format(source_type)
             LOGGER.error(msg)
             raise Exception(msg)
@@ -193,7 +286,7 @@ class OGRProvider(BaseProvider):
                 self.gdal.OF_VECTOR,
                 open_options=self._list_open_options())
         else:
-            self.conn = self.driver.Open(self.data_def['source'], 0)
+            self.conn = driver.Open(self.data_def['source'], 0)
         if not self.conn:
             msg = 'Cannot open OGR Source: %s' % self.data_def['source']
             LOGGER.error(msg)
@@ -203,20 +296,87 @@ class OGRProvider(BaseProvider):
         if self.source_capabilities['paging']:
             self.source_helper.disable_paging()
 
+        self._handle()['stamp'] = self._source_stamp()
+
     def _close(self):
         self.source_helper.close()
         self.conn = None
         LOGGER.debug('closed self.conn')
 
-        self.driver = None
+    def _get_layer(self, paging=None):
+        handle = self._handle()
+
+        # close datasets left idle by any thread, then claim ours
+        now = time.monotonic()
+        with self._lock:
+            for h in self._handles:
+                if (h['conn'] is not None and not h['in_use'] and
+                        now - h['last_used'] > self.handle_idle_timeout):
+                    LOGGER.debug('closing idle OGR Source')
+                    h['conn'] = None
+            handle['in_use'] = True
+
+        if self.conn and handle['paging'] != paging:
+            LOGGER.debug('OGR Source opened for another page, reopening')
+            self._close()
+
+        if self.conn and handle['stamp'] != self._source_stamp():
+            LOGGER.debug('OGR Source changed, reopening')
+            self._close()
 
-    def _get_layer(self):
         if not self.conn:
+            if paging is not None:
+                self.source_helper.enable_paging(*paging)
             self._open()
+            handle['paging'] = paging
 
         # Delegate getting Layer to SourceHelper
         return self.source_helper.get_layer()
 
+    def _release(self):
+        """
+        Done with the dataset of the current thread: reset the
+        filters of its layer and keep it open for the next call,
+        or close it when not caching
+
+        :returns: None
+        """
+
+        handle = self._handle()
+        try:
+            if not self.handle_cache or not self.conn:
+                self._close()
+                return
+
+            self.source_helper.close()
+            layer = self.conn.GetLayerByName(self.layer_name)
+            layer.SetSpatialFilter(None)
+            layer.SetAttributeFilter(None)
+            layer.ResetReading()
+        except Exception as err:
+            LOGGER.error(err)
+            self._close()
+        finally:
+            with self._lock:
+                handle['in_use'] = False
+                handle['last_used'] = time.monotonic()
+
+    def close(self):
+        """
+        Close the datasets of all threads
+
+        :returns: None
+        """
+
+        with self._lock:
+            handles, self._handles = self._handles, []
+
+        # dropping the thread locals runs finalizers, which take the lock
+        self._local = threading.local()
+
+        for handle in handles:
+            handle['conn'] = None
+
     def get_fields(self):
         """
         Get provider field information (names, types)
@@ -240,7 +400,7 @@ class OGRProvider(BaseProvider):
             LOGGER.error(err)
 
         finally:
-            self._close()
+            self._release()
 
         return fields
 
@@ -261,10 +421,16 @@ class OGRProvider(BaseProvider):
         """
         result = None
         try:
+            paging = None
             if self.source_capabilities['paging']:
-                self.source_helper.enable_paging(startindex, limit)
+                if self.source_helper.paging_on_open:
+                    # paging is set up when opening: datasets are reused
+                    # by queries of the same page only
+                    paging = (startindex, limit)
+                else:
+                    self.source_helper.enable_paging(startindex, limit)
 
-            layer = self._get_layer()
+            layer = self._get_layer(paging)
 
             if bbox:
                 LOGGER.debug('processing bbox parameter')
@@ -299,7 +465,7 @@ class OGRProvider(BaseProvider):
             LOGGER.error(err)
 
         finally:
-            self._close()
+            self._release()
 
         return result
 
@@ -325,7 +491,7 @@ class OGRProvider(BaseProvider):
         except Exception as err:
             LOGGER.error(err)
         finally:
-            self._close()
+            self._release()
 
         return result
 
@@ -334,11 +500,11 @@ class OGRProvider(BaseProvider):
 
     def _load_source_helper(self, source_type):
         """
-        Loads Source Helper by name.
+        Loads Source Helper class by name, instantiated per thread.
 
         :param Source type: Source type name
 
-        :returns: Source Helper object
+        :returns: None
         """
         helper_type = source_type
         if source_type not in OGRProvider.SOURCE_HELPERS.keys():
@@ -349,8 +515,7 @@ class OGRProvider(BaseProvider):
 
         packagename, classname = source_helper_class.rsplit('.', 1)
         module = importlib.import_module(packagename)
-        class_ = getattr(module, classname)
-        self.source_helper = class_(self)
+        self._source_helper_class = getattr(module, classname)
 
     def _ogr_feature_to_json(self, ogr_feature):
         geom = ogr_feature.GetGeometryRef()
@@ -426,6 +591,9 @@ class SourceHelper:
     required. This is delegated to the OGR SourceHelper classes.
     """
 
+    # whether paging is set up when opening the dataset
+    paging_on_open = False
+
     def __init__(self, provider):
         """
         Initialize object with related OGRProvider object.
@@ -566,6 +734,8 @@ class CommonSourceHelper(SourceHelper):
 
 class ESRIJSONHelper(SourceHelper):
 
+    paging_on_open = True
+
     def __init__(self, provider):
         """
         Initialize object
@@ -585,11 +755,11 @@ class ESRIJSONHelper(SourceHelper):
         if startindex < 0:
             return
 
-        self.provider.gdal.SetConfigOption(
+        self.provider.gdal.SetThreadLocalConfigOption(
             'ESRIJSON_FEATURE_SERVER_PAGING', 'ON')
-        self.provider.gdal.SetConfigOption(
+        self.provider.gdal.SetThreadLocalConfigOption(
             'OGR_ESRIJSON_START_INDEX', str(startindex))
-        self.provider.gdal.SetConfigOption(
+        self.provider.gdal.SetThreadLocalConfigOption(
             'OGR_ESRIJSON_PAGE_SIZE', str(limit))
 
     def disable_paging(self):
@@ -597,14 +767,16 @@ class ESRIJSONHelper(SourceHelper):
         Disable paged access to dataset (OGR Driver-specific)
         """
 
-        self.provider.gdal.SetConfigOption(
+        self.provider.gdal.SetThreadLocalConfigOption(
             'ESRIJSON_FEATURE_SERVER_PAGING', None)
-        self.provider.gdal.SetConfigOption(
+        self.provider.gdal.SetThreadLocalConfigOption(
             'OGR_ESRIJSON_PAGE_SIZE', None)
 
 
 class WFSHelper(SourceHelper):
 
+    paging_on_open = True
+
     def __init__(self, provider):
         """
         Initialize object
@@ -624,11 +796,11 @@ class WFSHelper(SourceHelper):
         if startindex < 0:
             return
 
-        self.provider.gdal.SetConfigOption(
+        self.provider.gdal.SetThreadLocalConfigOption(
             'OGR_WFS_PAGING_ALLOWED', 'ON')
-        self.provider.gdal.SetConfigOption(
+        self.provider.gdal.SetThreadLocalConfigOption(
             'OGR_WFS_BASE_START_INDEX', str(startindex))
-        self.provider.gdal.SetConfigOption(
+        self.provider.gdal.SetThreadLocalConfigOption(
             'OGR_WFS_PAGE_SIZE', str(limit))
 
     def disable_paging(self):
@@ -636,7 +808,7 @@ class WFSHelper(SourceHelper):
         Disable paged access to dataset (OGR Driver-specific)
         """
 
-        self.provider.gdal.SetConfigOption(
+        self.provider.gdal.SetThreadLocalConfigOption(
             'OGR_WFS_PAGING_ALLOWED', None)
-        self.provider.gdal.SetConfigOption(
+        self.provider.gdal.SetThreadLocalConfigOption(
             'OGR_WFS_PAGE_SIZE', None)
@@ -45,15 +45,299 @@
 
 import logging
 import json
+import os
+import threading
+import time
+
 import psycopg2
+from psycopg2.extensions import STATUS_READY
 from psycopg2.sql import SQL, Identifier, Literal
 from pygeoapi.provider.base import BaseProvider, \
-    ProviderConnectionError, ProviderQueryError
+    ProviderConnectionError, ProviderInvalidQueryError, ProviderQueryError
+from pygeoapi.util import decode_token, encode_token, RawJSON
 
 from psycopg2.extras import RealDictCursor
 
 LOGGER = logging.getLogger(__name__)
 
+#: Connection pools, keyed by connection parameters
+_POOLS = {}
+_POOLS_LOCK = threading.Lock()
+
+#: Table column information, keyed by connection parameters and table
+_COLUMNS = {}
+
+#: Connections inherited from a parent process.  They share sockets with
+#: the parent and must neither be used nor closed (closing would terminate
+#: the parent's session), so a reference is kept for the process lifetime
+_INHERITED_CONNECTIONS = []
+
+
+def _connection_parameters(conn_dic):
+    """
+    Split provider `data` definition into psycopg2 connection parameters
+    and connection pool settings
+
+    :param conn_dic: dictionary of provider connection parameters
+
+    :returns: tuple of (`dict` of psycopg2 parameters, `dict` of pool
+              settings or `None` if pooling is not enabled)
+    """
+
+    params = dict(conn_dic)
+    pool_def = params.pop('pool', None)
+    search_path = params.pop('search_path', ['public'])
+
+    if search_path != ['public']:
+        params['options'] = '-c search_path={}'.format(
+            ','.join(search_path))
+        LOGGER.debug('Using search path: {}'.format(search_path))
+
+    if not pool_def:
+        pool_def = None
+    elif pool_def is True:
+        pool_def = {}
+    elif not isinstance(pool_def, dict):
+        msg = 'Invalid pool settings: {}'.format(pool_def)
+        LOGGER.error(msg)
+        raise ProviderConnectionError(msg)
+
+    return params, pool_def
+
+
+def _connection_key(params):
+    """
+    Derive hashable key from psycopg2 connection parameters
+
+    :param params: `dict` of psycopg2 connection parameters
+
+    :returns: `tuple` key
+    """
+
+    return tuple(sorted((k, str(v)) for k, v in params.items()))
+
+
+def get_pool(params, pool_def):
+    """
+    Get (or create) the connection pool shared by all providers
+    using the same connection parameters
+
+    :param params: `dict` of psycopg2 connection parameters
+    :param pool_def: `dict` of pool settings
+
+    :returns: `pygeoapi.provider.postgresql.ConnectionPool`
+    """
+
+    key = _connection_key(params)
+
+    with _POOLS_LOCK:
+        if key not in _POOLS:
+            LOGGER.debug('Creating connection pool: {}'.format(pool_def))
+            _POOLS[key] = ConnectionPool(params, **pool_def)
+        return _POOLS[key]
+
+
+class ConnectionPool(object):
+    """Thread-safe pool of psycopg2 connections.
+
+    Connections are created on demand up to `max_size`; idle connections
+    beyond `min_size` are closed after `idle_timeout` seconds.  Connections
+    are optionally checked with a trivial query on checkout, and the pool
+    is re-created when used from a forked process (e.g. gunicorn workers)
+    """
+
+    def __init__(self, params, min_size=1, max_size=10, idle_timeout=300,
+                 timeout=30, health_check=True):
+        """
+        Initialize object
+
+        :param params: `dict` of psycopg2 connection parameters
+        :param min_size: number of idle connections kept regardless of
+                         `idle_timeout`
+        :param max_size: maximum number of open connections
+        :param idle_timeout: seconds after which surplus idle connections
+                             are closed
+        :param timeout: seconds to wait for a free connection when the
+                        pool is exhausted
+        :param health_check: whether to check connections on checkout
+
+        :returns: pygeoapi.provider.postgresql.ConnectionPool
+        """
+
+        self.params = params
+        self.min_size = int(min_size)
+        self.max_size = int(max_size)
+        self.idle_timeout = float(idle_timeout)
+        self.timeout = float(timeout)
+        self.health_check = health_check
+
+        self._reset()
+
+    def _reset(self):
+        """
+        Reset pool state for the current process
+
+        :returns: None
+        """
+
+        self._pid = os.getpid()
+        self._cond = threading.Condition()
+        self._idle = []  # (connection, last used), oldest first
+        self._size = 0
+
+    def _check_fork(self):
+        """
+        Discard connections inherited from a parent process
+
+        :returns: None
+        """
+
+        if self._pid == os.getpid():
+            return
+
+        LOGGER.debug('Process forked; discarding inherited connections')
+        _INHERITED_CONNECTIONS.extend(conn for conn, _ in self._idle)
+        self._reset()
+
+    def _prune(self):
+        """
+        Close surplus connections idle for longer than `idle_timeout`.
+        Must be called with the pool lock held
+
+        :returns: None
+        """
+
+        now = time.monotonic()
+        while (self._idle and len(self._idle) > self.min_size and
+               now - self._idle[0][1] > self.idle_timeout):
+            conn, _ = self._idle.pop(0)
+            self._size -= 1
+            conn.close()
+
+    def _healthy(self, conn):
+        """
+        Check whether a pooled connection is usable
+
+        :param conn: psycopg2 connection
+
+        :returns: `bool` of connection health
+        """
+
+        if conn.closed:
+            return False
+        if not self.health_check:
+            return True
+
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT 1')
+            conn.rollback()
+        except psycopg2.Error as err:
+            LOGGER.debug('Discarding broken connection: {}'.format(err))
+            return False
+
+        return True
+
+    def getconn(self):
+        """
+        Check out a connection, waiting up to `timeout` seconds for
+        one to become available
+
+        :returns: psycopg2 connection
+        """
+
+        self._check_fork()
+        deadline = time.monotonic() + self.timeout
+
+        while True:
+            with self._cond:
+                self._prune()
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        msg = 'Connection pool exhausted'
+                        LOGGER.error(msg)
+                        raise ProviderConnectionError(msg)
+                    self._cond.wait(remaining)
+
+                if self._idle:
+                    conn, _ = self._idle.pop()
+                else:
+                    conn = None
+                    self._size += 1
+
+            if conn is None:
+                try:
+                    return psycopg2.connect(**self.params)
+                except Exception:
+                    self._release()
+                    raise
+
+            if self._healthy(conn):
+                return conn
+
+            conn.close()
+            self._release()
+
+    def putconn(self, conn, close=False):
+        """
+        Return a connection to the pool
+
+        :param conn: psycopg2 connection
+        :param close: whether to close the connection instead of
+                      keeping it
+
+        :returns: None
+        """
+
+        if self._pid != os.getpid():
+            return
+
+        if not close and not conn.closed:
+            try:
+                if conn.status != STATUS_READY:
+                    conn.rollback()
+            except psycopg2.Error:
+                close = True
+
+        if close or conn.closed:
+            conn.close()
+            self._release()
+            return
+
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def _release(self):
+        """
+        Give back a connection slot
+
+        :returns: None
+        """
+
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def closeall(self):
+        """
+        Close all idle connections
+
+        :returns: None
+        """
+
+        self._check_fork()
+        with self._cond:
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._size -= 1
+                conn.close()
+            self._cond.notify_all()
+
+    def __repr__(self):
+        return '<ConnectionPool> {}/{}'.format(self._size, self.max_size)
+
 
 class DatabaseConnection(object):
     """Database connection class to be used as 'with' statement.
@@ -78,6 +362,10 @@ class DatabaseConnection(object):
              or in a specific schema ["osm", "public"].
              Note: First we should have the schema
              being used and then public
+            pool – optional connection pool settings (min_size, max_size,
+             idle_timeout, timeout, health_check).  When set, connections
+             are checked out from a pool shared by all providers with the
+             same connection parameters
 
         :param table: table name containing the data. This variable is used to
                 assemble column information
@@ -92,15 +380,16 @@ class DatabaseConnection(object):
         self.columns = None
         self.fields = {}  # Dict of columns. Key is col name, value is type
         self.conn = None
+        self.pool = None
 
     def __enter__(self):
+        params, pool_def = _connection_parameters(self.conn_dic)
         try:
-            search_path = self.conn_dic.pop('search_path', ['public'])
-            if search_path != ['public']:
-                self.conn_dic["options"] = f'-c \
-                search_path={",".join(search_path)}'
-                LOGGER.debug(f'Using search path: {search_path} ')
-            self.conn = psycopg2.connect(**self.conn_dic)
+            if pool_def is not None:
+                self.pool = get_pool(params, pool_def)
+                self.conn = self.pool.getconn()
+            else:
+                self.conn = psycopg2.connect(**params)
 
         except psycopg2.OperationalError:
             LOGGER.error("Couldn't connect to Postgis using:{}".format(
@@ -110,12 +399,18 @@ class DatabaseConnection(object):
         self.cur = self.conn.cursor()
         if self.context == 'query':
             # Getting columns
-            query_cols = "SELECT column_name, udt_name FROM information_schema.columns \
-            WHERE table_name = '{}' and udt_name != 'geometry';".format(
-                self.table)
+            key = (_connection_key(params), self.table)
+            result = _COLUMNS.get(key)
+            if result is None:
+                query_cols = "SELECT column_name, udt_name \
+                FROM information_schema.columns \
+                WHERE table_name = '{}' and udt_name != 'geometry';".format(
+                    self.table)
+
+                self.cur.execute(query_cols)
+                result = self.cur.fetchall()
+                _COLUMNS[key] = result
 
-            self.cur.execute(query_cols)
-            result = self.cur.fetchall()
             self.columns = SQL(', ').join(
                 [Identifier(item[0]) for item in result]
                 )
@@ -125,7 +420,10 @@ class DatabaseConnection(object):
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         # some logic to commit/rollback
-        self.conn.close()
+        if self.pool is not None:
+            self.pool.putconn(self.conn)
+        else:
+            self.conn.close()
 
 
 class PostgreSQLProvider(BaseProvider):
@@ -134,6 +432,9 @@ class PostgreSQLProvider(BaseProvider):
     cursor (using support class DatabaseCursor)
     """
 
+    # a connection is checked out per call
+    thread_safe = True
+
     def __init__(self, provider_def):
         """
         PostgreSQLProvider Class constructor
@@ -152,6 +453,25 @@ class PostgreSQLProvider(BaseProvider):
         self.id_field = provider_def['id_field']
         self.conn_dic = provider_def['data']
         self.geom = provider_def.get('geom_field', 'geom')
+        # offset (default) or keyset
+        self.paging = provider_def.get('paging', 'offset')
+        # build GeoJSON in the database and pass it through unparsed
+        self.server_side_geojson = provider_def.get(
+            'server_side_geojson', False)
+        # exact, estimate or capped; results pages only report
+        # numberMatched when a strategy is set
+        self.count_strategy = provider_def.get('count_strategy')
+        self.count_cap = int(provider_def.get('count_cap', 10000))
+
+        if self.paging not in ('offset', 'keyset'):
+            msg = 'Invalid paging: {}'.format(self.paging)
+            LOGGER.error(msg)
+            raise ProviderQueryError(msg)
+
+        if self.count_strategy not in (None, 'exact', 'estimate', 'capped'):
+            msg = 'Invalid count_strategy: {}'.format(self.count_strategy)
+            LOGGER.error(msg)
+            raise ProviderQueryError(msg)
 
         LOGGER.debug('Setting Postgresql properties:')
         LOGGER.debug('Connection String:{}'.format(
@@ -159,6 +479,7 @@ class PostgreSQLProvider(BaseProvider):
         LOGGER.debug('Name:{}'.format(self.name))
         LOGGER.debug('ID_field:{}'.format(self.id_field))
         LOGGER.debug('Table:{}'.format(self.table))
+        LOGGER.debug('Paging:{}'.format(self.paging))
 
         LOGGER.debug('Get available fields/properties')
         self.get_fields()
@@ -170,7 +491,7 @@ class PostgreSQLProvider(BaseProvider):
         return self.fields
 
     def query(self, startindex=0, limit=10, resulttype='results',
-              bbox=[], datetime=None, properties=[], sortby=[]):
+              bbox=[], datetime=None, properties=[], sortby=[], token=None):
         """
         Query Postgis for all the content.
         e,g: http://localhost:5000/collections/hotosm_bdi_waterways/items?
@@ -183,28 +504,17 @@ class PostgreSQLProvider(BaseProvider):
         :param datetime: temporal (datestamp or extent)
         :param properties: list of tuples (name, value)
         :param sortby: list of dicts (property, order)
+        :param token: continuation token from a previous page
+                      (keyset paging only)
 
         :returns: GeoJSON FeaturesCollection
         """
         LOGGER.debug('Querying PostGIS')
 
-        if resulttype == 'hits':
-
-            with DatabaseConnection(self.conn_dic,
-                                    self.table, context="hits") as db:
-                cursor = db.conn.cursor(cursor_factory=RealDictCursor)
-                sql_query = SQL("select count(*) as hits from {}").\
-                    format(Identifier(self.table))
-                try:
-                    cursor.execute(sql_query)
-                except Exception as err:
-                    LOGGER.error('Error executing sql_query: {}: {}'.format(
-                        sql_query.as_string(cursor)), err)
-                    raise ProviderQueryError()
-
-                hits = cursor.fetchone()["hits"]
-
-            return self.__response_feature_hits(hits)
+        if token is not None and self.paging != 'keyset':
+            msg = 'token requires keyset paging'
+            LOGGER.error(msg)
+            raise ProviderInvalidQueryError(msg)
 
         end_index = startindex + limit
 
@@ -214,7 +524,8 @@ class PostgreSQLProvider(BaseProvider):
             if properties:
                 property_clauses = \
                     [SQL('{} = {}').format(
-                        Identifier(k), Literal(v)) for k, v in properties]
+                        Identifier(k), self.__typed_literal(k, v, db.fields))
+                     for k, v in properties]
                 where_conditions += property_clauses
             if bbox:
                 bbox_clause = SQL('{} && ST_MakeEnvelope({})').format(
@@ -224,6 +535,40 @@ class PostgreSQLProvider(BaseProvider):
                     )
                 )
                 where_conditions.append(bbox_clause)
+            if datetime is not None:
+                where_conditions.append(
+                    self.__datetime_clause(datetime, db.fields))
+
+            if resulttype == 'hits':
+                hits = self.__count(cursor, where_conditions,
+                                    self.count_strategy or 'exact')
+                return self.__response_feature_hits(hits)
+
+            number_matched = None
+            if self.count_strategy is not None:
+                number_matched = self.__count(cursor, where_conditions,
+                                              self.count_strategy)
+
+            keys = [(s['property'], s['order']) for s in sortby]
+            if keys and self.id_field not in [k for k, _ in keys]:
+                # tiebreaker for a stable order across pages
+                keys.append((self.id_field, 'A'))
+
+            if self.paging == 'keyset':
+                if not keys:
+                    keys = [(self.id_field, 'A')]
+                if token is not None:
+                    try:
+                        values = decode_token(token)
+                    except ValueError:
+                        raise ProviderInvalidQueryError('invalid token')
+                    if len(values) != len(keys):
+                        msg = 'token does not match sort keys'
+                        LOGGER.error(msg)
+                        raise ProviderInvalidQueryError(msg)
+                    where_conditions.append(
+                        self.__keyset_clause(keys, values, db.fields))
+                    startindex = 0
 
             if where_conditions:
                 where_clause = SQL(' WHERE {}').format(
@@ -231,21 +576,48 @@ class PostgreSQLProvider(BaseProvider):
                 )
             else:
                 where_clause = SQL('')
-            sql_query = SQL("DECLARE \"geo_cursor\" CURSOR FOR \
-             SELECT {},ST_AsGeoJSON({}) FROM {}{}").\
-                format(db.columns,
-                       Identifier(self.geom),
-                       Identifier(self.table),
-                       where_clause)
+
+            if self.server_side_geojson:
+                select_list = self.__feature_json(db.fields)
+                if keys:
+                    select_list = SQL('{}, {}').format(
+                        select_list,
+                        SQL(', ').join([Identifier(k) for k, _ in keys]))
+            else:
+                select_list = SQL('{},ST_AsGeoJSON({})').format(
+                    db.columns, Identifier(self.geom))
+
+            if self.paging == 'keyset':
+                sql_query = SQL("SELECT {} FROM {}{} \
+                 ORDER BY {} LIMIT {} OFFSET {}").\
+                    format(select_list,
+                           Identifier(self.table),
+                           where_clause,
+                           self.__order_by(keys, nulls_last=True),
+                           Literal(limit),
+                           Literal(startindex))
+            else:
+                if keys:
+                    order_by_clause = SQL(' ORDER BY {}').format(
+                        self.__order_by(keys))
+                else:
+                    order_by_clause = SQL('')
+                sql_query = SQL("DECLARE \"geo_cursor\" CURSOR FOR \
+                 SELECT {} FROM {}{}{}").\
+                    format(select_list,
+                           Identifier(self.table),
+                           where_clause,
+                           order_by_clause)
 
             LOGGER.debug('SQL Query: {}'.format(sql_query.as_string(cursor)))
             LOGGER.debug('Start Index: {}'.format(startindex))
             LOGGER.debug('End Index: {}'.format(end_index))
             try:
                 cursor.execute(sql_query)
-                for index in [startindex, limit]:
-                    cursor.execute("fetch forward {} from geo_cursor"
-                                   .format(index))
+                if self.paging != 'keyset':
+                    for index in [startindex, limit]:
+                        cursor.execute("fetch forward {} from geo_cursor"
+                                       .format(index))
             except Exception as err:
                 LOGGER.error('Error executing sql_query: {}'.format(
                     sql_query.as_string(cursor)))
@@ -259,9 +631,21 @@ class PostgreSQLProvider(BaseProvider):
                 'features': []
             }
 
-            for rd in row_data:
-                feature_collection['features'].append(
-                    self.__response_feature(rd))
+            if number_matched is not None:
+                feature_collection['numberMatched'] = number_matched
+
+            if self.server_side_geojson:
+                feature_collection['features'] = RawJSON('[{}]'.format(
+                    ','.join(rd['_feature'] for rd in row_data)))
+                feature_collection['numberReturned'] = len(row_data)
+            else:
+                for rd in row_data:
+                    feature_collection['features'].append(
+                        self.__response_feature(rd))
+
+            if self.paging == 'keyset' and len(row_data) == limit:
+                feature_collection['next_token'] = encode_token(
+                    [row_data[-1][k] for k, _ in keys])
 
             return feature_collection
 
@@ -300,6 +684,220 @@ class PostgreSQLProvider(BaseProvider):
 
             return feature
 
+    def close(self):
+        """
+        Forget cached column information for the provider table
+
+        :returns: None
+        """
+
+        params, _ = _connection_parameters(self.conn_dic)
+        _COLUMNS.pop((_connection_key(params), self.table), None)
+
+    def __count(self, cursor, where_conditions, strategy):
+        """
+        Count features matching the query filters
+
+        :param cursor: database cursor
+        :param where_conditions: list of filter predicates
+        :param strategy: exact (count(*)), estimate (planner row estimate)
+                         or capped (count(*) of at most `count_cap` rows,
+                         i.e. a lower bound for larger results)
+
+        :returns: `int` of matching features
+        """
+
+        if where_conditions:
+            where_clause = SQL(' WHERE {}').format(
+                SQL(' AND ').join(where_conditions))
+        else:
+            where_clause = SQL('')
+
+        hits = None
+
+        try:
+            if strategy == 'estimate' and not where_conditions:
+                sql_query = SQL("SELECT reltuples::bigint AS hits \
+                    FROM pg_class WHERE oid = to_regclass(quote_ident({}))")\
+                    .format(Literal(self.table))
+                cursor.execute(sql_query)
+                result = cursor.fetchone()
+                # never vacuumed/analyzed tables report 0 or -1
+                if result is not None and result['hits'] > 0:
+                    hits = result['hits']
+            elif strategy == 'estimate':
+                sql_query = SQL("EXPLAIN (FORMAT JSON) SELECT 1 FROM {}{}")\
+                    .format(Identifier(self.table), where_clause)
+                cursor.execute(sql_query)
+                plan = list(cursor.fetchone().values())[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                hits = int(plan[0]['Plan']['Plan Rows'])
+            elif strategy == 'capped':
+                sql_query = SQL("SELECT count(*) AS hits FROM \
+                    (SELECT 1 FROM {}{} LIMIT {}) AS capped").format(
+                    Identifier(self.table), where_clause,
+                    Literal(self.count_cap))
+                cursor.execute(sql_query)
+                hits = cursor.fetchone()['hits']
+
+            if hits is None:
+                sql_query = SQL("SELECT count(*) AS hits FROM {}{}").format(
+                    Identifier(self.table), where_clause)
+                cursor.execute(sql_query)
+                hits = cursor.fetchone()['hits']
+        except Exception as err:
+            LOGGER.error('Error executing sql_query: {}'.format(
+                sql_query.as_string(cursor)))
+            LOGGER.error(err)
+            raise ProviderQueryError()
+
+        LOGGER.debug('Counted {} hits ({})'.format(hits, strategy))
+        return hits
+
+    def __order_by(self, keys, nulls_last=False):
+        """
+        Assembles ORDER BY expression list
+
+        :param keys: list of tuples (column, order)
+        :param nulls_last: whether NULLs sort last in both orders
+                           (by default they sort first in descending order)
+
+        :returns: psycopg2.sql.Composed
+        """
+
+        nulls = ' NULLS LAST' if nulls_last else ''
+        return SQL(', ').join(
+            [SQL(('{} DESC' if order == 'D' else '{} ASC') + nulls).format(
+                Identifier(k)) for k, order in keys])
+
+    def __typed_literal(self, name, value, fields):
+        """
+        Assembles literal cast to the type of a column, so that
+        comparisons use the column's indexes
+
+        :param name: column name
+        :param value: value
+        :param fields: dict of table columns (name, type)
+
+        :returns: psycopg2.sql.Composed
+        """
+
+        if name not in fields:
+            return Literal(value)
+
+        return SQL('CAST({} AS {})').format(Literal(value),
+                                            Identifier(fields[name]))
+
+    def __datetime_clause(self, datetime_, fields):
+        """
+        Assembles temporal predicate on time_field
+
+        :param datetime_: temporal (datestamp or extent)
+        :param fields: dict of table columns (name, type)
+
+        :returns: psycopg2.sql.Composed
+        """
+
+        if self.time_field is None:
+            LOGGER.error('time_field not enabled for collection')
+            raise ProviderQueryError()
+
+        time_field = Identifier(self.time_field)
+
+        if '/' not in datetime_:  # time instant
+            LOGGER.debug('detected time instant')
+            return SQL('{} = {}').format(time_field, self.__typed_literal(
+                self.time_field, datetime_, fields))
+
+        LOGGER.debug('detected time range')
+        time_begin, time_end = datetime_.split('/')
+
+        conditions = []
+        if time_begin not in ('..', ''):
+            conditions.append(SQL('{} >= {}').format(
+                time_field,
+                self.__typed_literal(self.time_field, time_begin, fields)))
+        if time_end not in ('..', ''):
+            conditions.append(SQL('{} <= {}').format(
+                time_field,
+                self.__typed_literal(self.time_field, time_end, fields)))
+
+        if not conditions:
+            return SQL('TRUE')
+
+        return SQL(' AND ').join(conditions)
+
+    def __keyset_clause(self, keys, values, fields):
+        """
+        Assembles predicate selecting the rows sorting after the given
+        key values, e.g. (a > 1 OR a IS NULL) OR (a = 1 AND b > 2) for
+        ascending keys.  NULL sort keys sort last in either order
+
+        :param keys: list of tuples (column, order)
+        :param values: list of key values of the last row of a page
+        :param fields: dict of table columns (name, type)
+
+        :returns: psycopg2.sql.Composed
+        """
+
+        if keys == [(self.id_field, 'A')]:
+            # a single comparison can be answered by the id index
+            return SQL('{} > {}').format(
+                Identifier(self.id_field),
+                self.__typed_literal(self.id_field, values[0], fields))
+
+        clauses = []
+        equal = []
+        for (key, order), value in zip(keys, values):
+            column = Identifier(key)
+            if value is None:
+                # only NULLs sort after (and equal to) a NULL
+                equal.append(SQL('{} IS NULL').format(column))
+                continue
+
+            literal = self.__typed_literal(key, value, fields)
+            op = SQL('<') if order == 'D' else SQL('>')
+            after = SQL('{} {} {}').format(column, op, literal)
+            if key != self.id_field:
+                after = SQL('({} OR {} IS NULL)').format(after, column)
+            clauses.append(SQL('({})').format(
+                SQL(' AND ').join(equal + [after])))
+            equal.append(SQL('{} = {}').format(column, literal))
+
+        if not clauses:
+            return SQL('FALSE')
+
+        return SQL('({})').format(SQL(' OR ').join(clauses))
+
+    def __feature_json(self, fields):
+        """
+        Assembles select list expression serializing each row
+        as a GeoJSON Feature in the database
+
+        :param fields: dict of table columns (name, type)
+
+        :returns: psycopg2.sql.Composed
+        """
+
+        property_columns = [k for k in fields.keys() if k != self.id_field]
+        if property_columns:
+            # row_to_json keeps column order; the derived table
+            # references the columns of the outer query row
+            properties = SQL('(SELECT row_to_json(p) FROM (SELECT {}) p)')\
+                .format(SQL(', ').join(
+                    [Identifier(k) for k in property_columns]))
+        else:
+            properties = SQL("'{}'::json")
+
+        sql_feature = SQL("json_build_object('type', 'Feature', 'id', {}, \
+            'geometry', ST_AsGeoJSON({})::json, 'properties', {})::text \
+            AS \"_feature\"")
+
+        return sql_feature.format(Identifier(self.id_field),
+                                  Identifier(self.geom),
+                                  properties)
+
     def __response_feature(self, row_data):
         """
         Assembles GeoJSON output from DB query
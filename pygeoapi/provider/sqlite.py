@@ -34,7 +34,12 @@ import logging
 import os
 import json
 from pygeoapi.plugin import InvalidPluginError
-from pygeoapi.provider.base import BaseProvider, ProviderConnectionError
+from pygeoapi.provider.base import (BaseProvider, ProviderConnectionError,
+                                    ProviderInvalidQueryError,
+                                    ProviderQueryError)
+from pygeoapi.util import (ThreadConnections, encode_token,
+                           sqlite_connect, sqlite_field_type, sqlite_filter,
+                           sqlite_select)
 
 LOGGER = logging.getLogger(__name__)
 
@@ -45,6 +50,9 @@ class SQLiteProvider(BaseProvider):
     TODO: DELETE, UPDATE, CREATE
     """
 
+    # one sqlite connection per thread
+    thread_safe = True
+
     def __init__(self, provider_def):
         """
         SQLiteProvider Class constructor
@@ -57,6 +65,25 @@ class SQLiteProvider(BaseProvider):
         BaseProvider.__init__(self, provider_def)
 
         self.table = provider_def['table']
+        # open read-only; immutable skips locking and change detection
+        # altogether and must only be used for files that never change
+        self.read_only = provider_def.get('read_only', True)
+        self.immutable = provider_def.get('immutable', False)
+        # e.g. mmap_size, cache_size
+        self.pragmas = provider_def.get('pragmas', {})
+        # offset (default) or keyset
+        self.paging = provider_def.get('paging', 'offset')
+        if self.paging not in ('offset', 'keyset'):
+            msg = 'Invalid paging: {}'.format(self.paging)
+            LOGGER.error(msg)
+            raise ProviderQueryError(msg)
+        # create a SpatiaLite spatial index if the table has none
+        self.build_spatial_index = provider_def.get(
+            'build_spatial_index', False)
+        self.spatial_index = None
+
+        self.columns = None
+        self._connections = ThreadConnections(self.__connect)
 
         LOGGER.debug('Setting SQLite properties:')
         LOGGER.debug('Data source: {}'.format(self.data))
@@ -64,16 +91,21 @@ class SQLiteProvider(BaseProvider):
         LOGGER.debug('ID_field: {}'.format(self.id_field))
         LOGGER.debug('Table: {}'.format(self.table))
 
-    def __response_feature(self, row_data):
+        self.get_fields()
+
+    def __response_feature(self, row_data, keys=[]):
         """
         Assembles GeoJSON output from DB query
 
         :param row_data: DB row result
+        :param keys: names of the sort key columns, left out
 
         :returns: `dict` of GeoJSON Feature
         """
 
         rd = dict(row_data)  # sqlite3.Row is doesnt support pop
+        for key in keys:
+            rd.pop(key)
         feature = {
             'type': 'Feature'
         }
@@ -97,56 +129,155 @@ class SQLiteProvider(BaseProvider):
 
         return feature_collection
 
-    def __load(self):
+    def __connect(self):
         """
-        Private method for loading spatiallite,
-        get the table structure and dump geometry
+        Private method for opening a connection for the current thread,
+        loading spatialite and applying pragmas.  The table structure is
+        read and validated on the first connection only
 
-        :returns: sqlite3.Cursor
+        :returns: sqlite3.Connection
         """
 
-        if (os.path.exists(self.data)):
-            conn = sqlite3.connect(self.data)
-        else:
+        if not os.path.exists(self.data):
             raise InvalidPluginError
 
+        conn = sqlite_connect(self.data, self.read_only, self.immutable,
+                              self.pragmas)
+
         try:
             conn.enable_load_extension(True)
         except AttributeError as err:
             LOGGER.error('Extension loading not enabled: {}'.format(err))
             raise ProviderConnectionError()
 
-        conn.row_factory = sqlite3.Row
-        conn.enable_load_extension(True)
         cursor = conn.cursor()
         try:
             cursor.execute("SELECT load_extension('mod_spatialite.so')")
-            cursor.execute("PRAGMA table_info({})".format(self.table))
         except sqlite3.OperationalError as err:
             LOGGER.error('Extension loading error: {}'.format(err))
             raise ProviderConnectionError()
-        result = cursor.fetchall()
+        conn.enable_load_extension(False)
+
+        if self.columns is None:
+            cursor.execute('PRAGMA table_info("{}")'.format(self.table))
+            result = cursor.fetchall()
+            try:
+                # TODO: Better exceptions declaring
+                # InvalidPluginError as Parent class
+                assert len(result), "Table not found"
+                assert len([item for item in result
+                            if item['pk'] == 1]), "Primary key not found"
+                assert len([item for item in result
+                            if self.id_field in item]), "id_field not present"
+                assert len([item for item in result
+                            if 'GEOMETRY' in item]), \
+                    "GEOMETRY column not found"
+
+            except InvalidPluginError:
+                raise
+
+            columns = [item[1] for item in result if item[1] != 'GEOMETRY']
+            self.columns = ",".join(columns)+",AsGeoJSON(geometry)"
+            self.fields = {item['name']: {
+                'type': sqlite_field_type(item['type'])
+            } for item in result if item['name'].lower() != 'geometry'}
+
+            self.spatial_index = self.__get_spatial_index(cursor)
+
+        return conn
+
+    def __get_spatial_index(self, cursor):
+        """
+        Private method for finding (or optionally building) the
+        SpatiaLite R*Tree spatial index of the geometry column
+
+        :param cursor: sqlite3.Cursor
+
+        :returns: `str` of spatial index table name or `None`
+        """
+
+        index_name = 'idx_{}_geometry'.format(self.table)
+        sql_query = "SELECT name FROM sqlite_master WHERE type = 'table' \
+        AND lower(name) = lower(?)"
+
+        result = cursor.execute(sql_query, (index_name, )).fetchone()
+        if result is not None:
+            LOGGER.debug('Using spatial index {}'.format(result['name']))
+            return result['name']
+
+        if not self.build_spatial_index:
+            LOGGER.debug('No spatial index found for {}'.format(self.table))
+            return None
+
+        LOGGER.info('Building spatial index {}'.format(index_name))
+        conn = sqlite3.connect(self.data)
         try:
-            # TODO: Better exceptions declaring
-            # InvalidPluginError as Parent class
-            assert len(result), "Table not found"
-            assert len([item for item in result
-                        if item['pk'] == 1]), "Primary key not found"
-            assert len([item for item in result
-                        if self.id_field in item]), "id_field not present"
-            assert len([item for item in result
-                        if 'GEOMETRY' in item]), "GEOMETRY column not found"
+            conn.enable_load_extension(True)
+            conn.execute("SELECT load_extension('mod_spatialite.so')")
+            conn.execute("SELECT CreateSpatialIndex(?, 'geometry')",
+                         (self.table, ))
+            conn.commit()
+        except sqlite3.Error as err:
+            LOGGER.error('Spatial index creation error: {}'.format(err))
+            raise ProviderConnectionError()
+        finally:
+            conn.close()
+
+        return index_name
+
+    def get_fields(self):
+        """
+        Get provider field information (names, types), read from
+        the table structure on first connection
+
+        :returns: dict of fields
+        """
+
+        self.__load()
+        return self.fields
+
+    def __bbox_clause(self, bbox):
+        """
+        Private method assembling bbox predicate, using the
+        spatial index when available
 
-        except InvalidPluginError:
-            raise
+        :param bbox: bounding box [minx,miny,maxx,maxy]
+
+        :returns: tuple of (`str` of SQL predicate, `list` of parameters)
+        """
+
+        minx, miny, maxx, maxy = [float(c) for c in bbox]
+
+        if self.spatial_index is not None:
+            clause = 'rowid IN (SELECT pkid FROM "{}" WHERE xmin <= ? \
+            AND xmax >= ? AND ymin <= ? AND ymax >= ?)'.format(
+                self.spatial_index)
+            return clause, [maxx, minx, maxy, miny]
+
+        clause = 'MbrIntersects(geometry, BuildMbr(?, ?, ?, ?))'
+        return clause, [minx, miny, maxx, maxy]
 
-        self.columns = [item[1] for item in result if item[1] != 'GEOMETRY']
-        self.columns = ",".join(self.columns)+",AsGeoJSON(geometry)"
+    def __load(self):
+        """
+        Private method returning a cursor on the connection of the
+        current thread, connecting on first use
+
+        :returns: sqlite3.Cursor
+        """
 
-        return cursor
+        return self._connections.get().cursor()
+
+    def close(self):
+        """
+        Close the connections of all threads
+
+        :returns: None
+        """
+
+        self._connections.close()
 
     def query(self, startindex=0, limit=10, resulttype='results',
-              bbox=[], datetime=None, properties=[], sortby=[]):
+              bbox=[], datetime=None, properties=[], sortby=[], token=None):
         """
         Query SQLite for all the content.
         e,g: http://localhost:5000/collections/countries/items?
@@ -159,6 +290,8 @@ class SQLiteProvider(BaseProvider):
         :param datetime: temporal (datestamp or extent)
         :param properties: list of tuples (name, value)
         :param sortby: list of dicts (property, order)
+        :param token: continuation token from a previous page
+                      (keyset paging only)
 
         :returns: GeoJSON FeaturesCollection
         """
@@ -168,24 +301,44 @@ class SQLiteProvider(BaseProvider):
 
         LOGGER.debug('Got cursor from DB')
 
+        where_conditions = []
+        params = []
+        if bbox:
+            clause, clause_params = self.__bbox_clause(bbox)
+            where_conditions.append(clause)
+            params.extend(clause_params)
+
+        if token is not None and self.paging != 'keyset':
+            msg = 'token requires keyset paging'
+            LOGGER.error(msg)
+            raise ProviderInvalidQueryError(msg)
+
+        try:
+            clauses, clause_params = sqlite_filter(
+                self.fields, self.time_field, properties, datetime)
+            where_conditions.extend(clauses)
+            params.extend(clause_params)
+            page_query, page_params, keys = sqlite_select(
+                self.table, self.columns, self.fields, where_conditions,
+                params, sortby, startindex, limit, token)
+        except ValueError as err:
+            LOGGER.error(err)
+            raise ProviderInvalidQueryError(str(err))
+
         if resulttype == 'hits':
-            res = cursor.execute("select count(*) as hits from {};".format(
-                self.table))
+            sql_query = 'select count(*) as hits from "{}"'.format(self.table)
+            if where_conditions:
+                sql_query += " where {}".format(' and '.join(where_conditions))
+            res = cursor.execute(sql_query, params)
 
             hits = res.fetchone()["hits"]
             return self.__response_feature_hits(hits)
 
-        end_index = startindex + limit
-        # Not working
-        # http://localhost:5000/collections/countries/items/?startindex=10
-        sql_query = "select {} from {} where rowid >= ? \
-        and rowid <= ?;".format(self.columns, self.table)
-
-        LOGGER.debug('SQL Query: {}'.format(sql_query))
+        LOGGER.debug('SQL Query: {}'.format(page_query))
         LOGGER.debug('Start Index: {}'.format(startindex))
-        LOGGER.debug('End Index: {}'.format(end_index))
+        LOGGER.debug('Limit: {}'.format(limit))
 
-        row_data = cursor.execute(sql_query, (startindex, end_index, ))
+        row_data = cursor.execute(page_query, page_params).fetchall()
 
         feature_collection = {
             'type': 'FeatureCollection',
@@ -194,7 +347,11 @@ class SQLiteProvider(BaseProvider):
 
         for rd in row_data:
             feature_collection['features'].append(
-                self.__response_feature(rd))
+                self.__response_feature(rd, keys))
+
+        if self.paging == 'keyset' and len(row_data) == limit:
+            feature_collection['next_token'] = encode_token(
+                [row_data[-1][k] for k in keys])
 
         return feature_collection
 
@@ -214,9 +371,8 @@ class SQLiteProvider(BaseProvider):
 
         LOGGER.debug('Got cursor from DB')
 
-        sql_query = "select {} from {} where {}==?;".format(self.columns,
-                                                            self.table,
-                                                            self.id_field)
+        sql_query = 'select {} from "{}" where "{}"==?;'.format(
+            self.columns, self.table, self.id_field)
 
         LOGGER.debug('SQL Query: {}'.format(sql_query))
         LOGGER.debug('Identifier: {}'.format(identifier))
@@ -175,6 +175,48 @@ async def dataset(request: Request, feature_collection=None, feature=None):
     return response
 
 
+@app.route('/collections/{feature_collection}/aggregate')
+@app.route('/collections/{feature_collection}/aggregate/')
+async def aggregate(request: Request, feature_collection=None):
+    """
+    Grid aggregation of collections/{dataset} access point
+
+    :returns: Starlette HTTP Response
+    """
+
+    if 'feature_collection' in request.path_params:
+        feature_collection = request.path_params['feature_collection']
+    headers, status_code, content = api_.get_collection_aggregate(
+        request.headers, request.query_params, feature_collection)
+
+    response = Response(content=content, status_code=status_code)
+
+    if headers:
+        response.headers.update(headers)
+
+    return response
+
+
+@app.route('/batch', methods=['POST'])
+@app.route('/batch/', methods=['POST'])
+async def batch(request: Request):
+    """
+    Batch of feature collection queries access point
+
+    :returns: Starlette HTTP Response
+    """
+
+    headers, status_code, content = api_.get_collection_items_batch(
+        request.headers, request.query_params, await request.body())
+
+    response = Response(content=content, status_code=status_code)
+
+    if headers:
+        response.headers.update(headers)
+
+    return response
+
+
 @app.route('/processes')
 @app.route('/processes/')
 @app.route('/processes/{name}')
@@ -29,12 +29,21 @@
 
 """Generic util functions used in the code"""
 
+import base64
+import binascii
 from datetime import date, datetime, time
 from decimal import Decimal
+import json
 import logging
+import math
 import os
 import re
+import sqlite3
+import threading
+import weakref
 
+from dateutil.parser import parse as dateparse
+from dateutil.tz import tzutc
 import yaml
 
 LOGGER = logging.getLogger(__name__)
@@ -126,3 +135,567 @@ def json_serial(obj):
     msg = '{} type {} not serializable'.format(obj, type(obj))
     LOGGER.error(msg)
     raise TypeError(msg)
+
+
+class RawJSON(str):
+    """
+    JSON text serialized elsewhere (e.g. by a database), to be embedded
+    verbatim in responses by `to_json` rather than parsed and
+    re-serialized
+    """
+
+    pass
+
+
+def to_json(dict_, **kwargs):
+    """
+    helper function to serialize a dict to JSON, embedding any
+    top-level `RawJSON` values verbatim
+
+    :param dict_: `dict` (or other object) of JSON representation
+    :param kwargs: keyword arguments passed to `json.dumps`
+
+    :returns: JSON string representation
+    """
+
+    kwargs.setdefault('default', json_serial)
+
+    if not isinstance(dict_, dict):
+        return json.dumps(dict_, **kwargs)
+
+    raw = [(k, v) for k, v in dict_.items() if isinstance(v, RawJSON)]
+    if not raw:
+        return json.dumps(dict_, **kwargs)
+
+    content = json.dumps(
+        {k: v for k, v in dict_.items() if not isinstance(v, RawJSON)},
+        **kwargs)
+    members = ','.join('{}:{}'.format(json.dumps(k), v) for k, v in raw)
+
+    if content == '{}':
+        return '{{{}}}'.format(members)
+    return '{},{}}}'.format(content[:-1], members)
+
+
+def parse_datetime(value):
+    """
+    helper function to parse a datetime into naive UTC, so that
+    values with and without time zone compare
+
+    :param value: `str` of datetime
+
+    :returns: `datetime.datetime`
+    """
+
+    value = dateparse(value)
+    if value.tzinfo is not None:
+        value = value.astimezone(tzutc()).replace(tzinfo=None)
+    return value
+
+
+def file_stamp(path):
+    """
+    helper function to identify a version of a file on disk
+
+    :param path: path to file
+
+    :returns: `tuple` of (mtime, size, inode) or `None` if missing
+    """
+
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+def encode_token(values):
+    """
+    helper function to encode paging state (e.g. the sort key
+    values of the last feature of a page) as an opaque,
+    URL-safe continuation token
+
+    :param values: JSON serializable paging state
+
+    :returns: `str` of continuation token
+    """
+
+    value = json.dumps(values, default=_token_serial, separators=(',', ':'))
+    return base64.urlsafe_b64encode(value.encode('utf-8')).decode('ascii')
+
+
+def _token_serial(obj):
+    """
+    helper function to convert paging state to JSON, keeping decimals
+    exact as strings (to be cast back to the type of their column)
+
+    :param obj: `object` to be evaluated
+
+    :returns: JSON non-default type to `str`
+    """
+
+    if isinstance(obj, Decimal):
+        return str(obj)
+
+    return json_serial(obj)
+
+
+def decode_token(token):
+    """
+    helper function to decode a continuation token created
+    by `encode_token`
+
+    :param token: `str` of continuation token
+
+    :returns: paging state
+    """
+
+    try:
+        value = base64.urlsafe_b64decode(token.encode('ascii'))
+        return json.loads(value.decode('utf-8'))
+    except (binascii.Error, UnicodeError, ValueError) as err:
+        msg = 'Invalid continuation token: {}'.format(err)
+        LOGGER.error(msg)
+        raise ValueError(msg)
+
+
+def sqlite_connect(path, read_only=True, immutable=False, pragmas={}):
+    """
+    helper function to open a SQLite database shareable across threads
+
+    :param path: path to database file
+    :param read_only: whether to open the database read-only
+    :param immutable: whether the file never changes, which skips
+                      locking and change detection altogether
+    :param pragmas: `dict` of PRAGMA settings (e.g. mmap_size, cache_size)
+
+    :returns: sqlite3.Connection
+    """
+
+    if read_only or immutable:
+        uri = 'file:{}?mode=ro'.format(os.path.abspath(path))
+        if immutable:
+            uri += '&immutable=1'
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+    else:
+        conn = sqlite3.connect(path, check_same_thread=False)
+
+    conn.row_factory = sqlite3.Row
+
+    for key, value in pragmas.items():
+        LOGGER.debug('Setting PRAGMA {}={}'.format(key, value))
+        conn.execute('PRAGMA {}={}'.format(key, value))
+
+    return conn
+
+
+def sqlite_field_type(declared_type):
+    """
+    helper function to map the declared type of a SQLite column to a
+    field type, following the type affinity rules of SQLite
+
+    :param declared_type: `str` of declared column type
+
+    :returns: `str` of field type (integer, number, boolean, date
+              or string)
+    """
+
+    declared_type = (declared_type or '').upper()
+
+    if 'INT' in declared_type:
+        return 'integer'
+    if declared_type in ('BOOLEAN', 'BOOL'):
+        return 'boolean'
+    if declared_type == 'DATE':
+        return 'date'
+    if any(t in declared_type for t in ('REAL', 'FLOA', 'DOUB', 'NUMERIC',
+                                        'DECIMAL')):
+        return 'number'
+    return 'string'
+
+
+def sqlite_filter(columns, time_field=None, properties=[], datetime_=None):
+    """
+    helper function to assemble the parameterised SQLite predicates of
+    property and temporal filters.  Datetimes are compared through
+    julianday(), so that ISO 8601 values with and without time zone
+    compare
+
+    :param columns: names of the table columns
+    :param time_field: name of the time column (optional)
+    :param properties: list of tuples (name, value)
+    :param datetime_: temporal (datestamp or extent)
+
+    :returns: tuple of (`list` of `str` of predicates, `list` of
+              parameters)
+    """
+
+    conditions = []
+    params = []
+
+    for name, value in properties:
+        if name not in columns:
+            raise ValueError('Unknown property {}'.format(name))
+        conditions.append('"{}" = ?'.format(name))
+        params.append(value)
+
+    if datetime_ is None:
+        return conditions, params
+
+    if time_field is None:
+        raise ValueError('time_field not enabled for collection')
+
+    if '/' in datetime_:
+        bounds = zip(datetime_.split('/'), ('>=', '<='))
+    else:
+        bounds = [(datetime_, '=')]
+
+    for value, operator in bounds:
+        if value in ('..', ''):
+            continue
+        try:
+            value = parse_datetime(value).isoformat()
+        except (ValueError, OverflowError) as err:
+            raise ValueError('Invalid datetime {}: {}'.format(datetime_, err))
+        conditions.append('julianday("{}") {} julianday(?)'.format(
+            time_field, operator))
+        params.append(value)
+
+    return conditions, params
+
+
+def sqlite_order_by(columns, sortby, tiebreaker='rowid'):
+    """
+    helper function to assemble a SQLite ORDER BY clause
+
+    :param columns: names of the table columns
+    :param sortby: list of dicts (property, order)
+    :param tiebreaker: expression ordering rows of equal sort keys
+
+    :returns: `str` of ORDER BY clause
+    """
+
+    keys = []
+    for s in sortby:
+        if s['property'] not in columns:
+            raise ValueError('Unknown property {}'.format(s['property']))
+        keys.append('"{}" {}'.format(s['property'],
+                                     'desc' if s['order'] == 'D' else 'asc'))
+    keys.append(tiebreaker)
+
+    return 'order by {}'.format(', '.join(keys))
+
+
+def sqlite_select(table, select_list, columns, conditions=[], params=[],
+                  sortby=[], startindex=0, limit=10, token=None):
+    """
+    helper function to assemble a SQLite statement selecting a page of
+    rows in order of sortby then rowid.  The sort key values of each
+    row are selected as _key0, _key1, ... and encoded as continuation
+    token of the next page, which then starts after that row instead of
+    at startindex.  NULLs sort first, as SQLite orders them
+
+    :param table: table name
+    :param select_list: `str` of selected columns
+    :param columns: names of the table columns
+    :param conditions: list of SQL predicates of the WHERE clause
+    :param params: list of parameters of the predicates
+    :param sortby: list of dicts (property, order)
+    :param startindex: starting row (without token)
+    :param limit: number of rows
+    :param token: continuation token from a previous page
+
+    :returns: `tuple` of `str` of statement, `list` of parameters
+              and `list` of sort key column names
+    """
+
+    keys = [(s['property'], s['order']) for s in sortby] + [('rowid', 'A')]
+    names = ['_key{}'.format(i) for i in range(len(keys))]
+    conditions = list(conditions)
+    params = list(params)
+
+    if token is not None:
+        values = decode_token(token)
+        if len(values) != len(keys):
+            raise ValueError('token does not match sort keys')
+
+        clauses = []
+        clause_params = []
+        equal = []
+        for (key, order), value in zip(keys, values):
+            column = 'rowid' if key == 'rowid' else '"{}"'.format(key)
+            if value is None:
+                same = ('{} is null'.format(column), [])
+                # only values sort after NULLs in ascending order
+                after = ('{} is not null'.format(column), []) \
+                    if order == 'A' else None
+            else:
+                same = ('{} = ?'.format(column), [value])
+                after = ('{} > ?'.format(column), [value]) \
+                    if order == 'A' else \
+                    ('({0} < ? or {0} is null)'.format(column), [value])
+            if after is not None:
+                parts = equal + [after]
+                clauses.append('({})'.format(
+                    ' and '.join(sql for sql, _ in parts)))
+                for _, part_params in parts:
+                    clause_params.extend(part_params)
+            equal.append(same)
+
+        conditions.append('({})'.format(' or '.join(clauses) or '0'))
+        params.extend(clause_params)
+        startindex = 0
+
+    sql_query = 'select {},{} from "{}"'.format(
+        ','.join('{} as "{}"'.format(
+            'rowid' if key == 'rowid' else '"{}"'.format(key), name)
+            for (key, _), name in zip(keys, names)),
+        select_list, table)
+    if conditions:
+        sql_query += ' where {}'.format(' and '.join(conditions))
+    sql_query += ' {} limit ? offset ?'.format(
+        sqlite_order_by(columns, sortby))
+    params.extend([limit, startindex])
+
+    return sql_query, params, names
+
+
+class _ThreadConnection(object):
+    """Connection of one thread, dropped along with the thread's locals"""
+
+    __slots__ = ('conn', 'pid', '__weakref__')
+
+
+class ThreadConnections(object):
+    """
+    Connections opened on demand, one per thread, and closed when
+    their thread exits.  Connections inherited from a parent process
+    are neither used nor closed
+    """
+
+    def __init__(self, connect):
+        """
+        Initialize object
+
+        :param connect: callable returning a new connection
+
+        :returns: pygeoapi.util.ThreadConnections
+        """
+
+        self._connect = connect
+        self._local = threading.local()
+        self._connections = {}  # connection -> pid of process opening it
+        self._lock = threading.Lock()
+
+    def get(self):
+        """
+        Get the connection of the current thread, connecting on first use
+
+        :returns: connection
+        """
+
+        holder = getattr(self._local, 'holder', None)
+        pid = os.getpid()
+        if holder is None or holder.pid != pid:
+            holder = _ThreadConnection()
+            holder.conn = self._connect()
+            holder.pid = pid
+            with self._lock:
+                self._connections[holder.conn] = pid
+            weakref.finalize(holder, self._discard, holder.conn, pid)
+            self._local.holder = holder
+
+        return holder.conn
+
+    def _discard(self, conn, pid):
+        with self._lock:
+            if self._connections.pop(conn, None) is None:
+                return  # already closed
+        if pid == os.getpid():
+            conn.close()
+
+    def close(self):
+        """
+        Close the connections of all threads
+
+        :returns: None
+        """
+
+        with self._lock:
+            connections = list(self._connections.items())
+            self._connections.clear()
+
+        # dropping the thread locals runs finalizers, which take the lock
+        self._local = threading.local()
+
+        for conn, pid in connections:
+            if pid == os.getpid():
+                conn.close()
+
+    def __len__(self):
+        return len(self._connections)
+
+
+#: Characters of geohash cells
+GEOHASH_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+#: Latitude bounds of the web mercator (geotile) grid
+GEOTILE_MAX_LAT = 85.0511287798066
+
+
+def grid_cell(grid, lon, lat, precision):
+    """
+    helper function to find the cell of a grid a point falls into,
+    keyed like Elasticsearch geotile_grid (zoom/x/y) and geohash_grid
+    aggregation buckets
+
+    :param grid: geotile or geohash
+    :param lon: longitude
+    :param lat: latitude
+    :param precision: zoom level (geotile) or length (geohash)
+
+    :returns: `str` of cell key
+    """
+
+    if grid == 'geotile':
+        n = 2 ** precision
+        lat = max(-GEOTILE_MAX_LAT, min(GEOTILE_MAX_LAT, lat))
+        x = int((lon + 180.0) / 360.0 * n)
+        y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) /
+                2.0 * n)
+        return '{}/{}/{}'.format(precision, min(max(x, 0), n - 1),
+                                 min(max(y, 0), n - 1))
+
+    bounds = [[-180.0, 180.0], [-90.0, 90.0]]
+    key = []
+    bit = 0
+    value = 0
+    even = True
+    while len(key) < precision:
+        interval = bounds[0] if even else bounds[1]
+        coordinate = lon if even else lat
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bit += 1
+        if bit == 5:
+            key.append(GEOHASH_BASE32[value])
+            bit = 0
+            value = 0
+
+    return ''.join(key)
+
+
+def grid_cell_bbox(grid, key):
+    """
+    helper function to get the bounds of a grid cell
+
+    :param grid: geotile or geohash
+    :param key: `str` of cell key, as returned by `grid_cell`
+
+    :returns: `list` of [minx, miny, maxx, maxy]
+    """
+
+    if grid == 'geotile':
+        zoom, x, y = [int(v) for v in key.split('/')]
+        n = 2 ** zoom
+
+        def lat(y_):
+            return math.degrees(math.atan(math.sinh(math.pi *
+                                                    (1 - 2 * y_ / n))))
+
+        return [x / n * 360.0 - 180.0, lat(y + 1),
+                (x + 1) / n * 360.0 - 180.0, lat(y)]
+
+    bounds = [[-180.0, 180.0], [-90.0, 90.0]]
+    even = True
+    for char in key:
+        value = GEOHASH_BASE32.index(char)
+        for shift in range(4, -1, -1):
+            interval = bounds[0] if even else bounds[1]
+            middle = (interval[0] + interval[1]) / 2
+            if value >> shift & 1:
+                interval[0] = middle
+            else:
+                interval[1] = middle
+            even = not even
+
+    return [bounds[0][0], bounds[1][0], bounds[0][1], bounds[1][1]]
+
+
+def coordinate_positions(coordinates):
+    """
+    helper function to yield the positions of (nested) GeoJSON
+    coordinates
+
+    :param coordinates: GeoJSON coordinates
+
+    :returns: generator of positions
+    """
+
+    if coordinates and isinstance(coordinates[0], (int, float)):
+        yield coordinates
+    else:
+        for item in coordinates:
+            for position in coordinate_positions(item):
+                yield position
+
+
+def geometry_envelope(geometry):
+    """
+    helper function to compute the envelope of a GeoJSON geometry
+
+    :param geometry: `dict` of GeoJSON geometry (or `None`)
+
+    :returns: `list` of [minx,miny,maxx,maxy] or `None` if empty
+    """
+
+    if not geometry:
+        return None
+
+    if geometry['type'] == 'GeometryCollection':
+        envelopes = [geometry_envelope(g) for g in geometry['geometries']]
+        envelopes = [e for e in envelopes if e is not None]
+        if not envelopes:
+            return None
+        return [min(e[0] for e in envelopes), min(e[1] for e in envelopes),
+                max(e[2] for e in envelopes), max(e[3] for e in envelopes)]
+
+    positions = list(coordinate_positions(geometry.get('coordinates') or []))
+    if not positions:
+        return None
+
+    xs = [p[0] for p in positions]
+    ys = [p[1] for p in positions]
+    return [min(xs), min(ys), max(xs), max(ys)]
+
+
+def geometry_center(geometry):
+    """
+    helper function to get a representative point of a GeoJSON
+    geometry: the point itself or the center of its envelope
+
+    :param geometry: `dict` of GeoJSON geometry
+
+    :returns: `tuple` of (lon, lat) or `None` for empty geometries
+    """
+
+    if not geometry:
+        return None
+    if geometry['type'] == 'Point':
+        coordinates = geometry.get('coordinates') or []
+        if len(coordinates) < 2:
+            return None
+        return tuple(coordinates[:2])
+
+    envelope = geometry_envelope(geometry)
+    if envelope is None:
+        return None
+
+    minx, miny, maxx, maxy = envelope
+    return ((minx + maxx) / 2, (miny + maxy) / 2)
@@ -35,6 +35,8 @@ import pytest
 from werkzeug.test import create_environ
 from werkzeug.wrappers import Request
 from pygeoapi.api import API, check_format
+from pygeoapi.plugin import PluginRegistry
+from pygeoapi.provider.base import ProviderInvalidQueryError
 from pygeoapi.util import yaml_load
 
 
@@ -281,23 +283,23 @@ def test_get_collection_items(config, api_):
 
     rsp_headers, code, response = api_.get_collection_items(
         req_headers, {'startindex': 1, 'limit': 1,
-                      'bbox': '-180,90,180,90'}, 'obs')
+                      'bbox': '-180,-90,180,90'}, 'obs')
     features = json.loads(response)
 
     assert len(features['features']) == 1
 
     links = features['links']
     assert len(links) == 5
-    assert '/collections/obs/items?f=json&limit=1&bbox=-180,90,180,90' in \
+    assert '/collections/obs/items?f=json&limit=1&bbox=-180,-90,180,90' in \
         links[0]['href']
     assert links[0]['rel'] == 'self'
-    assert '/collections/obs/items?f=html&limit=1&bbox=-180,90,180,90' in \
+    assert '/collections/obs/items?f=html&limit=1&bbox=-180,-90,180,90' in \
         links[1]['href']
     assert links[1]['rel'] == 'alternate'
-    assert '/collections/obs/items?startindex=0&limit=1&bbox=-180,90,180,90' \
+    assert '/collections/obs/items?startindex=0&limit=1&bbox=-180,-90,180,90' \
         in links[2]['href']
     assert links[2]['rel'] == 'prev'
-    assert '/collections/obs/items?startindex=2&limit=1&bbox=-180,90,180,90' \
+    assert '/collections/obs/items?startindex=2&limit=1&bbox=-180,-90,180,90' \
         in links[3]['href']
     assert links[3]['rel'] == 'next'
     assert '/collections/obs' in links[4]['href']
@@ -305,8 +307,10 @@ def test_get_collection_items(config, api_):
 
     rsp_headers, code, response = api_.get_collection_items(
         req_headers, {'sortby': 'stn_id', 'stn_id': '35'}, 'obs')
+    features = json.loads(response)
 
-    assert code == 400
+    assert code == 200
+    assert features['numberMatched'] == 2
 
     rsp_headers, code, response = api_.get_collection_items(
         req_headers, {'sortby': 'stn_id:FOO', 'stn_id': '35', 'value': '89.9'},
@@ -315,10 +319,13 @@ def test_get_collection_items(config, api_):
     assert code == 400
 
     rsp_headers, code, response = api_.get_collection_items(
-        req_headers, {'sortby': 'stn_id:A'}, 'obs')
+        req_headers, {'sortby': 'value:D'}, 'obs')
     features = json.loads(response)
-    # FIXME? this test errors out currently
-    assert code == 400
+
+    assert code == 200
+    values = [float(f['properties']['value'])
+              for f in features['features']]
+    assert values == sorted(values, reverse=True)
 
     rsp_headers, code, response = api_.get_collection_items(
         req_headers, {'f': 'csv'}, 'obs')
@@ -487,6 +494,166 @@ def test_execute_process(config, api_):
     assert response['code'] == 'NotFound'
 
 
+def test_get_collection_items_token(config, api_, monkeypatch):
+    req_headers = make_req_headers()
+    rsp_headers, code, response = api_.get_collection_items(
+        req_headers, {'token': 'foo'}, 'obs')
+
+    assert code == 400
+
+    # a token the provider rejects is bad input too
+    p = api_.providers.get('obs')
+
+    def query(token=None, **kwargs):
+        raise ProviderInvalidQueryError('token requires keyset paging')
+
+    monkeypatch.setattr(p, 'query', query)
+    rsp_headers, code, response = api_.get_collection_items(
+        req_headers, {'token': 'foo'}, 'obs')
+
+    assert code == 400
+    assert json.loads(response)['description'] == \
+        'token requires keyset paging'
+
+
+def test_get_collection_aggregate(config, api_):
+    req_headers = make_req_headers()
+    rsp_headers, code, response = api_.get_collection_aggregate(
+        req_headers, {}, 'foo')
+
+    assert code == 400
+
+    rsp_headers, code, response = api_.get_collection_aggregate(
+        req_headers, {'grid': 'h3'}, 'obs')
+
+    assert code == 400
+
+    rsp_headers, code, response = api_.get_collection_aggregate(
+        req_headers, {'precision': '30'}, 'obs')
+
+    assert code == 400
+
+    rsp_headers, code, response = api_.get_collection_aggregate(
+        req_headers, {'precision': '3'}, 'obs')
+    cells = json.loads(response)
+
+    assert code == 200
+    assert [(f['id'], f['properties']['count'])
+            for f in cells['features']] == [('3/2/2', 4), ('3/1/2', 1)]
+
+    rsp_headers, code, response = api_.get_collection_aggregate(
+        req_headers, {'grid': 'geohash', 'precision': '2',
+                      'bbox': '-80,40,-70,50', 'stn_id': '35'}, 'obs')
+    cells = json.loads(response)
+
+    assert code == 200
+    assert [(f['id'], f['properties']['count'])
+            for f in cells['features']] == [('f2', 2)]
+    assert cells['features'][0]['geometry']['type'] == 'Polygon'
+
+
+def test_get_collection_items_batch(config, api_):
+    req_headers = make_req_headers()
+    rsp_headers, code, response = api_.get_collection_items_batch(
+        req_headers, {}, '{"collection": "obs"}')
+
+    assert code == 400
+
+    queries = [
+        {'collection': 'obs', 'params': {'limit': 2}},
+        {'collection': 'obs', 'params': {'stn_id': 35,
+                                         'bbox': [-180, -90, 180, 90]}},
+        {'collection': 'obs', 'params': {'resulttype': 'hits'}},
+        {'collection': 'foo'},
+        {'collection': 'obs', 'params': {'limit': 0}}
+    ]
+    rsp_headers, code, response = api_.get_collection_items_batch(
+        req_headers, {}, json.dumps(queries))
+    responses = json.loads(response)['responses']
+
+    assert code == 200
+    assert len(responses) == 5
+    assert [r['status'] for r in responses] == [200, 200, 200, 400, 400]
+    assert responses[0]['collection'] == 'obs'
+    assert len(responses[0]['content']['features']) == 2
+    assert responses[0]['content']['links'][-1]['rel'] == 'collection'
+    assert [f['id'] for f in responses[1]['content']['features']] == \
+        ['371', '377']
+    assert responses[2]['content']['numberMatched'] == 5
+    assert responses[3]['content']['code'] == 'InvalidParameterValue'
+
+    invalid = [
+        {'collection': 'obs', 'params': {'limit': 2, 'stn_id': None}},
+        {'collection': 'obs', 'params': {'stn_id': {'eq': 35}}},
+        {'collection': 'obs', 'params': {'bbox': [[-180, -90], 180]}}
+    ]
+    rsp_headers, code, response = api_.get_collection_items_batch(
+        req_headers, {}, json.dumps(invalid))
+    responses = json.loads(response)['responses']
+
+    assert [r['status'] for r in responses] == [200, 400, 400]
+    assert len(responses[0]['content']['features']) == 2
+    assert 'stn_id' in responses[1]['content']['description']
+    assert 'bbox' in responses[2]['content']['description']
+
+    rsp_headers, code, response = api_.get_collection_items_batch(
+        req_headers, {}, json.dumps(queries * 5))
+
+    assert code == 400
+
+
+def test_get_collection_items_batch_error(config, api_, monkeypatch):
+    req_headers = make_req_headers()
+    p = api_.providers.get('obs')
+    query = p.query
+
+    def failing_query(**kwargs):
+        if kwargs['limit'] == 3:
+            raise ValueError('bad input')
+        return query(**kwargs)
+
+    monkeypatch.setattr(p, 'query', failing_query)
+
+    queries = [
+        {'collection': 'obs', 'params': {'limit': 3}},
+        {'collection': 'obs', 'params': {'limit': 2}}
+    ]
+    rsp_headers, code, response = api_.get_collection_items_batch(
+        req_headers, {}, json.dumps(queries))
+    responses = json.loads(response)['responses']
+
+    assert code == 200
+    assert [r['status'] for r in responses] == [500, 200]
+    assert responses[0]['content']['code'] == 'NoApplicableCode'
+    assert len(responses[1]['content']['features']) == 2
+
+
+def test_provider_registry(config, api_):
+    req_headers = make_req_headers()
+    api_.get_collection_items(req_headers, {}, 'obs')
+    p = api_.providers.get('obs')
+
+    api_.get_collection_items(req_headers, {}, 'obs')
+    api_.get_collection_item(req_headers, {}, 'obs', '371')
+    assert api_.providers.get('obs') is p
+
+    api_.close()
+    assert api_.providers.get('obs') is not p
+
+    p = api_.processors.get('hello-world')
+    api_.reload()
+    assert api_.processors.get('hello-world') is not p
+
+    # providers not declaring thread_safe are created per call
+    registry = PluginRegistry('provider', {'base': {
+        'name': 'pygeoapi.provider.base.BaseProvider',
+        'data': 'unused',
+        'id_field': 'id'
+    }})
+    p = registry.get('base')
+    assert registry.get('base') is not p
+
+
 def test_check_format():
     args = {
         'f': 'html'
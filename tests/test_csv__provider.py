@@ -27,8 +27,12 @@
 #
 # =================================================================
 
+import os
+
 import pytest
 
+from pygeoapi.provider import csv_
+from pygeoapi.provider.base import ProviderQueryError
 from pygeoapi.provider.csv_ import CSVProvider
 
 
@@ -98,3 +102,157 @@ def test_get(fixture, config):
     result = p.get('964')
     assert result['id'] == '964'
     assert result['properties']['value'] == '99.9'
+
+
+def test_get_id_index(config):
+    with open(path, 'w') as fh:
+        fh.write('id,stn_id,datetime,value,lat,long\n')
+        for i in range(25):
+            fh.write('{},1,"2001-10-30T14:24:55Z",{},45,-75\n'.format(
+                i, i * 1.5))
+
+    p = CSVProvider(config)
+    result = p.get('20')
+    assert result['id'] == '20'
+    assert result['properties']['value'] == '30.0'
+    assert p.get(24)['id'] == '24'
+
+    index = csv_._INDEXES[os.path.abspath(path)]
+    assert index['ids']['id']['20'] == 20
+
+
+def test_get_id_index_quoting(config):
+    with open(path, 'w') as fh:
+        fh.write('id,name,lat,long\n')
+        fh.write('1,a 12" ruler,1,1\n')
+        fh.write('\n')
+        fh.write('2,"two\nlines",2,2\n')
+        fh.write('3,three,3,3\n')
+
+    p = CSVProvider(config)
+    assert p.get('2')['properties']['name'] == 'two\nlines'
+    assert p.get('3')['properties']['name'] == 'three'
+    assert p.get('1')['properties']['name'] == 'a 12" ruler'
+
+    # ids indexed after the row index (e.g. read from disk) match it
+    index = csv_._INDEXES[os.path.abspath(path)]
+    index['ids'].clear()
+    assert p.get('3')['id'] == '3'
+    assert index['ids']['id'] == {'1': 0, '2': 1, '3': 2}
+
+
+def test_row_index(fixture, config):
+    if os.path.exists(path + '.idx'):
+        os.remove(path + '.idx')
+    p = CSVProvider(config)
+    p.query()
+    assert not os.path.exists(path + '.idx')
+
+    config['persist_index'] = True
+    with open(path, 'w') as fh:
+        fh.write('id,name,lat,long\n')
+        for i in range(100):
+            fh.write('{},"row\n""{}""",{},{}\n\n'.format(i, i, i % 90, i))
+
+    p = CSVProvider(config)
+    results = p.query(startindex=95, limit=10)
+    assert results['numberMatched'] == 100
+    assert [f['id'] for f in results['features']] == [
+        '95', '96', '97', '98', '99']
+    assert results['features'][0]['properties']['name'] == 'row\n"95"'
+
+    assert p.query(resulttype='hits')['numberMatched'] == 100
+    assert p.query(startindex=100)['features'] == []
+
+    # the index is persisted, and rebuilt when the file changes
+    assert os.path.exists(path + '.idx')
+    csv_._INDEXES.clear()
+    assert p.query(startindex=50, limit=1)['features'][0]['id'] == '50'
+
+    with open(path, 'a') as fh:
+        fh.write('100,last,0,0\n')
+    assert p.query(resulttype='hits')['numberMatched'] == 101
+    assert p.query(startindex=100)['features'][0]['id'] == '100'
+
+
+def test_row_index_quoting(config):
+    with open(path, 'w') as fh:
+        fh.write('id,name,lat,long\n')
+        fh.write('1,a 12" ruler,1,1\n')
+        fh.write('2,"two\nlines, ""quoted""",2,2\n')
+        fh.write('\n')
+        fh.write('3,three,3,3\n')
+
+    p = CSVProvider(config)
+    results = p.query()
+    assert results['numberMatched'] == 3
+    assert [f['id'] for f in results['features']] == ['1', '2', '3']
+    assert results['features'][0]['properties']['name'] == 'a 12" ruler'
+    assert results['features'][1]['properties']['name'] == \
+        'two\nlines, "quoted"'
+
+    results = p.query(startindex=2, limit=1)
+    assert [f['id'] for f in results['features']] == ['3']
+
+
+def test_query_filters_quoting(config):
+    with open(path, 'w') as fh:
+        fh.write('id,name,lat,long\n')
+        fh.write('1,"one\nline",1,1\n')
+        fh.write('\n')
+        fh.write('2,a 12" ruler,2,2\n')
+        fh.write('3,three,3,3\n')
+        fh.write('4,four,4,4\n')
+
+    p = CSVProvider(config)
+    results = p.query(properties=[('name', 'three')])
+    assert [f['id'] for f in results['features']] == ['3']
+    results = p.query(bbox=[1.5, 1.5, 4, 4])
+    assert [f['id'] for f in results['features']] == ['2', '3', '4']
+    results = p.query(sortby=[{'property': 'id', 'order': 'D'}],
+                      startindex=1, limit=2)
+    assert [f['id'] for f in results['features']] == ['3', '2']
+
+
+def test_query_filters(fixture, config, monkeypatch):
+    config['time_field'] = 'datetime'
+    p = CSVProvider(config)
+    assert p.fields['value']['type'] == 'number'
+    assert p.fields['stn_id']['type'] == 'integer'
+
+    results = p.query(bbox=[-80, 40, -70, 44])
+    assert [f['id'] for f in results['features']] == ['238', '297']
+    assert results['numberMatched'] == 2
+
+    results = p.query(properties=[('stn_id', '35')])
+    assert [f['id'] for f in results['features']] == ['371', '377']
+    assert results['features'][0]['properties']['value'] == '89.9'
+
+    # hits are counted without reading rows
+    with monkeypatch.context() as m:
+        m.setattr(p, '_read_rows', None)
+        results = p.query(properties=[('value', '93.5')],
+                          resulttype='hits')
+    assert results['numberMatched'] == 1
+    assert p.query(properties=[('value', 'x')])['numberMatched'] == 0
+
+    results = p.query(datetime='2001-01-01/2004-01-01')
+    assert [f['id'] for f in results['features']] == ['371', '377', '297']
+    results = p.query(datetime='2007-10-30T08:57:29Z', startindex=0,
+                      limit=1)
+    assert [f['id'] for f in results['features']] == ['238']
+    results = p.query(datetime='../2002-01-01', bbox=[-180, -90, 180, 90],
+                      properties=[('stn_id', '604')])
+    assert [f['id'] for f in results['features']] == ['964']
+
+    results = p.query(datetime='2001-01-01/..', startindex=1, limit=2)
+    assert results['numberMatched'] == 4
+    assert [f['id'] for f in results['features']] == ['377', '238']
+
+    with pytest.raises(ProviderQueryError):
+        p.query(datetime='yesterday')
+
+    results = p.query(sortby=[{'property': 'stn_id', 'order': 'D'},
+                              {'property': 'value', 'order': 'A'}])
+    assert [f['id'] for f in results['features']] == \
+        ['297', '238', '964', '371', '377']
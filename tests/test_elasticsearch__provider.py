@@ -27,8 +27,11 @@
 #
 # =================================================================
 
+from elasticsearch import Elasticsearch
 import pytest
 
+from pygeoapi.provider import elasticsearch_
+from pygeoapi.provider.base import BaseProvider
 from pygeoapi.provider.elasticsearch_ import ElasticsearchProvider
 
 
@@ -41,6 +44,47 @@ def config():
     }
 
 
+@pytest.fixture()
+def point_config():
+    es = Elasticsearch()
+    index_name = 'pygeoapi_test_points'
+    if es.indices.exists(index_name):
+        es.indices.delete(index_name)
+
+    settings = {
+        'mappings': {
+            'FeatureCollection': {
+                'properties': {
+                    'location': {
+                        'type': 'geo_point'
+                    }
+                }
+            }
+        }
+    }
+    es.indices.create(index=index_name, body=settings)
+
+    for i, (x, y) in enumerate([(1, 1), (2, 2), (-100, 40)]):
+        es.index(index=index_name, doc_type='FeatureCollection', id=i,
+                 body={
+                     'type': 'Feature',
+                     'geometry': {'type': 'Point', 'coordinates': [x, y]},
+                     'location': [x, y],
+                     'properties': {'id': i}
+                 })
+    es.indices.refresh(index_name)
+
+    yield {
+        'name': 'Elasticsearch',
+        'data': 'http://localhost:9200/{}/FeatureCollection'.format(
+            index_name),
+        'id_field': 'id',
+        'geo_field': 'location'
+    }
+
+    es.indices.delete(index_name)
+
+
 def test_query(config):
     p = ElasticsearchProvider(config)
     results = p.query()
@@ -91,3 +135,135 @@ def test_get(config):
     result = p.get('3413829')
     assert result['id'] == 3413829
     assert result['properties']['ls_name'] == 'Reykjavik'
+
+
+def test_shared_client(config):
+    p = ElasticsearchProvider(config)
+    p2 = ElasticsearchProvider(config)
+    assert p.es is p2.es
+    assert p.fields is p2.fields
+
+    config['client'] = {'maxsize': 2}
+    config['fields_ttl'] = 0
+    p3 = ElasticsearchProvider(config)
+    assert p3.es is not p.es
+    assert p3.fields is not p.fields
+    assert p3.fields == p.fields
+
+    # unhashable settings
+    config['client'] = {'maxsize': 2, 'headers': {'x-test': ['a', 'b']}}
+    p4 = ElasticsearchProvider(config)
+    assert p4.es is ElasticsearchProvider(config).es
+    assert p4.es is not p3.es
+
+
+def test_fields_ttl(config):
+    p = ElasticsearchProvider(config)
+    key = (p.es_host, p.index_name, p.type_name)
+    expiry, fields = elasticsearch_._FIELDS[key]
+
+    # fields go through the cache, rather than a copy taken at startup
+    elasticsearch_._FIELDS[key] = (expiry, {'cached': {'type': 'string'}})
+    assert list(p.fields) == ['cached']
+
+    elasticsearch_._FIELDS[key] = (0, {'cached': {'type': 'string'}})
+    assert p.fields == fields
+
+
+def test_query_search_after(config, monkeypatch):
+    p = ElasticsearchProvider(config)
+    sortby = [{'property': 'nameascii', 'order': 'A'}]
+    expected = [f['id'] for f in p.query(startindex=5, limit=5,
+                                         sortby=sortby)['features']]
+
+    config['paging'] = 'keyset'
+    p = ElasticsearchProvider(config)
+    results = p.query(limit=5, sortby=sortby)
+    results = p.query(limit=5, sortby=sortby, token=results['next_token'])
+    assert [f['id'] for f in results['features']] == expected
+
+    config['max_result_window'] = 3
+    config['point_in_time'] = True
+    p = ElasticsearchProvider(config)
+    results = p.query(startindex=5, limit=5, sortby=sortby)
+    assert [f['id'] for f in results['features']] == expected
+    assert 'next_token' in results
+
+    # the point in time is closed after the last page
+    requests = []
+    perform_request = p.es.transport.perform_request
+
+    def record(method, url, *args, **kwargs):
+        requests.append((method, url))
+        return perform_request(method, url, *args, **kwargs)
+
+    monkeypatch.setattr(p.es.transport, 'perform_request', record)
+    results = p.query(limit=5, sortby=sortby, token=results['next_token'])
+    assert ('DELETE', '/_pit') not in requests
+    results = p.query(startindex=240, limit=5, sortby=sortby)
+    assert len(results['features']) == 2
+    assert 'next_token' not in results
+    assert ('DELETE', '/_pit') in requests
+
+
+def test_query_hits(config):
+    p = ElasticsearchProvider(config)
+    results = p.query(resulttype='hits')
+    assert results['numberMatched'] == 242
+    assert results['features'] == []
+
+    results = p.query(resulttype='hits',
+                      properties=[('nameascii', 'Vatican City')])
+    assert results['numberMatched'] == 4
+
+    config['track_total_hits'] = 100
+    p = ElasticsearchProvider(config)
+    assert p.query()['numberMatched'] == 100
+
+    config['track_total_hits'] = False
+    p = ElasticsearchProvider(config)
+    results = p.query()
+    assert 'numberMatched' not in results
+    assert len(results['features']) == 10
+
+
+def test_query_batch(config):
+    p = ElasticsearchProvider(config)
+    results = ElasticsearchProvider.query_batch([
+        (p, {'limit': 1}),
+        (p, {'resulttype': 'hits',
+             'properties': [('nameascii', 'Vatican City')]}),
+        (p, {'startindex': 2, 'limit': 1})
+    ])
+    assert results[0]['features'][0]['id'] == 6691831
+    assert results[1]['numberMatched'] == 4
+    assert results[2]['features'][0]['id'] == 1559804
+
+
+def test_aggregate(config):
+    p = ElasticsearchProvider(config)
+    cells = p.aggregate(grid='geotile', precision=0)
+    assert cells == [{'key': '0/0/0', 'count': 242}]
+
+    cells = p.aggregate(grid='geohash', precision=1, bbox=[0, 0, 10, 10])
+    assert sum(c['count'] for c in cells) < 242
+
+    # geometry is a geo_shape field: binned in-process
+    assert p.get_geo_field_type() == 'geo_shape'
+    assert cells == BaseProvider.aggregate(
+        p, grid='geohash', precision=1, bbox=[0, 0, 10, 10])
+
+
+def test_aggregate_geo_point(point_config):
+    p = ElasticsearchProvider(point_config)
+    assert p.get_geo_field_type() == 'geo_point'
+
+    cells = p.aggregate(grid='geotile', precision=1)
+    assert cells == [{'key': '1/1/0', 'count': 2},
+                     {'key': '1/0/0', 'count': 1}]
+    assert cells == BaseProvider.aggregate(p, grid='geotile', precision=1)
+
+    cells = p.aggregate(grid='geohash', precision=1, bbox=[0, 0, 10, 10])
+    assert cells == [{'key': 's', 'count': 2}]
+    assert cells == BaseProvider.aggregate(
+        p, grid='geohash', precision=1, bbox=[0, 0, 10, 10])
@@ -29,8 +29,11 @@
 # =================================================================
 
 import json
+import os
 import pytest
 
+from pygeoapi.provider import geojson
+from pygeoapi.provider.base import ProviderQueryError
 from pygeoapi.provider.geojson import GeoJSONProvider
 
 
@@ -52,6 +55,8 @@ def fixture():
 
     with open(path, 'w') as fh:
         fh.write(json.dumps(data))
+    if os.path.exists(path + '.journal'):
+        os.remove(path + '.journal')
     return path
 
 
@@ -82,11 +87,15 @@ def test_get(fixture, config):
 
 def test_delete(fixture, config):
     p = GeoJSONProvider(config)
+    data = p._load()
     p.delete('123-456')
 
     results = p.query()
     assert len(results['features']) == 0
 
+    # the cached data is replaced, not changed under its readers
+    assert [f['id'] for f in data['features']] == ['123-456']
+
 
 def test_create(fixture, config):
     p = GeoJSONProvider(config)
@@ -146,6 +155,384 @@ def test_update_safe_id(fixture, config):
     assert 'Null' in results['properties']['name']
 
 
+def test_cache(fixture, config):
+    config['warm_up'] = True
+    p = GeoJSONProvider(config)
+    key = (os.path.abspath(path), 'id')
+    assert key in geojson._CACHE
+    data = p._load()
+    assert p._load() is data
+
+    # results must not leak into the cache
+    results = p.get('123-456')
+    results['links'] = []
+    results['properties']['x'] = 1
+    assert 'links' not in p.get('123-456')
+    assert 'x' not in p.get('123-456')['properties']
+
+    # changes on disk invalidate
+    data = json.loads(json.dumps(data))
+    data['features'][0]['properties']['name'] = 'Changed'
+    with open(path, 'w') as fh:
+        fh.write(json.dumps(data))
+    assert p.get('123-456')['properties']['name'] == 'Changed'
+
+    geojson._CACHE.clear()
+    config['cache_max_size'] = 0
+    p = GeoJSONProvider(config)
+    assert key not in geojson._CACHE
+    assert p.query()['numberMatched'] == 1
+
+
+def test_id_index(fixture, config):
+    p = GeoJSONProvider(config)
+    for name in ['a', 'b', 'c']:
+        p.create({
+            'type': 'Feature',
+            'geometry': None,
+            'properties': {'name': name}})
+
+    ids = [f['id'] for f in p.query()['features']]
+    assert len(ids) == 4
+
+    p.delete(ids[1])
+    assert p.get(ids[1]) is None
+    assert p.get(ids[0])['properties']['name'] == 'Dinagat Islands'
+    assert p.get(ids[2])['properties']['name'] == 'b'
+    assert p.get(ids[3])['properties']['name'] == 'c'
+
+    # the index survives a reload from disk
+    geojson._CACHE.clear()
+    assert p.get(ids[3])['properties']['name'] == 'c'
+
+
+def test_create_id_field(tmpdir):
+    data_path = str(tmpdir.join('id_field.geojson'))
+    with open(data_path, 'w') as fh:
+        fh.write(json.dumps({
+            'type': 'FeatureCollection',
+            'features': [{
+                'type': 'Feature',
+                'geometry': None,
+                'properties': {'fid': 'a', 'name': 'first'}}]}))
+
+    config = {
+        'name': 'GeoJSON',
+        'data': data_path,
+        'id_field': 'fid'
+    }
+    p = GeoJSONProvider(config)
+    p.create({
+        'type': 'Feature',
+        'geometry': None,
+        'properties': {'name': 'second'}})
+
+    results = p.query()
+    assert results['numberMatched'] == 2
+    identifier = results['features'][1]['id']
+    assert p.get(identifier)['properties']['name'] == 'second'
+    assert p.get(identifier)['properties']['fid'] == identifier
+
+
+def test_write_indexes(fixture, config, monkeypatch):
+    # rebuild the R-tree after a few changes
+    monkeypatch.setattr(geojson, '_CHANGED_MAX', 2)
+    config['journal'] = True
+    p = GeoJSONProvider(config)
+    bbox = [-1, -1, 1, 1]
+    assert p.query(bbox=bbox)['numberMatched'] == 0
+
+    for i in range(4):
+        p.create({
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [i / 10.0, 0]},
+            'properties': {'name': str(i)}})
+    ids = [f['id'] for f in p.query(bbox=bbox)['features']]
+    assert len(ids) == 4
+
+    p.update('123-456', {
+        'type': 'Feature',
+        'geometry': {'type': 'Point', 'coordinates': [0.5, 0.5]},
+        'properties': {'name': 'moved'}})
+    p.delete(ids[0])
+
+    def check():
+        results = p.query(bbox=bbox)
+        assert [f['id'] for f in results['features']] == \
+            ['123-456'] + ids[1:]
+        assert p.query()['numberMatched'] == 4
+        assert p.get(ids[0]) is None
+        assert p.get(ids[1])['properties']['name'] == '1'
+        results = p.query(sortby=[{'property': 'name', 'order': 'D'}])
+        assert [f['properties']['name'] for f in results['features']] == \
+            ['moved', '3', '2', '1']
+        results = p.query(properties=[('name', '2')])
+        assert [f['id'] for f in results['features']] == [ids[2]]
+
+    check()
+
+    # another process replays the journal
+    geojson._CACHE.clear()
+    check()
+
+    p.compact()
+    check()
+    assert len(p._load()['features']) == 4
+
+
+def test_journal(fixture, config):
+    config['journal'] = True
+    config['journal_max_ops'] = 3
+    p = GeoJSONProvider(config)
+
+    p.create({
+        'type': 'Feature',
+        'geometry': None,
+        'properties': {'name': 'a'}})
+    p.update('123-456', {
+        'type': 'Feature',
+        'geometry': None,
+        'properties': {'name': 'Null Island'}})
+
+    # the data file is untouched until compaction
+    with open(path) as fh:
+        assert len(json.load(fh)['features']) == 1
+
+    # another process replays the journal
+    geojson._CACHE.clear()
+    results = p.query()
+    assert results['numberMatched'] == 2
+    assert p.get('123-456')['properties']['name'] == 'Null Island'
+
+    p.delete(results['features'][1]['id'])
+    p.compact()
+    assert not os.path.exists(p.journal_path)
+    with open(path) as fh:
+        data = json.load(fh)
+    assert len(data['features']) == 1
+    assert data['features'][0]['properties']['name'] == 'Null Island'
+    assert p.query()['numberMatched'] == 1
+
+
+def test_write_during_index_build(fixture, config, monkeypatch):
+    config['journal'] = True
+    p = GeoJSONProvider(config)
+    sortby = [{'property': 'name', 'order': 'A'},
+              {'property': 'id', 'order': 'D'}]
+    calls = []
+    sort_key = geojson._sort_key
+
+    def write_once(value):
+        # a journal append while the second sort index is built
+        calls.append(value)
+        if len(calls) == 2:
+            p.create({
+                'type': 'Feature',
+                'geometry': None,
+                'properties': {'name': 'a'}})
+        return sort_key(value)
+
+    monkeypatch.setattr(geojson, '_sort_key', write_once)
+    results = p.query(sortby=sortby)
+    assert [f['id'] for f in results['features']] == ['123-456']
+
+    # the indexes are rebuilt for the new version
+    results = p.query(sortby=sortby)
+    assert [f['properties']['name'] for f in results['features']] == \
+        ['Dinagat Islands', 'a']
+
+
+def test_streaming(tmpdir):
+    features = [{
+        'type': 'Feature',
+        'geometry': {
+            'type': 'LineString',
+            'coordinates': [[i, j] for j in range(i * 10)]},
+        'properties': {
+            'id': 'f{}'.format(i),
+            'name': u'Zürich Ω {}'.format(i)}} for i in range(30)]
+    data_path = str(tmpdir.join('streaming.geojson'))
+    with open(data_path, 'w') as fh:
+        fh.write(json.dumps({'type': 'FeatureCollection',
+                             'name': 'lines',
+                             'features': features}, ensure_ascii=False))
+
+    config = {
+        'name': 'GeoJSON',
+        'data': data_path,
+        'id_field': 'id',
+        'streaming': True
+    }
+    p = GeoJSONProvider(config)
+    expected = GeoJSONProvider(dict(config, streaming=False))
+
+    results = p.query(startindex=20, limit=5)
+    assert results == expected.query(startindex=20, limit=5)
+    assert results['name'] == 'lines'
+    assert [f['id'] for f in results['features']] == [
+        'f20', 'f21', 'f22', 'f23', 'f24']
+
+    bbox = [5, 50, 12, 60]
+    assert p.query(bbox=bbox) == expected.query(bbox=bbox)
+    assert p.get('f29')['properties']['name'] == u'Zürich Ω 29'
+
+    with pytest.raises(ProviderQueryError):
+        p.delete('f29')
+
+    # features spanning several read windows
+    with open(data_path, 'rb') as fh:
+        buffer_ = fh.read()
+    decoder = geojson._WindowDecoder(buffer_, chunk_size=7)
+    pos = buffer_.index(b'{', 1)
+    feature, end = decoder.decode(pos)
+    assert feature == features[0]
+    assert buffer_[end:end + 2] == b', '
+    # and several features in one window
+    decoder = geojson._WindowDecoder(buffer_)
+    for expected_feature in features[:3]:
+        feature, end = decoder.decode(pos)
+        assert feature == expected_feature
+        pos = end + 2
+
+    # fields are read on first use
+    assert p._fields is None
+    assert p.fields['name']['type'] == 'string'
+
+    # an empty file cannot be memory-mapped
+    open(data_path, 'w').close()
+    assert p.query()['numberMatched'] == 0
+
+
+def test_streaming_index(tmpdir, monkeypatch):
+    data_path = str(tmpdir.join('index.geojson'))
+    with open(data_path, 'w') as fh:
+        fh.write(json.dumps({'type': 'FeatureCollection', 'features': [{
+            'type': 'Feature',
+            'geometry': None,
+            'properties': {'id': i, 'k': i % 10}} for i in range(200)]}))
+
+    # decoded features alive at once
+    alive = [0, 0]
+    getitem = geojson._StreamedFeatures.__getitem__
+
+    class Feature(dict):
+        def __init__(self, *args):
+            dict.__init__(self, *args)
+            alive[0] += 1
+            alive[1] = max(alive)
+
+        def __del__(self):
+            alive[0] -= 1
+
+    monkeypatch.setattr(geojson._StreamedFeatures, '__getitem__',
+                        lambda self, index: Feature(getitem(self, index)))
+
+    p = GeoJSONProvider({
+        'name': 'GeoJSON',
+        'data': data_path,
+        'id_field': 'id',
+        'streaming': True
+    })
+    results = p.query(properties=[('k', 3)], limit=5,
+                      sortby=[{'property': 'id', 'order': 'D'}])
+    assert [f['id'] for f in results['features']] == [193, 183, 173, 163, 153]
+    assert results['numberMatched'] == 20
+    assert alive[1] < 10
+
+
+def test_query_properties_sortby():
+    config = {
+        'name': 'GeoJSON',
+        'data': 'tests/data/ne_110m_populated_places_simple.geojson',
+        'id_field': 'name'
+    }
+    p = GeoJSONProvider(config)
+    assert p.fields['pop_max']['type'] == 'integer'
+    assert p.fields['name']['type'] == 'string'
+
+    features = p._load()['features']
+    expected = [f['id'] for f in features
+                if f['properties']['featurecla'] == 'Admin-0 capital']
+    results = p.query(properties=[('featurecla', 'Admin-0 capital')],
+                      limit=1000)
+    assert [f['id'] for f in results['features']] == expected
+    assert results['numberMatched'] == len(expected)
+
+    results = p.query(properties=[('featurecla', 'Admin-0 capital'),
+                                  ('megacity', '1')], resulttype='hits')
+    assert 0 < results['numberMatched'] < len(expected)
+
+    results = p.query(sortby=[{'property': 'pop_max', 'order': 'D'}])
+    pops = [f['properties']['pop_max'] for f in results['features']]
+    assert pops == sorted([f['properties']['pop_max'] for f in features],
+                          reverse=True)[:10]
+
+    results = p.query(sortby=[{'property': 'adm0name', 'order': 'A'},
+                              {'property': 'pop_max', 'order': 'D'}],
+                      properties=[('megacity', '1')], limit=1000)
+    keys = [(f['properties']['adm0name'], -f['properties']['pop_max'])
+            for f in results['features']]
+    assert keys == sorted(keys)
+
+
+def test_query_datetime(tmpdir):
+    data_path = str(tmpdir.join('datetime.geojson'))
+    times = ['2019-01-01T00:00:00Z', '2019-06-01', None,
+             '2019-03-01T12:00:00+01:00', '2020-01-01T00:00:00Z']
+    with open(data_path, 'w') as fh:
+        fh.write(json.dumps({
+            'type': 'FeatureCollection',
+            'features': [{
+                'type': 'Feature',
+                'geometry': None,
+                'properties': {'id': i, 'time': t}
+            } for i, t in enumerate(times)]}))
+
+    config = {
+        'name': 'GeoJSON',
+        'data': data_path,
+        'id_field': 'id',
+    }
+    p = GeoJSONProvider(config)
+    with pytest.raises(ProviderQueryError):
+        p.query(datetime='2019-01-01/..')
+
+    config['time_field'] = 'time'
+    p = GeoJSONProvider(config)
+
+    def ids(datetime_):
+        return [f['id'] for f in p.query(datetime=datetime_)['features']]
+
+    assert ids('2019-01-01T00:00:00Z') == [0]
+    assert ids('2019-02-01/2019-12-31') == [1, 3]
+    assert ids('../2019-03-01T11:00:00Z') == [0, 3]
+    assert ids('2019-06-01/..') == [1, 4]
+    with pytest.raises(ProviderQueryError):
+        ids('yesterday/..')
+
+
+@pytest.mark.parametrize('bbox', [[-10, 35, 30, 60], [0, 0, 1, 1],
+                                  [-180, -90, 180, 90]])
+def test_query_bbox(bbox):
+    config = {
+        'name': 'GeoJSON',
+        'data': 'tests/data/ne_110m_populated_places_simple.geojson',
+        'id_field': 'name'
+    }
+    p = GeoJSONProvider(config)
+
+    expected = [f['id'] for f in p._load()['features']
+                if bbox[0] <= f['geometry']['coordinates'][0] <= bbox[2] and
+                bbox[1] <= f['geometry']['coordinates'][1] <= bbox[3]]
+
+    results = p.query(bbox=bbox, limit=1000)
+    assert [f['id'] for f in results['features']] == expected
+    assert results['numberMatched'] == len(expected)
+
+    results = p.query(bbox=bbox, resulttype='hits')
+    assert results['numberMatched'] == len(expected)
+
+
 """
     def __init__(self, definition):
         BaseProvider.__init__(self, definition)
@@ -34,8 +34,19 @@
 # (Arguments as py.test and set external variables to the correct config path)
 
 
+from functools import wraps
+import shutil
+import sqlite3
+import struct
+import threading
+
 import pytest
-from pygeoapi.provider.geopackage import GeoPackageProvider
+from pygeoapi.provider.base import (ProviderInvalidQueryError,
+                                    ProviderQueryError)
+from pygeoapi.provider.geopackage import (decode_geometry,
+                                          geometry_envelope,
+                                          GeoPackageProvider,
+                                          register_functions)
 
 
 @pytest.fixture()
@@ -48,6 +59,16 @@ def config():
     }
 
 
+@pytest.fixture()
+def config_addresses():
+    return {
+        'name': 'GeoPackage',
+        'data': './tests/data/dutch_addresses_4326.gpkg',
+        'id_field': 'fid',
+        'table': 'OGRGeoJSON'
+    }
+
+
 def test_query(config):
     """Testing query for a valid JSON object with geometry"""
 
@@ -71,3 +92,250 @@ def test_get(config):
     assert 'properties' in result
     assert 'id' in result
     assert 'tourist_info' in result['properties']['fclass']
+
+
+def test_query_bbox(config):
+    """Testing query with a bounding box"""
+    p = GeoPackageProvider(config)
+    bbox = [-9.2, 38.6, -9.0, 38.8]
+    hits = p.query(resulttype='hits', bbox=bbox)['numberMatched']
+    assert 0 < hits < p.query(resulttype='hits')['numberMatched']
+
+    results = p.query(limit=1000, bbox=bbox)
+    for feature in results['features']:
+        x, y = feature['geometry']['coordinates']
+        assert -9.2 <= x <= -9.0 and 38.6 <= y <= 38.8
+
+
+def test_decode_geometry():
+    """Testing decoding of GeoPackage geometry blobs"""
+
+    # little endian point, no envelope
+    blob = bytes.fromhex('47500001e6100000010100000017f89ac600dc1640'
+                         'dacdad61840f4a40')
+    geometry = decode_geometry(blob)
+    assert geometry['type'] == 'Point'
+    assert geometry['coordinates'] == pytest.approx([5.7148467, 52.1212274])
+    assert geometry_envelope(blob) == geometry['coordinates'] * 2
+
+    # big endian polygon Z with envelope
+    ring = [(0, 0, 1), (4, 0, 1), (4, 2, 1), (0, 0, 1)]
+    wkb = struct.pack('>BII', 0, 1003, 1) + struct.pack('>I', len(ring))
+    for position in ring:
+        wkb += struct.pack('>3d', *position)
+    header = b'GP' + struct.pack('>BBi4d', 0, 0x02, 4326, 0, 4, 0, 2)
+    geometry = decode_geometry(header + wkb)
+    assert geometry == {'type': 'Polygon',
+                        'coordinates': [[list(p) for p in ring]]}
+    assert geometry_envelope(header + wkb) == [0, 0, 4, 2]
+
+    # empty flag
+    assert decode_geometry(b'GP' + struct.pack('<BBi', 0, 0x11, 4326)) is None
+
+
+def test_query_addresses(config_addresses):
+    """Testing query and get without SpatiaLite"""
+
+    p = GeoPackageProvider(config_addresses)
+    assert p.query(resulttype='hits')['numberMatched'] == 2481
+
+    result = p.get(5)
+    assert result['id'] == 5
+    assert result['geometry']['type'] == 'Point'
+    assert result['properties']['straatnaam'] == 'Arnhemseweg'
+
+
+def test_query_bbox_envelope(config_addresses):
+    """Testing bbox with and without the R*Tree spatial index"""
+
+    bbox = [5.7, 52.0, 5.75, 52.1]
+    p = GeoPackageProvider(config_addresses)
+    assert p.spatial_index is not None
+    hits = p.query(resulttype='hits', bbox=bbox)['numberMatched']
+    assert 0 < hits < 2481
+
+    p.spatial_index = None
+    assert p.query(resulttype='hits', bbox=bbox)['numberMatched'] == hits
+
+
+def test_build_spatial_index(config_addresses, tmpdir):
+    """Testing the built spatial index is registered and maintained"""
+
+    path = str(tmpdir.join('addresses.gpkg'))
+    shutil.copy(config_addresses['data'], path)
+    conn = sqlite3.connect(path)
+    for name, in conn.execute("SELECT name FROM sqlite_master WHERE \
+            type = 'trigger' AND name LIKE 'rtree_%'").fetchall():
+        conn.execute('DROP TRIGGER "{}"'.format(name))
+    conn.execute('DROP TABLE rtree_OGRGeoJSON_geom')
+    conn.execute("DELETE FROM gpkg_extensions WHERE \
+        extension_name = 'gpkg_rtree_index'")
+    conn.commit()
+
+    config_addresses.update(data=path, build_spatial_index=True)
+    p = GeoPackageProvider(config_addresses)
+    assert p.spatial_index == 'rtree_OGRGeoJSON_geom'
+    assert conn.execute("SELECT table_name, column_name FROM \
+        gpkg_extensions WHERE extension_name = 'gpkg_rtree_index'") \
+        .fetchall() == [('OGRGeoJSON', 'geom')]
+    assert conn.execute("SELECT count(*) FROM sqlite_master WHERE \
+        type = 'trigger' AND name LIKE 'rtree_%'").fetchone()[0] == 6
+
+    bbox = [5.7, 52.0, 5.75, 52.1]
+    hits = p.query(resulttype='hits', bbox=bbox)['numberMatched']
+    assert 0 < hits < 2481
+
+    # edits are reflected in the index through its triggers
+    register_functions(conn)
+    fid = p.query(limit=1, bbox=bbox)['features'][0]['id']
+    conn.execute('UPDATE OGRGeoJSON SET geom = NULL WHERE fid = ?', (fid, ))
+    conn.commit()
+    conn.close()
+
+    p = GeoPackageProvider(config_addresses)
+    assert p.query(resulttype='hits', bbox=bbox)['numberMatched'] == \
+        hits - 1
+    p.spatial_index = None
+    assert p.query(resulttype='hits', bbox=bbox)['numberMatched'] == \
+        hits - 1
+
+
+def test_query_paging(config_addresses):
+    """Testing offset and keyset paging"""
+
+    p = GeoPackageProvider(config_addresses)
+    results = p.query(limit=5)
+    assert [f['id'] for f in results['features']] == [1, 2, 3, 4, 5]
+    assert 'next_token' not in results
+
+    results = p.query(startindex=2478, limit=5)
+    assert [f['id'] for f in results['features']] == [2479, 2480, 2481]
+
+    bbox = [5.7, 52.0, 5.75, 52.1]
+    expected = [f['id'] for f in p.query(limit=10, bbox=bbox)['features']]
+    assert len(expected) == 10
+
+    config_addresses['paging'] = 'keyset'
+    p = GeoPackageProvider(config_addresses)
+    results = p.query(limit=5, bbox=bbox)
+    ids = [f['id'] for f in results['features']]
+    results = p.query(limit=5, bbox=bbox, token=results['next_token'])
+    ids += [f['id'] for f in results['features']]
+    assert ids == expected
+
+    results = p.query(startindex=2475, limit=5)
+    results = p.query(limit=5, token=results['next_token'])
+    assert len(results['features']) == 1
+    assert 'next_token' not in results
+
+
+def test_aggregate_keyset(config_addresses, monkeypatch):
+    """Testing the aggregate fallback pages by token with keyset paging"""
+
+    p = GeoPackageProvider(config_addresses)
+    expected = p.aggregate(grid='geohash', precision=5)
+    assert sum(c['count'] for c in expected) == 2481
+
+    config_addresses['paging'] = 'keyset'
+    p = GeoPackageProvider(config_addresses)
+    calls = []
+    query = p.query
+
+    @wraps(query)
+    def record(**kwargs):
+        calls.append(kwargs)
+        return query(**kwargs)
+
+    monkeypatch.setattr(p, 'query', record)
+    assert p.aggregate(grid='geohash', precision=5) == expected
+    assert len(calls) == 3
+    assert not any('sortby' in kwargs for kwargs in calls)
+    assert all('token' in kwargs for kwargs in calls[1:])
+
+
+def test_query_filters(config_addresses, tmpdir):
+    """Testing property, datetime and sortby filters"""
+
+    p = GeoPackageProvider(config_addresses)
+    assert p.fields['fid'] == {'type': 'integer'}
+    assert p.fields['straatnaam'] == {'type': 'string'}
+    assert 'geom' not in p.fields
+
+    properties = [('straatnaam', 'Arnhemseweg')]
+    hits = p.query(resulttype='hits', properties=properties)
+    assert hits['numberMatched'] == 113
+    results = p.query(limit=200, properties=properties)
+    assert len(results['features']) == 113
+    assert all(f['properties']['straatnaam'] == 'Arnhemseweg'
+               for f in results['features'])
+
+    results = p.query(limit=2, sortby=[{'property': 'fid', 'order': 'D'}])
+    assert [f['id'] for f in results['features']] == [2481, 2480]
+
+    with pytest.raises(ProviderQueryError):
+        p.query(properties=[('missing', 'x')])
+
+    path = str(tmpdir.join('addresses.gpkg'))
+    shutil.copy(config_addresses['data'], path)
+    conn = sqlite3.connect(path)
+    register_functions(conn)  # used by the spatial index triggers
+    conn.execute('ALTER TABLE OGRGeoJSON ADD COLUMN datum TEXT')
+    conn.execute("UPDATE OGRGeoJSON SET datum = '2020-01-01T12:00:00Z' \
+        WHERE fid <= 10")
+    conn.execute("UPDATE OGRGeoJSON SET datum = '2021-06-01' \
+        WHERE fid > 10 AND fid <= 20")
+    conn.commit()
+    conn.close()
+
+    config_addresses.update(data=path, time_field='datum')
+    p = GeoPackageProvider(config_addresses)
+    for datetime_, count in [('2020-01-01T00:00:00Z/2020-12-31', 10),
+                             ('2020-01-01T13:00:00+01:00', 10),
+                             ('../2021-06-01', 20),
+                             ('2021-01-01/..', 10)]:
+        hits = p.query(resulttype='hits', datetime=datetime_)
+        assert hits['numberMatched'] == count
+    with pytest.raises(ProviderQueryError):
+        p.query(datetime='yesterday')
+
+    # tokens are not ignored by offset paging
+    with pytest.raises(ProviderInvalidQueryError):
+        p.query(token='WzFd')
+
+    # keyset tokens carry the sort keys, NULLs included
+    sortby = [{'property': 'datum', 'order': 'D'},
+              {'property': 'huisnummer', 'order': 'A'}]
+    expected = [f['id'] for f in p.query(limit=35, sortby=sortby)['features']]
+    config_addresses['paging'] = 'keyset'
+    p = GeoPackageProvider(config_addresses)
+    ids = []
+    token = None
+    for _ in range(5):
+        results = p.query(limit=7, sortby=sortby, token=token)
+        ids += [f['id'] for f in results['features']]
+        token = results['next_token']
+    assert ids == expected
+    with pytest.raises(ProviderInvalidQueryError):
+        p.query(token=token)
+
+    config_addresses['paging'] = 'keyest'
+    with pytest.raises(ProviderQueryError):
+        GeoPackageProvider(config_addresses)
+
+
+def test_connections(config_addresses):
+    """Testing connections are kept per thread and closed with it"""
+
+    p = GeoPackageProvider(config_addresses)
+    p.get(1)
+    assert len(p._connections) == 1
+
+    for i in range(50):
+        thread = threading.Thread(target=p.get, args=(1, ))
+        thread.start()
+        thread.join()
+    assert len(p._connections) == 1
+
+    p.close()
+    assert len(p._connections) == 0
+    assert p.get(1)['id'] == 1
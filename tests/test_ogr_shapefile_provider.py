@@ -30,10 +30,12 @@
 # Needs to be run like: python3 -m pytest
 
 import logging
+import threading
+import time
 
 import pytest
 
-from pygeoapi.provider.ogr import OGRProvider
+from pygeoapi.provider.ogr import CommonSourceHelper, OGRProvider
 
 LOGGER = logging.getLogger(__name__)
 
@@ -320,3 +322,66 @@ def test_query_bbox_with_startindex_4326(config_shapefile_4326):
     assert geometry is not None
     assert properties['straatnaam'] == 'Egypte'
     assert properties['huisnummer'] == '6'
+
+
+def test_handle_cache_4326(config_shapefile_4326):
+    """Testing datasets are kept open and filters reset between calls"""
+    p = OGRProvider(config_shapefile_4326)
+    hits = p.query(resulttype='hits')['numberMatched']
+    conn = p.conn
+    assert conn is not None
+
+    bbox = [5.763409, 52.060197, 5.769256, 52.061976]
+    assert p.query(bbox=bbox, resulttype='hits')['numberMatched'] < hits
+    assert p.get('inspireadressen.1747652') is not None
+    assert p.query(resulttype='hits')['numberMatched'] == hits
+    assert p.conn is conn
+
+    queried, done = threading.Event(), threading.Event()
+
+    def query():
+        p.query()
+        queried.set()
+        done.wait()
+
+    thread = threading.Thread(target=query)
+    thread.start()
+    queried.wait()
+    assert len(p._handles) == 2
+
+    p.handle_idle_timeout = 0
+    time.sleep(0.01)
+    p.query(resulttype='hits')
+    assert p.conn is not conn
+    assert [h['conn'] is None for h in p._handles] == [False, True]
+
+    # handles of exited threads are released
+    done.set()
+    thread.join()
+    assert len(p._handles) == 1
+
+    p.close()
+    assert p._handles == []
+
+    config_shapefile_4326['handle_cache'] = False
+    p = OGRProvider(config_shapefile_4326)
+    p.query(resulttype='hits')
+    assert p.conn is None
+
+
+def test_handle_cache_paging_on_open(config_shapefile_4326, monkeypatch):
+    """Testing datasets set up for paging on open are reused per page"""
+    monkeypatch.setattr(CommonSourceHelper, 'paging_on_open', True)
+    p = OGRProvider(config_shapefile_4326)
+
+    p.query(startindex=0, limit=10)
+    conn = p.conn
+    p.query(startindex=0, limit=10)
+    assert p.conn is conn
+
+    p.query(startindex=10, limit=10)
+    assert p.conn is not conn
+    assert p._handles[0]['paging'] == (10, 10)
+
+    assert p.get('inspireadressen.1747652') is not None
+    assert p._handles[0]['paging'] is None
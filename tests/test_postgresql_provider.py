@@ -31,8 +31,16 @@
 
 # Needs to be run like: python3 -m pytest
 
+import json
+
+import psycopg2
 import pytest
-from pygeoapi.provider.postgresql import PostgreSQLProvider
+from pygeoapi.provider.base import (ProviderConnectionError,
+                                    ProviderInvalidQueryError,
+                                    ProviderQueryError)
+from pygeoapi.provider.postgresql import (PostgreSQLProvider,
+                                          _connection_parameters)
+from pygeoapi.util import RawJSON
 
 
 @pytest.fixture()
@@ -106,3 +114,200 @@ def test_get(config):
     assert 'properties' in result
     assert 'id' in result
     assert 'Kanyosha' in result['properties']['name']
+
+
+def test_query_pooled(config):
+    """Testing queries reusing pooled connections"""
+    config['data']['pool'] = {'min_size': 1, 'max_size': 2}
+    p = PostgreSQLProvider(config)
+    for i in range(3):
+        feature_collection = p.query(limit=1)
+        assert len(feature_collection['features']) == 1
+
+    result = p.get(29701937)
+    assert 'Kanyosha' in result['properties']['name']
+
+
+def test_connection_parameters_pool(config):
+    """Testing pool settings parsing"""
+    for pool in (None, False, {}):
+        config['data']['pool'] = pool
+        params, pool_def = _connection_parameters(config['data'])
+        assert 'pool' not in params
+        assert pool_def is None
+
+    config['data']['pool'] = True
+    assert _connection_parameters(config['data'])[1] == {}
+
+    config['data']['pool'] = {'max_size': 2}
+    assert _connection_parameters(config['data'])[1] == {'max_size': 2}
+
+    config['data']['pool'] = 'yes'
+    with pytest.raises(ProviderConnectionError):
+        _connection_parameters(config['data'])
+
+    config['data']['pool'] = False
+    p = PostgreSQLProvider(config)
+    assert len(p.query(limit=1)['features']) == 1
+
+
+def test_query_keyset(config):
+    """Testing keyset paging with continuation tokens"""
+    config['paging'] = 'keyset'
+    p = PostgreSQLProvider(config)
+    feature_collection = p.query(limit=5)
+    ids = [f['id'] for f in feature_collection['features']]
+    assert 'next_token' in feature_collection
+
+    feature_collection = p.query(limit=5,
+                                 token=feature_collection['next_token'])
+    ids += [f['id'] for f in feature_collection['features']]
+    assert ids == sorted(ids)
+    assert len(set(ids)) == 10
+
+
+def test_invalid_paging(config):
+    """Testing unknown paging modes are rejected"""
+    config['paging'] = 'keyest'
+    with pytest.raises(ProviderQueryError):
+        PostgreSQLProvider(config)
+
+    # tokens are not ignored by offset paging
+    config['paging'] = 'offset'
+    p = PostgreSQLProvider(config)
+    with pytest.raises(ProviderInvalidQueryError):
+        p.query(token='WzFd')
+
+
+def test_query_server_side_geojson(config):
+    """Testing features assembled as GeoJSON by PostGIS"""
+    p = PostgreSQLProvider(config)
+    expected = p.query(limit=5)['features']
+
+    config['server_side_geojson'] = True
+    p = PostgreSQLProvider(config)
+    feature_collection = p.query(limit=5)
+    assert isinstance(feature_collection['features'], RawJSON)
+    assert feature_collection['numberReturned'] == 5
+
+    features = json.loads(feature_collection['features'])
+    assert [f['id'] for f in features] == [f['id'] for f in expected]
+    assert features[0]['geometry'] == expected[0]['geometry']
+    assert features[0]['properties'].keys() == \
+        expected[0]['properties'].keys()
+
+
+def test_query_sortby(config):
+    """Testing query sorted by a property"""
+    p = PostgreSQLProvider(config)
+    results = p.query(sortby=[{'property': 'osm_id', 'order': 'D'}])
+    ids = [f['id'] for f in results['features']]
+    assert ids == sorted(ids, reverse=True)
+
+    results = p.query(sortby=[{'property': 'waterway', 'order': 'A'},
+                              {'property': 'osm_id', 'order': 'D'}])
+    waterways = [f['properties']['waterway']
+                 for f in results['features']]
+    assert waterways == sorted(waterways)
+
+    config['paging'] = 'keyset'
+    p = PostgreSQLProvider(config)
+    sortby = [{'property': 'waterway', 'order': 'D'}]
+    results = p.query(limit=5, sortby=sortby)
+    ids = [f['id'] for f in results['features']]
+    results = p.query(limit=5, sortby=sortby, token=results['next_token'])
+    ids += [f['id'] for f in results['features']]
+    expected = p.query(limit=10, sortby=sortby)['features']
+    assert ids == [f['id'] for f in expected]
+
+
+def test_query_keyset_nulls(config):
+    """Testing keyset paging across NULL sort keys"""
+    config['paging'] = 'keyset'
+    p = PostgreSQLProvider(config)
+    total = p.query(resulttype='hits')['numberMatched']
+
+    for order in ('A', 'D'):
+        sortby = [{'property': 'name', 'order': order}]
+        ids = []
+        token = None
+        while True:
+            results = p.query(limit=500, sortby=sortby, token=token)
+            ids += [f['id'] for f in results['features']]
+            token = results.get('next_token')
+            if token is None:
+                break
+        assert len(ids) == total
+        assert len(set(ids)) == total
+
+
+@pytest.fixture()
+def dated_config(config):
+    """Waterways view with a timestamp column derived from osm_id"""
+    params, _ = _connection_parameters(config['data'])
+    conn = psycopg2.connect(**params)
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "CREATE OR REPLACE VIEW public.hotosm_bdi_waterways_dated AS "
+            "SELECT *, TIMESTAMP '2018-01-01' + "
+            "(osm_id % 365) * INTERVAL '1 day' AS updated "
+            "FROM hotosm_bdi_waterways")
+
+    config['table'] = 'hotosm_bdi_waterways_dated'
+    config['time_field'] = 'updated'
+    yield config
+
+    with conn.cursor() as cursor:
+        cursor.execute('DROP VIEW public.hotosm_bdi_waterways_dated')
+    conn.close()
+
+
+def test_query_datetime(config):
+    """Testing query with a time_field predicate"""
+    p = PostgreSQLProvider(config)
+    with pytest.raises(ProviderQueryError):
+        p.query(datetime='2018-01-01/..')
+
+
+def test_query_datetime_filter(dated_config):
+    """Testing query filtered on a time_field"""
+    p = PostgreSQLProvider(dated_config)
+    total = p.query(resulttype='hits')['numberMatched']
+
+    datetime_ = '2018-03-01T00:00:00Z/2018-03-31T23:59:59Z'
+    results = p.query(limit=1000, datetime=datetime_)
+    assert 0 < len(results['features']) < total
+    for feature in results['features']:
+        assert 59 <= feature['id'] % 365 <= 89
+
+    after = p.query(resulttype='hits', datetime='2018-03-01/..')
+    before = p.query(resulttype='hits', datetime='../2018-02-28T23:59:59Z')
+    assert after['numberMatched'] + before['numberMatched'] == total
+
+    results = p.query(datetime='2018-01-01T00:00:00Z')
+    assert all(f['id'] % 365 == 0 for f in results['features'])
+
+
+def test_query_hits(config):
+    """Testing hits with the different count strategies"""
+    p = PostgreSQLProvider(config)
+    exact = p.query(resulttype='hits')['numberMatched']
+    assert exact > 0
+    assert 'numberMatched' not in p.query()
+
+    filtered = p.query(resulttype='hits',
+                       properties=[('waterway', 'stream')])['numberMatched']
+    assert 0 < filtered < exact
+
+    config['count_strategy'] = 'capped'
+    config['count_cap'] = 10
+    p = PostgreSQLProvider(config)
+    assert p.query(resulttype='hits')['numberMatched'] == 10
+    assert p.query()['numberMatched'] == 10
+
+    config['count_strategy'] = 'estimate'
+    p = PostgreSQLProvider(config)
+    assert p.query(resulttype='hits')['numberMatched'] > 0
+    assert p.query(resulttype='hits',
+                   properties=[('waterway', 'stream')])['numberMatched'] > 0
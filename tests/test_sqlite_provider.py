@@ -33,7 +33,11 @@
 # In eclipse we need to set PYGEOAPI_CONFIG, Run>Debug Configurations>
 # (Arguments as py.test and set external variables to the correct config path)
 
+import threading
+
 import pytest
+from pygeoapi.provider.base import (ProviderInvalidQueryError,
+                                    ProviderQueryError)
 from pygeoapi.provider.sqlite import SQLiteProvider
 
 
@@ -70,3 +74,97 @@ def test_get(config):
     assert 'properties' in result
     assert 'id' in result
     assert 'Netherlands' in result['properties']['admin']
+
+
+def test_connection_reuse(config):
+    """Testing connections are kept per thread"""
+    config['pragmas'] = {'cache_size': -2000}
+    p = SQLiteProvider(config)
+    p.query()
+    p.get(118)
+    assert len(p._connections) == 1
+
+    barrier = threading.Barrier(3)
+
+    def query():
+        p.query()
+        barrier.wait()
+
+    threads = [threading.Thread(target=query) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    assert len(p._connections) == 3
+
+    # connections are closed along with their thread
+    for thread in threads:
+        thread.join()
+    assert len(p._connections) == 1
+
+    for i in range(50):
+        thread = threading.Thread(target=p.query)
+        thread.start()
+        thread.join()
+    assert len(p._connections) == 1
+
+    p.close()
+    assert len(p._connections) == 0
+    assert p.get(118)['id'] == 118
+
+
+def test_query_bbox(config):
+    """Testing query with a bounding box"""
+    p = SQLiteProvider(config)
+    bbox = [3.3, 50.7, 7.3, 53.6]
+    hits = p.query(resulttype='hits', bbox=bbox)['numberMatched']
+    assert 0 < hits < p.query(resulttype='hits')['numberMatched']
+
+    results = p.query(limit=1000, bbox=bbox)
+    assert 118 in [f['id'] for f in results['features']]
+
+
+def test_query_paging(config):
+    """Testing offset and keyset paging"""
+    p = SQLiteProvider(config)
+    results = p.query(startindex=5, limit=5)
+    expected = [f['id'] for f in results['features']]
+    assert len(expected) == 5
+    assert 'next_token' not in results
+
+    sortby = [{'property': 'admin', 'order': 'D'}]
+    sorted_ = [f['id'] for f in p.query(limit=10,
+                                        sortby=sortby)['features']]
+    with pytest.raises(ProviderInvalidQueryError):
+        p.query(token='WzFd')
+
+    config['paging'] = 'keyset'
+    p = SQLiteProvider(config)
+    results = p.query(limit=5)
+    results = p.query(limit=5, token=results['next_token'])
+    assert [f['id'] for f in results['features']] == expected
+
+    results = p.query(limit=5, sortby=sortby)
+    ids = [f['id'] for f in results['features']]
+    results = p.query(limit=5, sortby=sortby, token=results['next_token'])
+    assert ids + [f['id'] for f in results['features']] == sorted_
+
+
+def test_query_filters(config):
+    """Testing property filters and sortby"""
+    p = SQLiteProvider(config)
+    assert p.fields['ogc_fid'] == {'type': 'integer'}
+
+    properties = [('admin', 'Netherlands')]
+    assert p.query(resulttype='hits',
+                   properties=properties)['numberMatched'] == 1
+    results = p.query(properties=properties)
+    assert [f['id'] for f in results['features']] == [118]
+
+    results = p.query(limit=2, sortby=[{'property': 'ogc_fid',
+                                        'order': 'D'}])
+    assert results['features'][0]['id'] > results['features'][1]['id']
+
+    with pytest.raises(ProviderQueryError):
+        p.query(properties=[('missing', 'x')])
+    with pytest.raises(ProviderQueryError):
+        p.query(datetime='2000-01-01')  # no time_field
@@ -29,6 +29,7 @@
 
 from datetime import datetime, date, time
 from decimal import Decimal
+import json
 import os
 
 import pytest
@@ -96,3 +97,114 @@ def test_json_serial():
 
     with pytest.raises(TypeError):
         util.json_serial('foo')
+
+
+def test_token():
+    values = ['abc', 2, datetime(1972, 10, 30)]
+    token = util.encode_token(values)
+    assert isinstance(token, str)
+    assert util.decode_token(token) == ['abc', 2, '1972-10-30T00:00:00']
+
+    # decimals are kept exact
+    token = util.encode_token([Decimal('12345678901234567890.123456789')])
+    assert util.decode_token(token) == ['12345678901234567890.123456789']
+
+    with pytest.raises(ValueError):
+        util.decode_token('foo!')
+
+
+def test_to_json():
+    d = {'type': 'FeatureCollection', 'features': util.RawJSON('[{"a":1}]')}
+    assert json.loads(util.to_json(d)) == {
+        'type': 'FeatureCollection', 'features': [{'a': 1}]}
+
+    d = {'features': util.RawJSON('[]')}
+    assert util.to_json(d) == '{"features":[]}'
+
+    d = {'timeStamp': datetime(1972, 10, 30)}
+    assert util.to_json(d) == '{"timeStamp": "1972-10-30T00:00:00"}'
+
+
+def test_grid_cell():
+    assert util.grid_cell('geohash', -5.6, 42.6, 5) == 'ezs42'
+    assert util.grid_cell('geotile', 4.9, 52.37, 7) == '7/65/42'
+    assert util.grid_cell('geotile', 180, -90, 1) == '1/1/1'
+
+    minx, miny, maxx, maxy = util.grid_cell_bbox('geohash', 'ezs42')
+    assert minx <= -5.6 <= maxx and miny <= 42.6 <= maxy
+    minx, miny, maxx, maxy = util.grid_cell_bbox('geotile', '7/65/42')
+    assert minx <= 4.9 <= maxx and miny <= 52.37 <= maxy
+
+    assert util.geometry_center({'type': 'Point',
+                                 'coordinates': [1, 2]}) == (1, 2)
+    assert util.geometry_center({
+        'type': 'Polygon',
+        'coordinates': [[[0, 0], [2, 0], [2, 4], [0, 0]]]
+    }) == (1, 2)
+    assert util.geometry_center(None) is None
+    assert util.geometry_center({'type': 'Point',
+                                 'coordinates': []}) is None
+
+
+def test_geometry_envelope():
+    assert util.geometry_envelope({
+        'type': 'MultiLineString',
+        'coordinates': [[[0, 1], [2, 3]], [[-1, 5], [1, 0]]]
+    }) == [-1, 0, 2, 5]
+    assert util.geometry_envelope({
+        'type': 'GeometryCollection',
+        'geometries': [
+            {'type': 'Point', 'coordinates': [4, 4]},
+            {'type': 'LineString', 'coordinates': []}]
+    }) == [4, 4, 4, 4]
+    assert util.geometry_envelope({'type': 'Polygon',
+                                   'coordinates': []}) is None
+    assert util.geometry_envelope(None) is None
+
+
+def test_sqlite_filter():
+    columns = {'name': {'type': 'string'}, 'date': {'type': 'string'}}
+    assert util.sqlite_filter(columns, 'date', [('name', 'x')],
+                              '2001-01-01T02:00:00+02:00/..') == (
+        ['"name" = ?', 'julianday("date") >= julianday(?)'],
+        ['x', '2001-01-01T00:00:00'])
+    assert util.sqlite_filter(columns, 'date', datetime_='../..') == ([], [])
+    with pytest.raises(ValueError):
+        util.sqlite_filter(columns, properties=[('missing', 'x')])
+    with pytest.raises(ValueError):
+        util.sqlite_filter(columns, datetime_='2001-01-01')
+    with pytest.raises(ValueError):
+        util.sqlite_filter(columns, 'date', datetime_='yesterday')
+
+    assert util.sqlite_order_by(columns, []) == 'order by rowid'
+    assert util.sqlite_order_by(
+        columns, [{'property': 'name', 'order': 'D'}]) == \
+        'order by "name" desc, rowid'
+
+    sql, params, keys = util.sqlite_select(
+        't', '"name"', columns, ['"name" = ?'], ['x'],
+        [{'property': 'date', 'order': 'D'}], 5, 10)
+    assert sql == 'select "date" as "_key0",rowid as "_key1","name" ' \
+        'from "t" where "name" = ? order by "date" desc, rowid ' \
+        'limit ? offset ?'
+    assert params == ['x', 10, 5]
+    assert keys == ['_key0', '_key1']
+
+    sql, params, keys = util.sqlite_select(
+        't', '"name"', columns, sortby=[{'property': 'date', 'order': 'D'}],
+        startindex=5, token=util.encode_token(['2001', 3]))
+    assert 'where ((("date" < ? or "date" is null)) or ' \
+        '("date" = ? and rowid > ?))' in sql
+    assert params == ['2001', '2001', 3, 10, 0]
+    # NULLs sort first, so last in descending order
+    sql, params, keys = util.sqlite_select(
+        't', '"name"', columns, sortby=[{'property': 'date', 'order': 'D'}],
+        token=util.encode_token([None, 3]))
+    assert 'where (("date" is null and rowid > ?))' in sql
+    with pytest.raises(ValueError):
+        util.sqlite_select('t', '"name"', columns,
+                           token=util.encode_token([None, 3]))
+
+    assert util.sqlite_field_type('MEDIUMINT') == 'integer'
+    assert util.sqlite_field_type('DOUBLE') == 'number'
+    assert util.sqlite_field_type('TEXT(10)') == 'string'